@@ -0,0 +1,155 @@
+"""
+This file contains test cases to verify that the alternative board
+implementations in the `isolation` package behave exactly like the reference
+`isolation.Board` class.
+"""
+import random
+import unittest
+
+import isolation
+import perft
+
+
+def random_game(board_cls, seed, w=7, h=7):
+    """Play a random game on a new board of type `board_cls`, recording the
+    board after every ply.
+    """
+    rng = random.Random(seed)
+    board = board_cls("Player1", "Player2", w, h)
+    states = [board.copy()]
+    while True:
+        moves = board.get_legal_moves()
+        if not moves:
+            break
+        board.apply_move(rng.choice(moves))
+        states.append(board.copy())
+    return states
+
+
+class BitBoardTest(unittest.TestCase):
+
+    def assertSameState(self, expected, actual):
+        for player in ("Player1", "Player2"):
+            self.assertEqual(expected.get_legal_moves(player),
+                             actual.get_legal_moves(player))
+            self.assertEqual(expected.get_player_location(player),
+                             actual.get_player_location(player))
+            self.assertEqual(expected.utility(player), actual.utility(player))
+            self.assertEqual(expected.is_winner(player), actual.is_winner(player))
+            self.assertEqual(expected.is_loser(player), actual.is_loser(player))
+        self.assertEqual(expected.get_blank_spaces(), actual.get_blank_spaces())
+        self.assertEqual(expected.active_player, actual.active_player)
+        self.assertEqual(expected.move_count, actual.move_count)
+        self.assertEqual(expected.to_string(), actual.to_string())
+
+    def test_random_games_match_board(self):
+        """ BitBoard reproduces Board states over random games """
+        for seed, (w, h) in enumerate([(7, 7), (7, 7), (5, 9), (9, 5), (11, 11)]):
+            expected = random_game(isolation.Board, seed, w, h)
+            actual = random_game(isolation.BitBoard, seed, w, h)
+            self.assertEqual(len(expected), len(actual))
+            for exp_state, act_state in zip(expected, actual):
+                self.assertSameState(exp_state, act_state)
+
+    def test_forecast_move_does_not_modify_board(self):
+        """ BitBoard.forecast_move leaves the original board untouched """
+        board = isolation.BitBoard("Player1", "Player2")
+        board.apply_move((3, 3))
+        board.apply_move((0, 0))
+        before = board.to_string()
+        child = board.forecast_move((1, 2))
+        self.assertEqual(before, board.to_string())
+        self.assertEqual(child.get_player_location("Player1"), (1, 2))
+        self.assertFalse(board.move_is_legal((3, 3)))
+        self.assertTrue(board.move_is_legal((1, 2)))
+        self.assertFalse(child.move_is_legal((1, 2)))
+
+
+class UndoMoveTest(unittest.TestCase):
+
+    def test_undo_restores_every_state(self):
+        """ undo_move walks a finished game back to the empty board """
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            states = random_game(board_cls, 7)
+            board = states[-1].copy()
+            for expected in reversed(states[:-1]):
+                board.undo_move()
+                self.assertEqual(expected.to_string(), board.to_string())
+                self.assertEqual(expected.get_legal_moves(), board.get_legal_moves())
+                self.assertEqual(expected.active_player, board.active_player)
+                self.assertEqual(expected.move_count, board.move_count)
+                for player in ("Player1", "Player2"):
+                    self.assertEqual(expected.get_player_location(player),
+                                     board.get_player_location(player))
+
+    def test_copies_undo_independently(self):
+        """ Undoing moves on a copy leaves the original board untouched """
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            states = random_game(board_cls, 3)
+            board = states[10].copy()
+            child = board.forecast_move(board.get_legal_moves()[0])
+            self.assertEqual(states[11].move_count, child.move_count)
+            for expected in reversed(states[:11]):
+                child.undo_move()
+                self.assertEqual(expected.to_string(), child.to_string())
+                self.assertEqual(expected.get_hash(), child.get_hash())
+            self.assertEqual(states[10].to_string(), board.to_string())
+            self.assertEqual(states[10].get_hash(), board.get_hash())
+            self.assertEqual(states[9].get_move_history(), board.get_move_history()[:-1])
+
+
+class OpenCellIndexTest(unittest.TestCase):
+
+    def assertIndexesMatchCells(self, board):
+        cells = board.__board_state__
+        blank_spaces = [(i, j) for j in range(board.width) for i in range(board.height)
+                        if cells[i][j] == isolation.Board.BLANK]
+        self.assertEqual(blank_spaces, board.get_blank_spaces())
+        self.assertEqual(sum(1 << (c * board.height + r) for r, c in blank_spaces),
+                         board.get_blank_mask())
+        for r in range(board.height):
+            for c in range(board.width):
+                expected = len([1 for dr, dc in isolation.bitboard.DIRECTIONS
+                                if (r + dr, c + dc) in blank_spaces])
+                self.assertEqual(expected, board.count_moves_from((r, c)))
+
+    def test_indexes_follow_moves_and_undo(self):
+        """ Board keeps its open cell indexes in sync with its cells """
+        for seed, (w, h) in enumerate([(7, 7), (5, 8)]):
+            states = random_game(isolation.Board, seed, w, h)
+            board = states[-1].copy()
+            self.assertIndexesMatchCells(board)
+            while board.move_count:
+                board.undo_move()
+                self.assertIndexesMatchCells(board)
+                self.assertEqual(board.has_legal_moves(),
+                                 bool(board.get_legal_moves()))
+
+    def test_indexes_rebuilt_when_cells_replaced(self):
+        """ Replacing the cells directly (as a subclass copy may) rebuilds the indexes """
+        board = random_game(isolation.Board, 5)[12]
+        new_board = isolation.Board("Player1", "Player2")
+        new_board.__board_state__ = [row[:] for row in board.__board_state__]
+        self.assertIndexesMatchCells(new_board)
+        self.assertEqual(board.get_blank_mask(), new_board.get_blank_mask())
+
+    def test_blank_spaces_are_copies(self):
+        """ Changing a returned list does not change the cached locations """
+        board = isolation.Board("Player1", "Player2")
+        board.get_blank_spaces().pop()
+        self.assertEqual(49, len(board.get_blank_spaces()))
+
+
+class PerftTest(unittest.TestCase):
+
+    def test_counts_match_between_boards(self):
+        """ Both perft variants count the same trees on every board """
+        self.assertEqual(49, perft.perft(isolation.Board("Player1", "Player2"), 1))
+        self.assertEqual(49 * 48, perft.perft(isolation.BitBoard("Player1", "Player2"), 2))
+        results = perft.run(3, perft.OPENINGS[1:4], min_time=0.01)
+        self.assertEqual([], results["mismatches"])
+        self.assertEqual(sorted(results["boards"]), ["BitBoard", "Board"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Build an opening book for `CustomPlayer` by searching every position in the
+first few plies of the game, up to symmetry, to a fixed depth. For example:
+
+    python build_opening_book.py --plies 3 --depth 7 --output opening_book.bin
+
+Load the book by passing its path to `CustomPlayer(book=...)`.
+"""
+
+import argparse
+import multiprocessing
+import timeit
+
+from isolation import BitBoard
+from isolation.symmetry import canonical_hash
+from isolation.symmetry import unique_moves
+from opening_book import OpeningBook
+from sample_players import improved_score
+from game_agent import CustomPlayer
+from game_agent import custom_score
+from game_agent import score_reachable
+
+HEURISTICS = {"custom": custom_score,
+              "improved": improved_score,
+              "reachable": score_reachable}
+
+
+def enumerate_positions(width, height, plies):
+    """
+    Generate one board for every position with fewer than `plies` moves
+    played, up to symmetry, in order of increasing move count.
+    """
+    frontier = [BitBoard("Player1", "Player2", width, height)]
+    for _ in range(plies):
+        children = {}
+        for game in frontier:
+            yield game
+            for move in unique_moves(game, game.get_legal_moves()):
+                child = game.forecast_move(move)
+                key, _ = canonical_hash(child)
+                children.setdefault(key, child)
+        frontier = list(children.values())
+
+
+def search_position(task):
+    """Search the position described by `task` and return the best move,
+    search depth and score.
+    """
+    moves, width, height, depth, heuristic = task
+    game = BitBoard("Player1", "Player2", width, height)
+    for move in moves:
+        game.apply_move(move)
+    agent = CustomPlayer(depth, HEURISTICS[heuristic], iterative=False,
+                         method="alphabeta", in_place=True, tt_size=2 ** 18,
+                         ordering=True)
+    agent.time_left = lambda: float("inf")
+    score, move = agent.alphabeta(game, depth)
+    if move not in game.get_legal_moves():
+        # Every move loses against perfect play; keep the first one
+        move = game.get_legal_moves()[0]
+    return moves, move, depth, score
+
+
+def build_book(width, height, plies, depth, heuristic="custom", processes=1):
+    """Search every position in the first `plies` plies to `depth` plies and
+    return the resulting `OpeningBook`.
+    """
+    tasks = []
+    for game in enumerate_positions(width, height, plies):
+        if game.get_legal_moves():
+            tasks.append((game.get_move_history(), width, height, depth, heuristic))
+
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(search_position, tasks, chunksize=1)
+    else:
+        results = map(search_position, tasks)
+
+    book = OpeningBook(width, height, plies)
+    for moves, move, move_depth, score in results:
+        game = BitBoard("Player1", "Player2", width, height)
+        for played in moves:
+            game.apply_move(played)
+        book.add(game, move, move_depth, score)
+    return book
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an opening book for CustomPlayer.")
+    parser.add_argument("--plies", type=int, default=3,
+                        help="store every position with fewer moves played")
+    parser.add_argument("--depth", type=int, default=7,
+                        help="search depth for every position")
+    parser.add_argument("--heuristic", choices=sorted(HEURISTICS), default="custom",
+                        help="evaluation function used by the search")
+    parser.add_argument("--size", type=int, nargs=2, default=(7, 7),
+                        metavar=("WIDTH", "HEIGHT"), help="board size")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="number of worker processes")
+    parser.add_argument("-o", "--output", default="opening_book.bin",
+                        help="path of the book file to write")
+    args = parser.parse_args()
+
+    start = timeit.default_timer()
+    book = build_book(args.size[0], args.size[1], args.plies, args.depth,
+                      args.heuristic, args.processes)
+    book.save(args.output)
+    print("Wrote {} positions to {} in {:.1f}s".format(
+        len(book), args.output, timeit.default_timer() - start))
+
+
+if __name__ == "__main__":
+    main()
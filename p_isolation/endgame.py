@@ -0,0 +1,193 @@
+"""This file contains an exact solver for isolation endgames in which the two
+players are partitioned, i.e., the open cells that each player can still reach
+are disjoint.
+
+From then on the players cannot interfere with each other, so each one simply
+walks the longest knight path available in its own region. The player to
+move wins if and only if its longest path is strictly longer than the
+opponent's, and playing the first move of a longest path is optimal whatever
+the outcome.
+
+Longest paths are computed by a depth-first search over (cell, open cells)
+states, with the open cells stored as a bitmask (see `isolation.bitboard`) and
+the result of every state memoized, so the search from one move to the next
+reuses the states found by the previous one.
+"""
+
+from isolation.bitboard import flood_fill
+from isolation.bitboard import iter_cells
+from isolation.bitboard import knight_tables
+from isolation.bitboard import popcount
+
+
+def player_cell(game, player):
+    """Return the cell index (col * height + row) of `player`, or None if the
+    player has not moved yet.
+    """
+    loc = game.get_player_location(player)
+    if loc is None:
+        return None
+    return loc[1] * game.height + loc[0]
+
+
+_COLOR_CACHE = {}
+
+
+def color_mask(tables):
+    """Return the bitmask of the cells with even row + col. Every knight move
+    changes the color of the cell, as on a chessboard.
+    """
+    key = (tables.width, tables.height)
+    mask = _COLOR_CACHE.get(key)
+    if mask is None:
+        mask = 0
+        for i, (r, c) in enumerate(tables.coords):
+            if (r + c) % 2 == 0:
+                mask |= tables.bits[i]
+        _COLOR_CACHE[key] = mask
+    return mask
+
+
+def path_bound(tables, cell, region):
+    """
+    Return an upper bound on the length of a knight path from `cell` through
+    the open cells in `region`. A path alternates between cells of the other
+    color and cells of the color of `cell`, so it can only be one move longer
+    than twice the number of cells of the scarcer color.
+    """
+    same = color_mask(tables)
+    if not tables.bits[cell] & same:
+        same = tables.full & ~same
+    same = popcount(region & same)
+    other = popcount(region) - same
+    return min(2 * other, 2 * same + 1)
+
+
+def partition(game):
+    """
+    Return the regions of open cells reachable by the active and inactive
+    players of `game` if they are disjoint, or None if the players can still
+    reach a common cell (or have not both been placed yet).
+
+    Returns
+    ----------
+    (int, int) or None
+        The bitmasks of the regions of the active and inactive players.
+    """
+    active = player_cell(game, game.active_player)
+    inactive = player_cell(game, game.inactive_player)
+    if active is None or inactive is None:
+        return None
+    tables = knight_tables(game.width, game.height)
+    blank = game.get_blank_mask()
+    own = flood_fill(blank, active, tables)
+    other = flood_fill(blank, inactive, tables)
+    if own & other:
+        return None
+    return own, other
+
+
+class EndgameSolver(object):
+    """Longest knight path solver for partitioned positions.
+
+    Parameters
+    ----------
+    check : callable (optional)
+        A function called every `check_interval` searched states; it may
+        raise an exception to abort the search (e.g., when the time limit is
+        close). Memoized results are kept when the search is aborted.
+
+    check_interval : int (optional)
+        The number of states searched between calls to `check`.
+
+    max_entries : int (optional)
+        The memo is cleared when it grows beyond this number of states.
+    """
+
+    def __init__(self, check=None, check_interval=1024, max_entries=2 ** 20):
+        self.check = check
+        self.check_interval = check_interval
+        self.max_entries = max_entries
+        self.memo = {}
+        self.nodes = 0
+
+    def longest_path(self, tables, cell, open_cells):
+        """Return the number of moves in the longest knight path from the cell
+        with index `cell` that only visits cells in the bitmask `open_cells`,
+        which must only hold cells reachable from `cell` (see
+        `isolation.bitboard.flood_fill()`).
+        """
+        key = (cell, open_cells)
+        length = self.memo.get(key)
+        if length is not None:
+            return length
+
+        self.nodes += 1
+        if self.check is not None and self.nodes % self.check_interval == 0:
+            self.check()
+
+        length = 0
+        targets = tables.masks[cell] & open_cells
+        if targets:
+            bound = path_bound(tables, cell, open_cells)
+            # Warnsdorff's rule: cells with few onward moves first, which
+            # tends to find a path that reaches the bound early
+            children = []
+            for target in iter_cells(targets):
+                rest = open_cells & ~tables.bits[target]
+                children.append((popcount(tables.masks[target] & rest), target,
+                                 flood_fill(rest, target, tables)))
+            children.sort()
+            for _, target, region in children:
+                if 1 + path_bound(tables, target, region) <= length:
+                    continue
+                length = max(length, 1 + self.longest_path(tables, target, region))
+                if length == bound:
+                    break
+
+        self.memo[key] = length
+        return length
+
+    def best_move(self, game, region=None):
+        """
+        Return the first move of a longest path for the active player of the
+        partitioned position `game` and the length of that path. `region` may
+        be passed to reuse the active player's region from `partition()`.
+
+        Returns
+        ----------
+        ((int, int), int)
+            The best move, or (-1, -1) if there are no legal moves, and the
+            number of moves the active player can still make.
+        """
+        if len(self.memo) > self.max_entries:
+            self.memo.clear()
+        tables = knight_tables(game.width, game.height)
+        cell = player_cell(game, game.active_player)
+        if region is None:
+            region = flood_fill(game.get_blank_mask(), cell, tables)
+
+        best_move, best_length = (-1, -1), 0
+        bound = path_bound(tables, cell, region)
+        for target in iter_cells(tables.masks[cell] & region):
+            rest = flood_fill(region & ~tables.bits[target], target, tables)
+            length = 1 + self.longest_path(tables, target, rest)
+            if length > best_length:
+                best_move, best_length = tables.coords[target], length
+            if best_length == bound:
+                break
+        return best_move, best_length
+
+    def outcome(self, game):
+        """
+        Return the longest path lengths of the active and inactive players
+        of `game`, or None if the players are not partitioned. The active
+        player wins if its path is strictly longer.
+        """
+        regions = partition(game)
+        if regions is None:
+            return None
+        tables = knight_tables(game.width, game.height)
+        _, own = self.best_move(game, regions[0])
+        other = self.longest_path(tables, player_cell(game, game.inactive_player), regions[1])
+        return own, other
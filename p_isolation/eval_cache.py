@@ -0,0 +1,61 @@
+"""This file contains a bounded cache of evaluation function results used by
+`CustomPlayer` to score each leaf position once, although iterative deepening
+passes and sibling subtrees reach the same leaves many times.
+"""
+
+from collections import OrderedDict
+
+
+class EvalCache(object):
+    """Fixed-size map from position keys to scores that evicts the least
+    recently used entry when it is full.
+
+    A key combines the Zobrist hash of a position with the perspective of the
+    score (see `key()`), so the cache works with any evaluation function whose
+    value only depends on the position and on whether it scores the active or
+    the inactive player. Entries stay valid between moves and games.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The maximum number of entries in the cache.
+    """
+
+    def __init__(self, size=2 ** 16):
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        """Remove every entry from the cache and reset the counters."""
+        self.entries = OrderedDict()
+        self.probes = 0
+        self.hits = 0
+
+    @staticmethod
+    def key(game, player):
+        """Return the cache key of scoring `game` for `player`."""
+        return game.get_hash() << 1 | (player is game.active_player)
+
+    def lookup(self, key):
+        """Return the score stored for `key`, or None."""
+        self.probes += 1
+        value = self.entries.get(key)
+        if value is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def store(self, key, value):
+        """Record the score of `key`, evicting the least recently used entry
+        if the cache is full.
+        """
+        entries = self.entries
+        entries[key] = value
+        if len(entries) > self.size:
+            entries.popitem(last=False)
+
+    def hit_rate(self):
+        """Return the fraction of lookups that found a score (0 before the
+        first lookup).
+        """
+        return self.hits / float(self.probes) if self.probes else 0.
@@ -6,8 +6,38 @@ augment the test suite with your own test cases to further test your code.
 You must test your agent's strength against a set of agents with known
 relative strength using tournament.py and include the results in your report.
 """
+import json
 import random
 import math
+import struct
+import timeit
+
+from functools import lru_cache
+
+from endgame import EndgameSolver
+from endgame import partition
+from eval_cache import EvalCache
+from isolation.bitboard import flood_fill
+from isolation.bitboard import iter_cells
+from isolation.bitboard import knight_spread
+from isolation.bitboard import knight_tables
+from isolation.bitboard import popcount
+from isolation.symmetry import canonical_hash
+from isolation.symmetry import inverse_symmetry
+from isolation.symmetry import symmetric_hashes
+from isolation.symmetry import transform_move
+from isolation.symmetry import unique_moves
+from move_ordering import MoveOrderer
+from opening_book import OpeningBook
+from parallel_search import RootSplitSearch
+from parallel_search import clock
+from pondering import Ponderer
+from search_stats import SCORE_SAMPLE_INTERVAL
+from search_stats import SearchStats
+from transposition import EXACT
+from transposition import LOWER
+from transposition import UPPER
+from transposition import TranspositionTable
 
 class Timeout(Exception):
     """Subclass base exception for code clarity."""
@@ -56,32 +86,57 @@ def score_heuristic_2(game, player):
 
     return own_moves - player_distance_to_center - opp_moves + opp_distance_to_center
 
-def count_helper(blank_p, moves, depth):
-    count = 0
-    if depth > 0:
-        for move in moves:
-            if move in blank_p:
-                count += 1
-                new_blank_p = [x for x in blank_p if x != move]
-                if move[0] - 2 >= 0 and move[1] + 1 <= 6:
-                    count += count_helper(new_blank_p, (move[0] - 2, move[1] + 1), depth - 1)
-                if move[0] - 2 >= 0 and move[1] - 1 >= 0:
-                    count += count_helper(new_blank_p, (move[0] - 2, move[1] - 1), depth - 1)
-                if move[0] + 2 <= 6 and move[1] + 1 <= 6:
-                    count += count_helper(new_blank_p, (move[0] + 2, move[1] + 1), depth - 1)
-                if move[0] + 2 <= 6 and move[1] - 1 >= 0:
-                    count += count_helper(new_blank_p, (move[0] + 2, move[1] - 1), depth - 1)
-
-                if move[0] - 1 >= 0 and move[1] + 2 <= 6:
-                    count += count_helper(new_blank_p, (move[0] - 1, move[1] + 2), depth - 1)
-                if move[0] - 1 >= 0 and move[1] - 2 >= 0:
-                    count += count_helper(new_blank_p, (move[0] - 1, move[1] - 2), depth - 1)
-                if move[0] + 1 <= 6 and move[1] + 2 <= 6:
-                    count += count_helper(new_blank_p, (move[0] + 1, move[1] + 2), depth - 1)
-                if move[0] + 1 <= 6 and move[1] - 2 >= 0:
-                    count += count_helper(new_blank_p, (move[0] + 1, move[1] - 2), depth - 1)
+@lru_cache(maxsize=2 ** 16)
+def count_reachable(blank, cell, depth, width, height):
+    """Count the knight paths of at most `depth` moves that start by moving
+    onto `cell` and only visit open cells, never visiting a cell twice.
+
+    Parameters
+    ----------
+    blank : int
+        Bitmask of the open cells on the board (see `Board.get_blank_mask()`)
+
+    cell : int
+        Index of the first cell of the paths (col * height + row)
+
+    depth : int
+        The maximum number of moves in each path
+
+    width, height : int
+        The size of the board
+
+    Returns
+    ----------
+    int
+        The number of paths; zero if `cell` is not open.
+    """
+    tables = knight_tables(width, height)
+    bit = tables.bits[cell]
+    if depth <= 0 or not blank & bit:
+        return 0
+    blank &= ~bit
+    count = 1
+    if depth > 1:
+        for next_cell in iter_cells(tables.masks[cell] & blank):
+            count += count_reachable(blank, next_cell, depth - 1, width, height)
     return count
 
+def reachable_count(game, player, depth):
+    """Sum `count_reachable()` over the legal moves of `player`."""
+    loc = game.get_player_location(player)
+    if depth == 1 and loc is not None:
+        return game.count_moves_from(loc)
+    blank = game.get_blank_mask()
+    if loc is None:
+        moves = blank
+    else:
+        tables = knight_tables(game.width, game.height)
+        moves = tables.masks[tables.index[loc]] & blank
+    if depth == 1:
+        return popcount(moves)
+    return sum(count_reachable(blank, cell, depth, game.width, game.height)
+               for cell in iter_cells(moves))
+
 def score_heuristic_3(game, player):
     # transposition_table = {
     #     (3, 3): [(1,4), (2,5), (1,2), (2,1), (4,1), (5,2), (5,4), (4,5)],
@@ -109,12 +164,216 @@ def score_heuristic_3(game, player):
     #     (2, 6): [(4,5), (0,5), (3,4), (1,4)],
     #
     # }
+    # The previous list-based count_helper() passed a single location to its
+    # recursive calls, so only the first move of each path was ever counted;
+    # a depth of one reproduces those scores exactly.
+    opp = game.get_opponent(player)
+    return float(reachable_count(game, player, 1) - reachable_count(game, opp, 1))
+
+def score_reachable(game, player, depth=3):
+    # This heuristic compares the number of knight paths of up to `depth`
+    # moves through open cells that are available to each player
+    if game.is_loser(player):
+        return float("-inf")
+
+    if game.is_winner(player):
+        return float("inf")
+
     opp = game.get_opponent(player)
+    return float(reachable_count(game, player, depth) - reachable_count(game, opp, depth))
+
+def mobility(blank, cell, tables):
+    """Return the number of legal moves of a player at the cell with index
+    `cell` (None before the first move) on a board whose open cells are
+    `blank`.
+    """
+    return popcount(blank if cell is None else tables.masks[cell] & blank)
+
+def second_mobility(blank, cell, tables):
+    """Return the number of open cells two knight moves away from `cell`."""
+    moves = blank if cell is None else tables.masks[cell] & blank
+    return popcount(knight_spread(moves, tables) & blank)
+
+def center_distance(blank, cell, tables):
+    """Return the euclidean distance from `cell` to the center of the board
+    (zero before the first move).
+    """
+    if cell is None:
+        return 0.
+    row, col = tables.coords[cell]
+    return math.sqrt((row - (tables.height - 1) / 2.) ** 2 +
+                     (col - (tables.width - 1) / 2.) ** 2)
+
+def reachable_area(blank, cell, tables):
+    """Return the number of open cells that a player at `cell` can still
+    reach.
+    """
+    if cell is None:
+        return popcount(blank)
+    return popcount(flood_fill(blank, cell, tables))
+
+# The features combined by `WeightedScore`; tune_heuristic.batch_features()
+# computes the same values for arrays of positions
+FEATURES = ("mobility", "second_mobility", "center_distance", "reachable_area")
+FEATURE_FUNCTIONS = dict(mobility=mobility, second_mobility=second_mobility,
+                         center_distance=center_distance, reachable_area=reachable_area)
+
+def player_cells(game, player):
+    """Return the cell indices of `player` and the opponent (None for a
+    player who has not moved yet).
+    """
+    tables = knight_tables(game.width, game.height)
+    own = game.get_player_location(player)
+    opp = game.get_player_location(game.get_opponent(player))
+    return (None if own is None else tables.index[own],
+            None if opp is None else tables.index[opp])
+
+def position_features(game, player, features=FEATURES):
+    """Return the values of the named `features` for `player` minus the
+    values for the opponent.
+    """
+    tables = knight_tables(game.width, game.height)
+    blank = game.get_blank_mask()
+    own, opp = player_cells(game, player)
+    values = []
+    for name in features:
+        if name not in FEATURE_FUNCTIONS:
+            raise ValueError("Unknown feature: {}".format(name))
+        feature = FEATURE_FUNCTIONS[name]
+        values.append(feature(blank, own, tables) - feature(blank, opp, tables))
+    return values
+
+class WeightedScore(object):
+    """Heuristic equal to a weighted sum of `position_features()`, e.g., with
+    the weights fitted by tune_heuristic.py. Instances can be used as the
+    `score_fn` of `CustomPlayer` and can be pickled (for `workers` and
+    `ponder`).
+
+    Parameters
+    ----------
+    weights : dict
+        Maps names from `FEATURES` to their weights; features that are
+        missing or have a weight of zero are not computed.
+    """
+
+    def __init__(self, weights):
+        unknown = set(weights) - set(FEATURES)
+        if unknown:
+            raise ValueError("Unknown features: {}".format(", ".join(sorted(unknown))))
+        self.weights = dict(weights)
+        self.features = tuple(name for name in FEATURES if weights.get(name))
+        self.terms = tuple((weights[name], FEATURE_FUNCTIONS[name]) for name in self.features)
+
+    @classmethod
+    def load(cls, path):
+        """Return the heuristic with the weights written by tune_heuristic.py
+        to the JSON file `path`.
+        """
+        with open(path) as weights_file:
+            return cls(json.load(weights_file)["weights"])
+
+    def __call__(self, game, player):
+        if game.is_loser(player):
+            return float("-inf")
+
+        if game.is_winner(player):
+            return float("inf")
+
+        tables = knight_tables(game.width, game.height)
+        blank = game.get_blank_mask()
+        own, opp = player_cells(game, player)
+        score = 0.
+        for weight, feature in self.terms:
+            score += weight * (feature(blank, own, tables) - feature(blank, opp, tables))
+        return score
+
+    def __repr__(self):
+        return "WeightedScore({!r})".format(self.weights)
+
+@lru_cache(maxsize=None)
+def paired_shifts(width, height):
+    """Return the knight move shifts of `knight_tables(width, height)` with
+    source masks that cover two boards packed into one integer, the second
+    board shifted up by width * height bits (see `territory()`).
+    """
+    size = width * height
+    return [(source | source << size, offset)
+            for source, offset in knight_tables(width, height).shifts]
+
+def territory(blank, own, opp, tables, max_depth=None):
+    """Run a breadth-first search over the open cells `blank` from the cells
+    of both players at once, one knight move per step.
+
+    The two search fronts are packed into one integer, the opponent's shifted
+    up by width * height bits, so that a single set of masked shifts (see
+    `isolation.bitboard.knight_spread()`) advances both of them; the source
+    masks keep every move inside its own board.
+
+    Parameters
+    ----------
+    blank : int
+        Bitmask of the open cells on the board
+
+    own, opp : int or None
+        Cell indices of the players (None for a player who has not moved)
+
+    tables : isolation.bitboard.KnightTables
+        The knight move tables of the board size
+
+    max_depth : int (optional)
+        Stop the search after this many moves (None searches every cell)
+
+    Returns
+    ----------
+    (float, float)
+        The territory of each player: the sum of 1 / d over the cells that
+        the player reaches first, where d is the number of moves needed.
+        Cells that both players reach in the same number of moves count for
+        neither.
+    """
+    size = tables.width * tables.height
+    shifts = paired_shifts(tables.width, tables.height)
+    masks = tables.masks
+    fronts = ((blank if own is None else masks[own] & blank)
+              | (blank if opp is None else masks[opp] & blank) << size)
+    seen = fronts | fronts >> size
+    own_value = opp_value = 0.
+    depth = 1
+    while fronts:
+        contested = fronts & fronts >> size
+        contested |= contested << size
+        first = fronts ^ contested
+        own_value += popcount(first & tables.full) / depth
+        opp_value += popcount(first >> size) / depth
+        if depth == max_depth:
+            break
+        depth += 1
+        # The contested cells stay in the fronts, so that cells behind them
+        # can still end up contested
+        spread = 0
+        for source, offset in shifts:
+            if offset > 0:
+                spread |= (fronts & source) << offset
+            else:
+                spread |= (fronts & source) >> -offset
+        free = blank & ~seen
+        fronts = spread & (free | free << size)
+        seen |= fronts | fronts >> size
+    return own_value, opp_value
+
+def territory_score(game, player):
+    # This heuristic compares the territory of the players: the cells each
+    # player can reach before the opponent, weighted by their distance
+    if game.is_loser(player):
+        return float("-inf")
+
+    if game.is_winner(player):
+        return float("inf")
 
-    own_legal_moves = game.get_legal_moves(player)
-    opp_legal_moves = game.get_legal_moves(opp)
-    blank_p = game.get_blank_spaces()
-    return count_helper(blank_p, own_legal_moves, 3) - count_helper(blank_p, opp_legal_moves, 3)
+    own, opp = player_cells(game, player)
+    own_value, opp_value = territory(game.get_blank_mask(), own, opp,
+                                     knight_tables(game.width, game.height))
+    return own_value - opp_value
 
 def custom_score(game, player):
     """Calculate the heuristic value of a game state from the point of view
@@ -138,6 +397,28 @@ def custom_score(game, player):
     return score_heuristic_3(game, player)
 
 
+# Width of the null windows used by principal variation search. Any positive
+# width gives exact results; it only needs to be smaller than the typical
+# difference between scores.
+NULL_WINDOW = 1e-6
+
+
+def null_window(alpha, beta, maximizing_player):
+    """
+    Return the null window used to test whether a move improves on the best
+    score so far at a node searched with the window (alpha, beta), i.e.,
+    whether its score is above alpha (maximizing) or below beta (minimizing).
+    Returns None if no null window narrower than (alpha, beta) exists.
+    """
+    if maximizing_player:
+        window = alpha, min(beta, alpha + NULL_WINDOW)
+    else:
+        window = max(alpha, beta - NULL_WINDOW), beta
+    if window == (alpha, beta) or window[0] == window[1]:
+        return None
+    return window
+
+
 class CustomPlayer:
     """Game-playing agent that chooses a move using your evaluation function
     and a depth-limited minimax algorithm with alpha-beta pruning. You must
@@ -159,17 +440,98 @@ class CustomPlayer:
         Flag indicating whether to perform fixed-depth search (False) or
         iterative deepening search (True).
 
-    method : {'minimax', 'alphabeta'} (optional)
-        The name of the search method to use in get_move().
+    method : {'minimax', 'alphabeta', 'pvs'} (optional)
+        The name of the search method to use in get_move(). 'pvs' is
+        alphabeta with principal variation search and, during iterative
+        deepening, aspiration windows (see `pvs()`).
 
     timeout : float (optional)
         Time remaining (in milliseconds) when search is aborted. Should be a
         positive value large enough to allow the function to return before the
         timer expires.
+
+    in_place : boolean (optional)
+        Flag indicating whether search should walk the game tree by applying
+        and undoing moves on the board passed to get_move() (True) instead of
+        forecasting a new copy of the board for every child (False).
+
+    tt_size : int (optional)
+        Number of slots in the transposition table used by alphabeta search;
+        zero disables the table. The table is kept between iterative
+        deepening passes and between moves, and cleared for every new game.
+
+    eval_cache_size : int (optional)
+        Number of scores kept in the evaluation cache (see
+        `eval_cache.EvalCache`); zero disables the cache. The cache stores
+        the value of `score_fn` for each leaf position and perspective, so
+        `score_fn` must only depend on the position and on the player it
+        scores. It is kept between moves and games.
+
+    ordering : boolean (optional)
+        Flag indicating whether alphabeta search should order moves using the
+        previous principal variation, killer moves and the history heuristic
+        (see `move_ordering.MoveOrderer`).
+
+    mobility_ordering : boolean (optional)
+        Flag indicating whether move ordering should pre-sort moves by the
+        mobility of their destination cell. Only used if `ordering` is True.
+
+    symmetry_plies : int (optional)
+        Number of plies from the start of the game during which alphabeta
+        search skips moves that are symmetric to another legal move, and
+        shares transposition table entries between symmetric positions.
+
+    book : str or `opening_book.OpeningBook` (optional)
+        An opening book, or the path of an opening book file to load when the
+        first move is requested. Positions found in the book are played
+        without searching.
+
+    endgame : boolean (optional)
+        Flag indicating whether to solve positions in which the players are
+        partitioned exactly (see `endgame.EndgameSolver`) instead of
+        searching them. The solver may use up to half of the time left;
+        if it does not finish, the search runs as usual.
+
+    aspiration : float (optional)
+        Half width of the aspiration window around the score of the previous
+        iterative deepening pass used by 'pvs' search.
+
+    time_manager : `time_manager.TimeManager` (optional)
+        A time manager that decides when to read the clock and whether to
+        start another iterative deepening pass. Without one, the clock is
+        read at every node and deepening continues until the timer expires.
+        With one, get_move() returns the move of the last completed pass, and
+        deepening also stops once the result is decided or the search
+        reaches the end of the game.
+
+    workers : int (optional)
+        Number of worker processes for parallel iterative deepening search;
+        zero searches in this process. The legal moves at the root are split
+        between the workers, which run alphabeta (or 'pvs') search with the
+        `tt_size`, `ordering`, `mobility_ordering` and `aspiration` options
+        (see `parallel_search.RootSplitSearch`). The workers are started on
+        the first search and stopped by `close()`.
+
+    ponder : boolean (optional)
+        Flag indicating whether to search on the opponent's time. After
+        every move, a worker process searches the position after the
+        predicted reply of the opponent with the same options as `workers`
+        (see `pondering.Ponderer`); if the opponent plays that reply, the
+        search continues until the timer expires and its move is played.
+        The worker is stopped by `close()`.
+
+    stats_callback : callable (optional)
+        A function called with the `search_stats.SearchStats` of every call
+        to get_move() before it returns. The statistics of the last call are
+        also available as `self.stats`.
     """
 
     def __init__(self, search_depth=3, score_fn=custom_score,
-                 iterative=True, method='minimax', timeout=10., is_student=False):
+                 iterative=True, method='minimax', timeout=10., is_student=False,
+                 in_place=False, tt_size=0, ordering=False, mobility_ordering=False,
+                 symmetry_plies=0, book=None, endgame=False, aspiration=2.,
+                 time_manager=None, workers=0, ponder=False, stats_callback=None,
+                 eval_cache_size=0):
         self.search_depth = search_depth
         self.iterative = iterative
         self.score = score_fn
@@ -178,6 +540,25 @@ class CustomPlayer:
         self.TIMER_THRESHOLD = timeout
         self.num_moves = 0
         self.is_student = is_student
+        self.in_place = in_place
+        self.tt = TranspositionTable(tt_size) if tt_size > 0 else None
+        self.eval_cache = EvalCache(eval_cache_size) if eval_cache_size > 0 else None
+        self.last_move_count = -1
+        self.last_seat = None
+        self.orderer = MoveOrderer(mobility=mobility_ordering) if ordering else None
+        self.symmetry_plies = symmetry_plies
+        self.book = book
+        self.endgame = EndgameSolver(self._check_endgame_time) if endgame else None
+        self.endgame_deadline = 0.
+        self.aspiration = aspiration
+        self.clock = time_manager
+        worker_args = dict(score_fn=score_fn, method=method, in_place=True,
+                           tt_size=tt_size, eval_cache_size=eval_cache_size, ordering=ordering,
+                           mobility_ordering=mobility_ordering, aspiration=aspiration)
+        self.parallel = RootSplitSearch(workers, worker_args) if workers > 0 else None
+        self.ponderer = Ponderer(worker_args) if ponder else None
+        self.stats = SearchStats()
+        self.stats_callback = stats_callback
         # self.reflection = {
         #     (0, 6): (6, 0),
         #     (1, 5): (5, 1),
@@ -232,15 +613,70 @@ class CustomPlayer:
         if self.time_left() < self.TIMER_THRESHOLD:
             raise Timeout()
 
+        self.stats = SearchStats()
+        if self.clock is not None:
+            self.clock.start(time_left, self.TIMER_THRESHOLD)
+        start = timeit.default_timer()
+        try:
+            move = self._select_move(game, legal_moves)
+            if self.ponderer is not None and move in legal_moves:
+                self._start_pondering(game, move)
+            return move
+        finally:
+            self.stats.time = timeit.default_timer() - start
+            if self.stats_callback is not None:
+                self.stats_callback(self.stats)
+
+    def _select_move(self, game, legal_moves):
+        """Choose the move returned by get_move(), recording how it was
+        chosen in `self.stats`.
+        """
+        stats = self.stats
+
         # Perform any required initializations, including selecting an initial
         # move from the game board (i.e., an opening book), or returning
         # immediately if there are no legal moves
+        if self.tt is not None:
+            # Entries are scored from this agent's point of view but keyed by
+            # position, so they are stale when the agent changes seats or a
+            # new game starts
+            seat = 0 if game.__player_1__ is self else 1
+            if game.move_count <= self.last_move_count or seat != self.last_seat:
+                self.tt.clear()
+            self.last_move_count = game.move_count
+            self.last_seat = seat
+            self.tt.new_search()
+        if self.orderer is not None:
+            self.orderer.new_search()
+
         best_score = float("-inf")
         best_move = (-1, -1)
-        if len(legal_moves) == 0: return best_move
+        if len(legal_moves) == 0:
+            stats.source = "none"
+            return best_move
+        if self.ponderer is not None:
+            if self.ponderer.is_hit(game):
+                ponder_move = self._finish_pondering()
+                if ponder_move in legal_moves:
+                    stats.source = "ponder"
+                    return ponder_move
+            else:
+                self.ponderer.stop()
+        if self.book is not None:
+            book_move = self.lookup_book(game)
+            if book_move in legal_moves:
+                stats.source = "book"
+                return book_move
+        if self.endgame is not None:
+            endgame_move = self.solve_endgame(game)
+            if endgame_move is not None:
+                stats.source = "endgame"
+                return endgame_move
         if (self.is_student):
             # Always try to occupy the center position
-            if (3,3) in legal_moves: return (3,3)
+            if (3,3) in legal_moves:
+                stats.source = "center"
+                return (3,3)
         # self.num_moves += 1
         # if (self.is_student and self.num_moves < 4):
         #     # Always try to occupy the center position
@@ -254,13 +690,27 @@ class CustomPlayer:
             # here in order to avoid timeout. The try/except block will
             # automatically catch the exception raised by the search method
             # when the timer gets close to expiring
+            if self.iterative and self.parallel is not None:
+                return self._parallel_search(game, legal_moves)
+            if self.iterative and self.clock is not None:
+                return self._deepen(game, legal_moves)
             if self.iterative:
                 d = 1
+                v = None
                 while True:
+                    iteration_start = timeit.default_timer()
                     if self.method == "minimax":
                         v, _ = self.minimax(game, d)
                     if self.method == "alphabeta":
                         v, _ = self.alphabeta(game, d)
+                        if self.orderer is not None:
+                            self.orderer.end_iteration(game)
+                    if self.method == "pvs":
+                        v, _ = self.pvs(game, d, v)
+                        if self.orderer is not None:
+                            self.orderer.end_iteration(game)
+                    stats.iteration_times.append(timeit.default_timer() - iteration_start)
+                    stats.depth = d
                     if (v > best_score):
                         best_score = v
                         best_move = _
@@ -270,11 +720,193 @@ class CustomPlayer:
                     best_score, best_move = self.minimax(game, self.search_depth)
                 if self.method == "alphabeta":
                     best_score, best_move = self.alphabeta(game, self.search_depth)
+                if self.method == "pvs":
+                    best_score, best_move = self.pvs(game, self.search_depth)
+                stats.depth = self.search_depth
             return best_move
         except Timeout:
             # Handle any actions required at timeout, if necessary
             return best_move
 
+    def _deepen(self, game, legal_moves):
+        """Iterative deepening under the control of the time manager. Returns
+        the move of the last completed pass, or the first legal move if no
+        pass completed. Deepening stops when the next pass is not expected to
+        finish in time, when the result is a proven win or loss, or when the
+        depth exceeds the number of open cells (i.e., the searched tree
+        already reaches the end of every line).
+        """
+        stats = self.stats
+        best_move = legal_moves[0]
+        max_depth = len(game.get_blank_spaces())
+        v = None
+        try:
+            for d in range(1, max_depth + 1):
+                iteration_start = timeit.default_timer()
+                if self.method == "minimax":
+                    v, move = self.minimax(game, d)
+                else:
+                    if self.method == "pvs":
+                        v, move = self.pvs(game, d, v)
+                    else:
+                        v, move = self.alphabeta(game, d)
+                    if self.orderer is not None:
+                        self.orderer.end_iteration(game)
+                stats.iteration_times.append(timeit.default_timer() - iteration_start)
+                stats.depth = d
+                self.clock.end_iteration(stats.nodes)
+                # (-1, -1) means that every move loses; keep a legal move
+                if move != (-1, -1):
+                    best_move = move
+                if v in (float("inf"), float("-inf")) or not self.clock.can_deepen():
+                    break
+        except Timeout:
+            pass
+        return best_move
+
+    def _parallel_search(self, game, legal_moves):
+        """Search with the worker processes until TIMER_THRESHOLD ms are
+        left and return the best move of the deepest completed iteration.
+        """
+        if game.move_count < self.symmetry_plies:
+            legal_moves = unique_moves(game, legal_moves)
+        deadline = clock() + (self.time_left() - self.TIMER_THRESHOLD) / 1000.
+        move, self.stats.depth, self.stats.nodes = self.parallel.search(
+            game, self, legal_moves, deadline)
+        return move
+
+    def _start_pondering(self, game, move):
+        """Start searching the position after `move` and the predicted reply
+        of the opponent, unless the game ends before then.
+        """
+        child = game.forecast_move(move)
+        replies = child.get_legal_moves()
+        if not replies:
+            return
+        reply = None
+        if self.tt is not None and child.move_count >= self.symmetry_plies:
+            entry = self.tt.lookup(child.get_hash())
+            if entry is not None:
+                reply = entry.move
+        if reply not in replies:
+            # Without a stored best move, expect the reply that is worst for
+            # this agent according to the evaluation function
+            reply = min(replies, key=lambda m: self.score(child.forecast_move(m), self))
+        position = child.forecast_move(reply)
+        if position.get_legal_moves():
+            self.ponderer.ponder(position, self)
+
+    def _finish_pondering(self):
+        """Let the ponder search run until TIMER_THRESHOLD ms are left and
+        return the best move of its deepest completed iteration, or None.
+        """
+        deadline = clock() + (self.time_left() - self.TIMER_THRESHOLD) / 1000.
+        move, self.stats.depth, self.stats.nodes = self.ponderer.finish(deadline)
+        return move
+
+    def on_opponent_move(self, game, move):
+        """Called by `Board.play()` with the game after the opponent played
+        `move`. Stops a ponder search that predicted another reply, so that
+        its worker does not keep running until the next call to get_move().
+        """
+        if self.ponderer is not None and not self.ponderer.is_hit(game):
+            self.ponderer.stop()
+
+    def close(self):
+        """Stop the worker processes used by parallel search and pondering,
+        if any.
+        """
+        if self.parallel is not None:
+            self.parallel.close()
+        if self.ponderer is not None:
+            self.ponderer.close()
+
+    def lookup_book(self, game):
+        """Return the opening book move for the position `game`, or None.
+        A book given as a path is loaded on first use; if it cannot be read,
+        the book is dropped and the agent searches every move.
+        """
+        if not isinstance(self.book, OpeningBook):
+            try:
+                self.book = OpeningBook.load(self.book)
+            except (OSError, ValueError, struct.error):
+                self.book = None
+                return None
+        return self.book.lookup(game)
+
+    def solve_endgame(self, game):
+        """Return the optimal move for the position `game` if the players are
+        partitioned and the endgame solver finishes within half of the time
+        left, or None otherwise.
+        """
+        regions = partition(game)
+        if regions is None:
+            return None
+        self.endgame_deadline = self.time_left() / 2
+        try:
+            move, _ = self.endgame.best_move(game, regions[0])
+        except Timeout:
+            return None
+        return move
+
+    def _check_endgame_time(self):
+        if self.time_left() < max(self.endgame_deadline, self.TIMER_THRESHOLD):
+            raise Timeout()
+
+    def _visit_node(self):
+        """Count a search node and raise Timeout if the search must stop."""
+        stats = self.stats
+        stats.nodes += 1
+        clock = self.clock
+        if clock is None:
+            if self.time_left() < self.TIMER_THRESHOLD:
+                raise Timeout()
+        elif stats.nodes >= clock.next_check and clock.expired(stats.nodes):
+            raise Timeout()
+
+    def _evaluate(self, game, player):
+        """Return `self.score(game, player)`, timing one call out of every
+        `SCORE_SAMPLE_INTERVAL` for the search statistics.
+        """
+        stats = self.stats
+        stats.leaves += 1
+        if stats.leaves % SCORE_SAMPLE_INTERVAL:
+            return self._cached_score(game, player)
+        start = timeit.default_timer()
+        value = self._cached_score(game, player)
+        stats.score_time += (timeit.default_timer() - start) * SCORE_SAMPLE_INTERVAL
+        return value
+
+    def _cached_score(self, game, player):
+        """Return `self.score(game, player)`, from the evaluation cache if it
+        holds the score.
+        """
+        cache = self.eval_cache
+        if cache is None:
+            return self.score(game, player)
+        key = cache.key(game, player)
+        value = cache.lookup(key)
+        if value is not None:
+            self.stats.cache_hits += 1
+            return value
+        value = self.score(game, player)
+        cache.store(key, value)
+        return value
+
+    def _search_child(self, search_fn, game, move, *args):
+        """Call `search_fn` on the game state that results from applying
+        `move` to `game`. In place mode the move is applied to `game` itself
+        and undone afterwards (also when the search times out); otherwise
+        the search runs on a forecast copy of the board.
+        """
+        if not self.in_place:
+            return search_fn(game.forecast_move(move), *args)
+        game.apply_move(move)
+        try:
+            return search_fn(game, *args)
+        finally:
+            game.undo_move()
+
     def minimax(self, game, depth, maximizing_player=True):
         """Implement the minimax search algorithm as described in the lectures.
 
@@ -300,70 +932,69 @@ class CustomPlayer:
         tuple(int, int)
             The best move for the current branch; (-1, -1) for no legal moves
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise Timeout()
+        self._visit_node()
 
         best_score = float("-inf") if maximizing_player else float("inf")
         best_move = (-1, -1)
         visited_p = []
         if depth > 0:
             for legal_move in game.get_legal_moves():
-                # Generate the new board state with the legal_move applied
-                new_state = game.forecast_move(legal_move)
-                v, _ = self.minimax(new_state, depth - 1, not maximizing_player)
+                v, _ = self._search_child(self.minimax, game, legal_move,
+                                          depth - 1, not maximizing_player)
                 if ((maximizing_player and v > best_score) or
                    ((not maximizing_player) and v < best_score)):
                     best_score = v
                     best_move = legal_move
         elif depth == 0:
             # reached leaf, return score value;
-            best_score = self.score(game, game.inactive_player if not maximizing_player else game.active_player)
+            best_score = self._evaluate(game, game.inactive_player if not maximizing_player else game.active_player)
         return best_score, best_move
 
-    def find_symmetry(self, game, current_move, visited_p):
-        blank_p = game.get_blank_spaces()
+    def pvs(self, game, depth, guess=None):
+        """Search `game` to `depth` plies with principal variation search.
 
-        h_flip = [(move[0], 3 + (3 - move[1])) for move in blank_p]
-        if (h_flip == blank_p):
-            if (current_move[0], 3 + (3 - current_move[1])) in visited_p:
-                return True
+        This is alphabeta search in which every move after the first one at
+        a node is first searched with a null window, which only proves that
+        the move is no better than the best move so far; the move is searched
+        again with the full window only if that test fails. When a finite
+        `guess` of the score is given (e.g., the score of the previous
+        iterative deepening pass), the root is searched with the aspiration
+        window [guess - self.aspiration, guess + self.aspiration] first, and
+        searched again with the window opened on the failing side if the
+        score falls outside of it.
 
-        v_flip = [(3 + (3 - move[0]), move[1]) for move in blank_p]
-        if (v_flip == blank_p):
-            if (3 + (3 - current_move[0]), current_move[1]) in visited_p:
-                return True
-
-        d_flip_1 = [(move[1], move[0]) for move in blank_p]
-        if (d_flip_1 == blank_p):
-            if (current_move[1], current_move[0]) in visited_p:
-                return True
-
-        d_flip_2 = [(6 - move[1], 6 - move[0]) for move in blank_p]
-        if (d_flip_2 == blank_p):
-            if (6 - current_move[1], 6 - current_move[0]) in visited_p:
-                return True
-
-        return False
-
-    def find_rotation(self, game, current_move, visited_p):
-        blank_p = game.get_blank_spaces()
+        Parameters
+        ----------
+        game : isolation.Board
+            An instance of the Isolation game `Board` class representing the
+            current game state
 
-        rotate_90 = [(move[1], 6 - move[0]) for move in blank_p]
-        if (rotate_90 == blank_p):
-            if (current_move[1], 6 - current_move[0]) in visited_p:
-                return True
+        depth : int
+            Depth is an integer representing the maximum number of plies to
+            search in the game tree before aborting
 
-        rotate_180 = [(move[1], move[0]) for move in blank_p]
-        if (rotate_180 == blank_p):
-            if (current_move[1], current_move[0]) in visited_p:
-                return True
+        guess : float (optional)
+            The expected score of the position
 
-        rotate_270 = [(6 - move[1], move[0]) for move in blank_p]
-        if (rotate_180 == blank_p):
-            if (6 - current_move[1], current_move[0]) in visited_p:
-                return True
+        Returns
+        ----------
+        float
+            The score for the current search branch
 
-        return False
+        tuple(int, int)
+            The best move for the current branch; (-1, -1) for no legal moves
+        """
+        if guess is None or guess in (float("inf"), float("-inf")):
+            return self.alphabeta(game, depth)
+        alpha, beta = guess - self.aspiration, guess + self.aspiration
+        v, move = self.alphabeta(game, depth, alpha, beta)
+        if v <= alpha:
+            self.stats.researches += 1
+            v, move = self.alphabeta(game, depth, float("-inf"), beta)
+        elif v >= beta:
+            self.stats.researches += 1
+            v, move = self.alphabeta(game, depth, alpha, float("inf"))
+        return v, move
 
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf"), maximizing_player=True):
         """Implement minimax search with alpha-beta pruning as described in the
@@ -397,40 +1028,97 @@ class CustomPlayer:
         tuple(int, int)
             The best move for the current branch; (-1, -1) for no legal moves
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise Timeout()
+        self._visit_node()
 
         best_score = float("-inf") if maximizing_player else float("inf")
         best_move = (-1, -1)
-        visited_p = []
 
         if depth > 0:
-            for legal_move in game.get_legal_moves():
-                if self.is_student and len(visited_p) > 0 and depth > 1 and self.num_moves <= 3 and (self.find_symmetry(game, legal_move, visited_p)):
-                    visited_p.append(legal_move)
-                    continue
-                # Generate the new board state with the legal_move applied
-                new_state = game.forecast_move(legal_move)
-                v, _ = self.alphabeta(new_state, depth - 1, alpha, beta, not maximizing_player)
+            legal_moves = game.get_legal_moves()
+            hash_move = None
+            # Early in the game, skip moves that are symmetric to another
+            # move and share table entries between symmetric positions
+            symmetry = 0
+            use_symmetry = game.move_count < self.symmetry_plies
+            if use_symmetry:
+                hashes = symmetric_hashes(game)
+                legal_moves = unique_moves(game, legal_moves, hashes)
+            if self.orderer is not None:
+                self.orderer.start_node(game)
+            if self.tt is not None:
+                if use_symmetry:
+                    key, symmetry = canonical_hash(game, hashes)
+                else:
+                    key = game.get_hash()
+                alpha_orig, beta_orig = alpha, beta
+                entry = self.tt.lookup(key)
+                if entry is not None:
+                    # Entries store moves for the canonical copy of the position
+                    hash_move = entry.move
+                    if symmetry:
+                        hash_move = transform_move(game, hash_move, inverse_symmetry(game, symmetry))
+                    if entry.depth >= depth:
+                        if entry.bound == EXACT:
+                            return entry.value, hash_move
+                        if entry.bound == LOWER and entry.value > alpha:
+                            alpha = entry.value
+                        elif entry.bound == UPPER and entry.value < beta:
+                            beta = entry.value
+                        if alpha >= beta:
+                            return entry.value, hash_move
+            if self.orderer is not None:
+                legal_moves = self.orderer.order(game, legal_moves, hash_move)
+            elif hash_move in legal_moves:
+                # Search the best move stored for this position first
+                legal_moves.remove(hash_move)
+                legal_moves.insert(0, hash_move)
+            use_pvs = self.method == "pvs"
+            for index, legal_move in enumerate(legal_moves):
+                window = null_window(alpha, beta, maximizing_player) \
+                    if use_pvs and index > 0 else None
+                if window is not None:
+                    # Test whether the move beats the best move so far
+                    v, _ = self._search_child(self.alphabeta, game, legal_move,
+                                              depth - 1, window[0], window[1], not maximizing_player)
+                    if alpha < v < beta:
+                        self.stats.researches += 1
+                        v, _ = self._search_child(self.alphabeta, game, legal_move,
+                                                  depth - 1, alpha, beta, not maximizing_player)
+                else:
+                    v, _ = self._search_child(self.alphabeta, game, legal_move,
+                                              depth - 1, alpha, beta, not maximizing_player)
+                if ((maximizing_player and v > best_score) or
+                   ((not maximizing_player) and v < best_score)):
+                    best_score = v
+                    best_move = legal_move
+                    if self.orderer is not None:
+                        self.orderer.update_pv(game, legal_move, depth)
                 if maximizing_player:
-                    if v > best_score:
-                        best_score = v
-                        best_move = legal_move
                     if best_score >= beta:
-                        return best_score, best_move
+                        self.stats.cutoffs += 1
+                        if self.orderer is not None:
+                            self.orderer.record_cutoff(game, legal_move, depth, index)
+                        break
                     if best_score > alpha:
                         alpha = best_score
                 elif not maximizing_player:
-                    if v < best_score:
-                        best_score = v
-                        best_move = legal_move
                     if best_score <= alpha:
-                        return best_score, best_move
+                        self.stats.cutoffs += 1
+                        if self.orderer is not None:
+                            self.orderer.record_cutoff(game, legal_move, depth, index)
+                        break
                     if best_score < beta:
                         beta = best_score
-                if self.is_student and self.num_moves <= 3:
-                    visited_p.append(legal_move)
+            if self.tt is not None:
+                if best_score <= alpha_orig:
+                    bound = UPPER
+                elif best_score >= beta_orig:
+                    bound = LOWER
+                else:
+                    bound = EXACT
+                self.tt.store(key, depth, best_score, bound,
+                              transform_move(game, best_move, symmetry) if symmetry else best_move)
         elif depth == 0:
             # reached leaf, return score value;
-            best_score = self.score(game, game.inactive_player if not maximizing_player else game.active_player)
+            best_score = self._evaluate(game, game.inactive_player if not maximizing_player else game.active_player)
         return best_score, best_move
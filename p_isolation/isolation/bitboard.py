@@ -0,0 +1,456 @@
+"""
+This file contains the `BitBoard` class, a drop-in replacement for
+`isolation.Board` that stores the open cells of the board in a single
+integer instead of a list of lists.
+
+Cells are numbered in column-major order (index = col * height + row) so
+that iterating over the set bits from least to most significant visits the
+cells in the same order as `Board.get_blank_spaces()`. The knight moves that
+are available from every cell are precomputed once per board size and shared
+by all boards of that size.
+"""
+
+from collections import namedtuple
+
+from .isolation import Board
+from .isolation import zobrist_keys
+
+
+DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+              (1, -2),  (1, 2), (2, -1),  (2, 1)]
+
+KnightTables = namedtuple("KnightTables", ["width", "height", "full", "bits",
+                                           "coords", "index", "masks", "moves",
+                                           "move_lists", "shifts"])
+
+_TABLE_CACHE = {}
+
+
+def popcount(mask):
+    """Return the number of set bits in the integer `mask`."""
+    return bin(mask).count("1")
+
+
+def knight_spread(mask, tables):
+    """
+    Return the bitmask of every cell that is one knight move away from any
+    cell in `mask`, computed with one masked shift per move direction.
+    """
+    spread = 0
+    for source, offset in tables.shifts:
+        if offset > 0:
+            spread |= (mask & source) << offset
+        else:
+            spread |= (mask & source) >> -offset
+    return spread
+
+
+def flood_fill(blank, cell, tables):
+    """
+    Return the bitmask of the open cells in `blank` that a knight starting
+    from the cell with index `cell` can reach through open cells.
+    """
+    region = 0
+    frontier = tables.masks[cell] & blank
+    while frontier:
+        region |= frontier
+        frontier = knight_spread(frontier, tables) & blank & ~region
+    return region
+
+
+def iter_cells(mask):
+    """Generate the index of every set bit in `mask`, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def knight_tables(width, height):
+    """
+    Return the precomputed knight-move tables for a board of the given size.
+
+    The tables are built on the first request for each size and cached for
+    the lifetime of the process.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns on the board.
+
+    height : int
+        The number of rows on the board.
+
+    Returns
+    ----------
+    KnightTables
+        A namedtuple with the fields:
+
+        - full: bitmask with one bit set for every cell on the board
+        - bits: list mapping cell index -> single-bit mask
+        - coords: list mapping cell index -> (row, col)
+        - index: dict mapping (row, col) -> cell index
+        - masks: list mapping cell index -> bitmask of knight neighbors
+        - moves: list mapping cell index -> tuple of (bit, (row, col)) pairs
+          for each on-board knight move, in `DIRECTIONS` order
+        - move_lists: list mapping cell index -> dict mapping every subset
+          of the cell's knight neighbors (a bitmask) -> tuple of the
+          (row, col) moves onto those neighbors, in `DIRECTIONS` order
+        - shifts: list of (source mask, offset) pairs, one per direction,
+          where the source mask holds the cells from which the move stays on
+          the board and offset is the change in cell index (see
+          `knight_spread()`)
+    """
+    key = (width, height)
+    tables = _TABLE_CACHE.get(key)
+    if tables is not None:
+        return tables
+
+    size = width * height
+    bits = [1 << i for i in range(size)]
+    coords = [(i % height, i // height) for i in range(size)]
+    index = {loc: i for i, loc in enumerate(coords)}
+    masks = []
+    moves = []
+    for r, c in coords:
+        cell_moves = tuple((bits[(c + dc) * height + r + dr], (r + dr, c + dc))
+                           for dr, dc in DIRECTIONS
+                           if 0 <= r + dr < height and 0 <= c + dc < width)
+        moves.append(cell_moves)
+        mask = 0
+        for bit, _ in cell_moves:
+            mask |= bit
+        masks.append(mask)
+
+    move_lists = []
+    for mask, cell_moves in zip(masks, moves):
+        lists = {}
+        subset = mask
+        while True:
+            lists[subset] = tuple(move for bit, move in cell_moves if subset & bit)
+            if not subset:
+                break
+            subset = (subset - 1) & mask
+        move_lists.append(lists)
+
+    shifts = []
+    for dr, dc in DIRECTIONS:
+        source = 0
+        for i, (r, c) in enumerate(coords):
+            if 0 <= r + dr < height and 0 <= c + dc < width:
+                source |= bits[i]
+        shifts.append((source, dc * height + dr))
+
+    tables = KnightTables(width, height, (1 << size) - 1, bits, coords,
+                          index, masks, moves, move_lists, shifts)
+    _TABLE_CACHE[key] = tables
+    return tables
+
+
+class BitBoard(Board):
+    """
+    Implement the isolation `Board` using a bitmask of open cells.
+
+    The public interface (and the order of the moves returned by every
+    method) is identical to `isolation.Board`, so agents written against
+    `Board` can be used unchanged. `copy()` and `forecast_move()` only copy a
+    handful of integers, and legal moves are read from the precomputed
+    knight tables for the board size.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7):
+        # Board.__init__ is deliberately not called; it would allocate the
+        # list-of-lists state that this class replaces.
+        self.width = width
+        self.height = height
+        self.move_count = 0
+        self.__player_1__ = player_1
+        self.__player_2__ = player_2
+        self.__active_player__ = player_1
+        self.__inactive_player__ = player_2
+        self.__tables__ = knight_tables(width, height)
+        self.__blank_mask__ = self.__tables__.full
+        # Cell indices of the players, swapped on every move like the
+        # players themselves; None until the player has moved
+        self.__active_cell__ = None
+        self.__inactive_cell__ = None
+        self.__move_stack__ = None
+        keys = zobrist_keys(width, height)
+        self.__player_keys__ = {player_1: keys.player_1, player_2: keys.player_2}
+        # The hash changes by the same keys on every move onto a cell, so
+        # they are combined once per game
+        self.__move_keys__ = {player: [blocked ^ key ^ keys.side
+                                       for blocked, key in zip(keys.blocked, player_keys)]
+                              for player, player_keys in self.__player_keys__.items()}
+        self.__hash_value__ = 0
+
+    def __player_cell__(self, player):
+        """ Return the cell index of `player`, or None if it has not moved. """
+        if player == self.__active_player__:
+            return self.__active_cell__
+        if player == self.__inactive_player__:
+            return self.__inactive_cell__
+        raise RuntimeError("`player` must be an object registered as a player in the current game.")
+
+    def copy(self):
+        """ Return a copy of the current board. """
+        new_board = self.__class__.__new__(self.__class__)
+        new_board.__dict__ = self.__dict__.copy()
+        return new_board
+
+    def forecast_move(self, move):
+        """
+        Return a copy of the current game with an input move applied to
+        advance the game one ply.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        ----------
+        `isolation.BitBoard`
+            A copy of the board with the input move applied.
+        """
+        new_board = self.__class__.__new__(self.__class__)
+        new_board.__dict__ = self.__dict__.copy()
+        new_board.apply_move(move)
+        return new_board
+
+    def move_is_legal(self, move):
+        """
+        Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        ----------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        row, col = move
+        return 0 <= row < self.height and \
+               0 <= col < self.width and \
+               bool(self.__blank_mask__ & self.__tables__.bits[col * self.height + row])
+
+    def get_blank_spaces(self):
+        """
+        Return a list of the locations that are still available on the board.
+        """
+        blank = self.__blank_mask__
+        return [loc for bit, loc in zip(self.__tables__.bits, self.__tables__.coords)
+                if blank & bit]
+
+    def get_blank_mask(self):
+        """
+        Return the locations that are still available on the board as an
+        integer bitmask. See `Board.get_blank_mask()`.
+        """
+        return self.__blank_mask__
+
+    def get_player_location(self, player):
+        """
+        Find the current location of the specified player on the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        ----------
+        (int, int)
+            The coordinate pair (row, column) of the input player.
+        """
+        cell = self.__player_cell__(player)
+        if cell is None:
+            return Board.NOT_MOVED
+        return self.__tables__.coords[cell]
+
+    def get_legal_moves(self, player=None):
+        """
+        Return the list of all legal moves for the specified player.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the legal moves for the active player on the board.
+
+        Returns
+        ----------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of all legal moves
+            for the player constrained by the current game state.
+        """
+        if player is None or player == self.__active_player__:
+            cell = self.__active_cell__
+        else:
+            cell = self.__player_cell__(player)
+        if cell is None:
+            return self.get_blank_spaces()
+        return list(self.__tables__.move_lists[cell][self.__tables__.masks[cell] & self.__blank_mask__])
+
+    def count_moves_from(self, loc):
+        """
+        Return the number of open cells that are one knight move away from
+        the cell `loc`. See `Board.count_moves_from()`.
+        """
+        row, col = loc
+        return popcount(self.__tables__.masks[col * self.height + row] & self.__blank_mask__)
+
+    def has_legal_moves(self, player=None):
+        """
+        Test whether the specified player (default: the active player) has at
+        least one legal move, without building the list of moves.
+        """
+        cell = self.__active_cell__ if player is None else self.__player_cell__(player)
+        if cell is None:
+            return bool(self.__blank_mask__)
+        return bool(self.__tables__.masks[cell] & self.__blank_mask__)
+
+    def apply_move(self, move):
+        """
+        Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        ----------
+        None
+        """
+        row, col = move
+        cell = col * self.height + row
+        player = self.__active_player__
+        prev_cell = self.__active_cell__
+        hash_value = self.__hash_value__
+        self.__move_stack__ = (prev_cell, hash_value, self.__move_stack__)
+        hash_value ^= self.__move_keys__[player][cell]
+        if prev_cell is not None:
+            hash_value ^= self.__player_keys__[player][prev_cell]
+        self.__hash_value__ = hash_value
+        self.__blank_mask__ &= ~self.__tables__.bits[cell]
+        self.__active_player__, self.__inactive_player__ = self.__inactive_player__, player
+        self.__active_cell__, self.__inactive_cell__ = self.__inactive_cell__, cell
+        self.move_count += 1
+
+    def undo_move(self):
+        """
+        Revert the most recent call to `apply_move()`. See `Board.undo_move()`.
+
+        Returns
+        ----------
+        (int, int)
+            The move that was undone.
+        """
+        self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
+        cell = self.__inactive_cell__
+        self.__blank_mask__ |= self.__tables__.bits[cell]
+        self.__inactive_cell__ = self.__active_cell__
+        self.__active_cell__, self.__hash_value__, self.__move_stack__ = self.__move_stack__
+        self.move_count -= 1
+        return self.__tables__.coords[cell]
+
+    def is_winner(self, player):
+        """ Test whether the specified player has won the game. """
+        if player != self.__inactive_player__:
+            return False
+        cell = self.__active_cell__
+        return not (self.__blank_mask__ if cell is None else
+                    self.__tables__.masks[cell] & self.__blank_mask__)
+
+    def is_loser(self, player):
+        """ Test whether the specified player has lost the game. """
+        if player != self.__active_player__:
+            return False
+        cell = self.__active_cell__
+        return not (self.__blank_mask__ if cell is None else
+                    self.__tables__.masks[cell] & self.__blank_mask__)
+
+    def utility(self, player):
+        """
+        Returns the utility of the current game state from the perspective
+        of the specified player.
+
+                    /  +infinity,   "player" wins
+        utility =  |   -infinity,   "player" loses
+                    \\          0,    otherwise
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the utility for the active player on the board.
+
+        Returns
+        ----------
+        float
+            The utility value of the current game state for the specified
+            player.
+        """
+        if not self.has_legal_moves():
+
+            if player == self.__inactive_player__:
+                return float("inf")
+
+            if player == self.__active_player__:
+                return float("-inf")
+
+        return 0.
+
+    def to_string(self):
+        """Generate a string representation of the current game state, marking
+        the location of each player and indicating which cells have been
+        blocked, and which remain open.
+        """
+        p1_cell = self.__player_cell__(self.__player_1__)
+        p2_cell = self.__player_cell__(self.__player_2__)
+        blank = self.__blank_mask__
+
+        out = ''
+
+        for i in range(self.height):
+            out += ' | '
+
+            for j in range(self.width):
+                cell = j * self.height + i
+
+                if blank & self.__tables__.bits[cell]:
+                    out += ' '
+                elif cell == p1_cell:
+                    out += '1'
+                elif cell == p2_cell:
+                    out += '2'
+                else:
+                    out += '-'
+
+                out += ' | '
+            out += '\n\r'
+
+        return out
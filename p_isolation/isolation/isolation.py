@@ -8,14 +8,78 @@ remain compatible with the defaults provided, and none of your changes will
 be available to project reviewers.
 """
 
+import random
 import timeit
 
-from copy import deepcopy
+from collections import namedtuple
 from copy import copy
 
 
 TIME_LIMIT_MILLIS = 200
 
+ZOBRIST_SEED = 0x15014710
+
+ZobristKeys = namedtuple("ZobristKeys", ["blocked", "player_1", "player_2", "side"])
+
+_ZOBRIST_CACHE = {}
+
+_NEIGHBOR_CACHE = {}
+
+
+def zobrist_keys(width, height):
+    """
+    Return the Zobrist hashing keys for a board of the given size.
+
+    Keys are drawn from a generator with a fixed seed, so the hash of a
+    position is the same in every process (e.g., for positions stored in an
+    opening book). Cells are indexed in column-major order
+    (index = col * height + row).
+
+    Returns
+    ----------
+    ZobristKeys
+        A namedtuple with a list of 64-bit keys per cell for blocked cells
+        (`blocked`) and for the location of each player (`player_1`,
+        `player_2`), plus a single key (`side`) toggled on every ply.
+    """
+    key = (width, height)
+    keys = _ZOBRIST_CACHE.get(key)
+    if keys is None:
+        rng = random.Random(ZOBRIST_SEED + 1000 * width + height)
+        size = width * height
+        keys = ZobristKeys([rng.getrandbits(64) for _ in range(size)],
+                           [rng.getrandbits(64) for _ in range(size)],
+                           [rng.getrandbits(64) for _ in range(size)],
+                           rng.getrandbits(64))
+        _ZOBRIST_CACHE[key] = keys
+    return keys
+
+
+def knight_neighbors(width, height):
+    """
+    Return the knight moves that stay on a board of the given size from
+    every cell, built on the first request for each size and cached.
+
+    Returns
+    ----------
+    list<tuple<(int, (int, int))>>
+        For every cell index (col * height + row), a tuple of (cell index,
+        (row, col)) pairs for the cells one knight move away.
+    """
+    key = (width, height)
+    neighbors = _NEIGHBOR_CACHE.get(key)
+    if neighbors is None:
+        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                      (1, -2),  (1, 2), (2, -1),  (2, 1)]
+        neighbors = []
+        for cell in range(width * height):
+            r, c = cell % height, cell // height
+            neighbors.append(tuple(((c + dc) * height + r + dr, (r + dr, c + dc))
+                                   for dr, dc in directions
+                                   if 0 <= r + dr < height and 0 <= c + dc < width))
+        _NEIGHBOR_CACHE[key] = neighbors
+    return neighbors
+
 
 class Board(object):
     """
@@ -49,9 +113,53 @@ class Board(object):
         self.__player_2__ = player_2
         self.__active_player__ = player_1
         self.__inactive_player__ = player_2
-        self.__board_state__ = [[Board.BLANK for i in range(width)] for j in range(height)]
+        self.__neighbors__ = knight_neighbors(width, height)
+        self.__cells__ = [[Board.BLANK for i in range(width)] for j in range(height)]
+        # Indexes of the open cells, kept up to date by apply_move() and
+        # undo_move(): a bitmask (bit col * height + row), the number of open
+        # knight neighbors of every cell, and the list of open cells, built
+        # on demand
+        self.__blank_mask__ = (1 << (width * height)) - 1
+        self.__open_counts__ = list(map(len, self.__neighbors__))
+        self.__blank_cache__ = None
         self.__last_player_move__ = {player_1: Board.NOT_MOVED, player_2: Board.NOT_MOVED}
         self.__player_symbols__ = {Board.BLANK: Board.BLANK, player_1: 1, player_2: 2}
+        self.__move_stack__ = []
+        keys = zobrist_keys(width, height)
+        self.__zobrist_keys__ = keys
+        self.__player_keys__ = {player_1: keys.player_1, player_2: keys.player_2}
+        self.__hash_value__ = 0
+
+    @property
+    def __board_state__(self):
+        """
+        The cells of the board as a list of rows, where 0 marks an open cell.
+        """
+        return self.__cells__
+
+    @__board_state__.setter
+    def __board_state__(self, board_state):
+        """
+        Replace the cells of the board and rebuild the indexes of the open
+        cells from them, so that the indexes stay correct when a subclass
+        copies the cells itself.
+        """
+        self.__cells__ = board_state
+        height = self.height
+        neighbors = self.__neighbors__
+        blank = (1 << (self.width * height)) - 1
+        counts = list(map(len, neighbors))
+        for i, row in enumerate(board_state):
+            if any(row):
+                for j, value in enumerate(row):
+                    if value != Board.BLANK:
+                        cell = j * height + i
+                        blank &= ~(1 << cell)
+                        for neighbor, _ in neighbors[cell]:
+                            counts[neighbor] -= 1
+        self.__blank_mask__ = blank
+        self.__open_counts__ = counts
+        self.__blank_cache__ = None
 
     @property
     def active_player(self):
@@ -93,13 +201,13 @@ class Board(object):
 
     def copy(self):
         """ Return a deep copy of the current board. """
-        new_board = Board(self.__player_1__, self.__player_2__, width=self.width, height=self.height)
-        new_board.move_count = self.move_count
-        new_board.__active_player__ = self.__active_player__
-        new_board.__inactive_player__ = self.__inactive_player__
+        new_board = Board.__new__(Board)
+        # Immutable fields and tables are shared, the rest is copied
+        new_board.__dict__ = self.__dict__.copy()
         new_board.__last_player_move__ = copy(self.__last_player_move__)
-        new_board.__player_symbols__ = copy(self.__player_symbols__)
-        new_board.__board_state__ = deepcopy(self.__board_state__)
+        new_board.__cells__ = [row[:] for row in self.__cells__]
+        new_board.__open_counts__ = self.__open_counts__[:]
+        new_board.__move_stack__ = copy(self.__move_stack__)
         return new_board
 
     def forecast_move(self, move):
@@ -145,9 +253,23 @@ class Board(object):
     def get_blank_spaces(self):
         """
         Return a list of the locations that are still available on the board.
+        The locations are cached until the next move, so repeated calls in
+        the same position only copy the list.
+        """
+        if self.__blank_cache__ is None:
+            blank = self.__blank_mask__
+            height = self.height
+            self.__blank_cache__ = [(cell % height, cell // height)
+                                    for cell in range(self.width * height) if blank >> cell & 1]
+        return self.__blank_cache__[:]
+
+    def get_blank_mask(self):
+        """
+        Return the locations that are still available on the board as an
+        integer bitmask, where the cell (row, col) is stored in bit
+        `col * height + row`.
         """
-        return [(i, j) for j in range(self.width) for i in range(self.height)
-            if self.__board_state__[i][j] == Board.BLANK]
+        return self.__blank_mask__
 
     def get_player_location(self, player):
         """
@@ -185,6 +307,29 @@ class Board(object):
             player = self.active_player
         return self.__get_moves__(self.__last_player_move__[player])
 
+    def count_moves_from(self, loc):
+        """
+        Return the number of open cells that are one knight move away from
+        the cell `loc`, i.e., the number of legal moves a player located at
+        `loc` would have in the current game state.
+        """
+        row, col = loc
+        if 0 <= row < self.height and 0 <= col < self.width:
+            return self.__open_counts__[col * self.height + row]
+        return len(self.__get_moves__(loc))
+
+    def has_legal_moves(self, player=None):
+        """
+        Test whether the specified player (default: the active player) has at
+        least one legal move, without building the list of moves.
+        """
+        if player is None:
+            player = self.__active_player__
+        loc = self.__last_player_move__[player]
+        if loc is Board.NOT_MOVED:
+            return bool(self.__blank_mask__)
+        return self.__open_counts__[loc[1] * self.height + loc[0]] > 0
+
     def apply_move(self, move):
         """
         Move the active player to a specified location.
@@ -200,18 +345,95 @@ class Board(object):
         None
         """
         row, col = move
+        prev_move = self.__last_player_move__[self.active_player]
+        self.__move_stack__.append(prev_move)
+        self.__update_hash__(self.active_player, move, prev_move)
         self.__last_player_move__[self.active_player] = move
-        self.__board_state__[row][col] = self.__player_symbols__[self.active_player]
+        self.__cells__[row][col] = self.__player_symbols__[self.active_player]
+        cell = col * self.height + row
+        self.__blank_mask__ &= ~(1 << cell)
+        counts = self.__open_counts__
+        for neighbor, _ in self.__neighbors__[cell]:
+            counts[neighbor] -= 1
+        self.__blank_cache__ = None
         self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
         self.move_count += 1
 
+    def undo_move(self):
+        """
+        Revert the most recent call to `apply_move()`, restoring the previous
+        location of the player that moved and reopening the cell it occupied.
+        Moves can be undone repeatedly in last-in, first-out order, which
+        allows a search to walk the game tree on a single board instead of
+        forecasting a copy for every child.
+
+        Returns
+        ----------
+        (int, int)
+            The move that was undone.
+        """
+        self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
+        move = self.__last_player_move__[self.active_player]
+        row, col = move
+        self.__cells__[row][col] = Board.BLANK
+        cell = col * self.height + row
+        self.__blank_mask__ |= 1 << cell
+        counts = self.__open_counts__
+        for neighbor, _ in self.__neighbors__[cell]:
+            counts[neighbor] += 1
+        self.__blank_cache__ = None
+        prev_move = self.__move_stack__.pop()
+        self.__update_hash__(self.active_player, move, prev_move)
+        self.__last_player_move__[self.active_player] = prev_move
+        self.move_count -= 1
+        return move
+
+    def get_move_history(self):
+        """
+        Return the moves played so far, in order, so that applying them to
+        a new board with the same players and size recreates this position.
+        """
+        board = self.copy()
+        moves = []
+        while board.move_count:
+            moves.append(board.undo_move())
+        return moves[::-1]
+
+    def get_hash(self):
+        """
+        Return the Zobrist hash of the current game state.
+
+        The hash covers the blocked cells, the location of both players and
+        the side to move, and it is updated incrementally by `apply_move()`
+        and `undo_move()`.
+
+        Returns
+        ----------
+        int
+            A 64-bit hash value; equal game states on boards of the same size
+            always have equal hashes.
+        """
+        return self.__hash_value__
+
+    def __update_hash__(self, player, move, prev_move):
+        """
+        Toggle the hash keys for `player` moving from `prev_move` to `move`.
+        Applying the same update twice restores the original hash.
+        """
+        keys = self.__zobrist_keys__
+        player_keys = self.__player_keys__[player]
+        cell = move[1] * self.height + move[0]
+        self.__hash_value__ ^= keys.blocked[cell] ^ player_keys[cell] ^ keys.side
+        if prev_move is not Board.NOT_MOVED:
+            self.__hash_value__ ^= player_keys[prev_move[1] * self.height + prev_move[0]]
+
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
-        return player == self.inactive_player and not self.get_legal_moves(self.active_player)
+        return player == self.inactive_player and not self.has_legal_moves()
 
     def is_loser(self, player):
         """ Test whether the specified player has lost the game. """
-        return player == self.active_player and not self.get_legal_moves(self.active_player)
+        return player == self.active_player and not self.has_legal_moves()
 
     def utility(self, player):
         """
@@ -237,7 +459,7 @@ class Board(object):
             otherwise.
         """
 
-        if not self.get_legal_moves(self.active_player):
+        if not self.has_legal_moves():
 
             if player == self.inactive_player:
                 return float("inf")
@@ -258,12 +480,13 @@ class Board(object):
 
         r, c = move
 
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2),  (1, 2), (2, -1),  (2, 1)]
-
-        valid_moves = [(r+dr,c+dc) for dr, dc in directions if self.move_is_legal((r+dr, c+dc))]
+        if not (0 <= r < self.height and 0 <= c < self.width):
+            directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                          (1, -2),  (1, 2), (2, -1),  (2, 1)]
+            return [(r+dr,c+dc) for dr, dc in directions if self.move_is_legal((r+dr, c+dc))]
 
-        return valid_moves
+        blank = self.__blank_mask__
+        return [loc for cell, loc in self.__neighbors__[c * self.height + r] if blank >> cell & 1]
 
     def print_board(self):
         """DEPRECATED - use Board.to_string()"""
@@ -302,7 +525,9 @@ class Board(object):
     def play(self, time_limit=TIME_LIMIT_MILLIS):
         """
         Execute a match between the players by alternately soliciting them
-        to select a move and applying it in the game.
+        to select a move and applying it in the game. After every move, the
+        other player's on_opponent_move(game, move) function is called with
+        a copy of the game, if the player has one.
 
         Parameters
         ----------
@@ -349,3 +574,9 @@ class Board(object):
                 return self.__inactive_player__, move_history, "illegal move"
 
             self.apply_move(curr_move)
+
+            # Let the next player know the move, e.g., to stop a search on
+            # the opponent's time that expected another move
+            on_opponent_move = getattr(self.active_player, "on_opponent_move", None)
+            if on_opponent_move is not None:
+                on_opponent_move(self.copy(), curr_move)
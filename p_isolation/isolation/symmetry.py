@@ -0,0 +1,196 @@
+"""
+This file contains functions to identify isolation positions that are equal
+up to a symmetry of the board (a rotation or a reflection).
+
+Square boards have the 8 symmetries of the dihedral group; rectangular boards
+only have the 4 that map rows to rows (identity, the two reflections and the
+half turn). A position is identified by the Zobrist hash of the position
+obtained by applying each symmetry (see `isolation.zobrist_keys()`), and the
+smallest of those hashes is the same for every symmetric copy of a position.
+
+The hashes are computed from tables that map each byte of the blocked-cell
+bitmask to the XOR of the Zobrist keys of the transformed cells, so hashing
+all symmetries of a position only takes a few table lookups per symmetry.
+"""
+
+from collections import namedtuple
+
+from .bitboard import knight_tables
+from .isolation import zobrist_keys
+
+
+SymmetryTables = namedtuple("SymmetryTables", ["perms", "inverse", "chunks"])
+
+CHUNK_BITS = 8
+
+_SYMMETRY_CACHE = {}
+
+
+def _transforms(width, height):
+    """Return the list of symmetries of the board as functions that map a
+    (row, col) pair to the transformed (row, col) pair. The identity is
+    always first.
+    """
+    w, h = width - 1, height - 1
+    transforms = [lambda r, c: (r, c),
+                  lambda r, c: (h - r, c),
+                  lambda r, c: (r, w - c),
+                  lambda r, c: (h - r, w - c)]
+    if width == height:
+        transforms += [lambda r, c: (c, r),
+                       lambda r, c: (w - c, h - r),
+                       lambda r, c: (c, h - r),
+                       lambda r, c: (w - c, r)]
+    return transforms
+
+
+def symmetry_tables(width, height):
+    """
+    Return the precomputed symmetry tables for a board of the given size.
+
+    Returns
+    ----------
+    SymmetryTables
+        A namedtuple with the fields:
+
+        - perms: for each symmetry, a list mapping cell index -> index of
+          the transformed cell
+        - inverse: for each symmetry, the index of its inverse symmetry
+        - chunks: for each symmetry and each byte of the blocked-cell
+          bitmask, a list mapping the byte value -> XOR of the Zobrist
+          blocked-cell keys of the transformed cells
+    """
+    key = (width, height)
+    tables = _SYMMETRY_CACHE.get(key)
+    if tables is not None:
+        return tables
+
+    knights = knight_tables(width, height)
+    keys = zobrist_keys(width, height)
+    size = width * height
+
+    perms = [[knights.index[transform(r, c)] for r, c in knights.coords]
+             for transform in _transforms(width, height)]
+    inverse = [next(j for j, other in enumerate(perms)
+                    if all(other[perm[i]] == i for i in range(size)))
+               for perm in perms]
+
+    chunks = []
+    for perm in perms:
+        perm_chunks = []
+        for start in range(0, size, CHUNK_BITS):
+            cells = range(start, min(start + CHUNK_BITS, size))
+            table = [0] * (1 << len(cells))
+            for value in range(1, len(table)):
+                low = value & -value
+                table[value] = table[value ^ low] ^ keys.blocked[perm[start + low.bit_length() - 1]]
+            perm_chunks.append(table)
+        chunks.append(perm_chunks)
+
+    tables = SymmetryTables(perms, inverse, chunks)
+    _SYMMETRY_CACHE[key] = tables
+    return tables
+
+
+def symmetric_hashes(game):
+    """
+    Return the Zobrist hash of every symmetric copy of the position `game`,
+    in the order of `symmetry_tables().perms`. The first hash (identity) is
+    equal to `game.get_hash()`.
+    """
+    tables = symmetry_tables(game.width, game.height)
+    keys = zobrist_keys(game.width, game.height)
+    blocked = knight_tables(game.width, game.height).full & ~game.get_blank_mask()
+    chunk_values = []
+    while blocked:
+        chunk_values.append(blocked & 0xff)
+        blocked >>= CHUNK_BITS
+
+    cell_1 = _player_cell(game, game.__player_1__)
+    cell_2 = _player_cell(game, game.__player_2__)
+    side = keys.side if game.move_count & 1 else 0
+
+    hashes = []
+    for perm, chunks in zip(tables.perms, tables.chunks):
+        value = side
+        for table, chunk in zip(chunks, chunk_values):
+            value ^= table[chunk]
+        if cell_1 is not None:
+            value ^= keys.player_1[perm[cell_1]]
+        if cell_2 is not None:
+            value ^= keys.player_2[perm[cell_2]]
+        hashes.append(value)
+    return hashes
+
+
+def canonical_hash(game, hashes=None):
+    """
+    Return the canonical hash of the position `game`, i.e., the smallest
+    hash over all its symmetric copies, and the index of a symmetry that maps
+    `game` to the copy with that hash. `hashes` may be passed to reuse the
+    result of `symmetric_hashes(game)`.
+
+    Returns
+    ----------
+    (int, int)
+        The canonical hash and the symmetry index.
+    """
+    if hashes is None:
+        hashes = symmetric_hashes(game)
+    value = min(hashes)
+    return value, hashes.index(value)
+
+
+def stabilizer(game, hashes=None):
+    """
+    Return the indices of the symmetries (other than the identity) that map
+    the position `game` onto itself. Moves that are mapped onto each other by
+    these symmetries lead to equivalent positions.
+    """
+    if hashes is None:
+        hashes = symmetric_hashes(game)
+    return [i for i in range(1, len(hashes)) if hashes[i] == hashes[0]]
+
+
+def transform_move(game, move, symmetry):
+    """
+    Return the (row, col) pair obtained by applying the symmetry with index
+    `symmetry` to `move` on a board the size of `game`. The move (-1, -1)
+    (no legal moves) is returned unchanged.
+    """
+    if move is None or move == (-1, -1):
+        return move
+    knights = knight_tables(game.width, game.height)
+    perm = symmetry_tables(game.width, game.height).perms[symmetry]
+    return knights.coords[perm[knights.index[move]]]
+
+
+def inverse_symmetry(game, symmetry):
+    """Return the index of the inverse of the symmetry `symmetry`."""
+    return symmetry_tables(game.width, game.height).inverse[symmetry]
+
+
+def unique_moves(game, moves, hashes=None):
+    """
+    Return the moves from `moves` that lead to distinct positions up to
+    symmetry, keeping the first move of every symmetric group in its
+    original order.
+    """
+    symmetries = stabilizer(game, hashes)
+    if not symmetries:
+        return moves
+    kept = []
+    seen = set()
+    for move in moves:
+        if move in seen:
+            continue
+        kept.append(move)
+        seen.update(transform_move(game, move, t) for t in symmetries)
+    return kept
+
+
+def _player_cell(game, player):
+    loc = game.get_player_location(player)
+    if loc is None:
+        return None
+    return loc[1] * game.height + loc[0]
@@ -0,0 +1,456 @@
+"""
+Play matches between agents that each run in their own subprocess, so that a
+slow, crashing or memory-hungry agent cannot slow down or break the other
+games, and many games can run at once on all CPU cores.
+
+The server runs an asyncio event loop in a background thread. Agents are
+pickled into agent processes (this script run with --agent), which are kept
+between games and restarted if they crash or hang. The server keeps the
+reference board of every game, checks the moves and enforces the time limit:
+the agent measures its own time like `Board.play()` does, and a process that
+does not answer within HARD_TIMEOUT_MARGIN ms after the limit is killed.
+
+Agent processes speak a line protocol on stdin and stdout (anything the
+agent prints goes to stderr):
+
+    server                          agent
+    agent <base64 pickle>           ready <pid>
+    new <seat> <width> <height> <seed>
+    open <row> <col>                (opening move, before the game starts)
+    play <row> <col>                (every move during the game)
+    go <time limit in ms>           move <row> <col> <time left in ms> <cpu ms>
+                                    error <message>
+    quit
+
+tournament.py uses the server with --server; this script plays a quick
+match between two sample agents:
+
+    python match_server.py -n 100 -c 8
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import pickle
+import random
+import sys
+import threading
+import time
+import timeit
+
+from collections import namedtuple
+
+from isolation import BitBoard
+
+HARD_TIMEOUT_MARGIN = 1000  # ms after the time limit before an agent is killed
+STARTUP_TIMEOUT = 30.  # seconds for an agent process to start
+
+AGENT_SCRIPT = os.path.abspath(__file__)
+
+GameResult = namedtuple("GameResult", ["winner", "termination", "wall_time", "cpu_time"])
+
+
+class AgentError(Exception):
+    """An agent process crashed, hung or broke the protocol."""
+    pass
+
+
+def serve_agent(stdin, stdout):
+    """Main loop of an agent process: answer the commands of the server read
+    from `stdin` on `stdout`.
+    """
+    agent = None
+    game = None
+    opponent = "opponent"
+    timer = timeit.default_timer
+
+    def reply(*words):
+        stdout.write(" ".join(str(word) for word in words) + "\n")
+        stdout.flush()
+
+    for line in stdin:
+        words = line.split()
+        if not words:
+            continue
+        command = words[0]
+        if command == "agent":
+            agent = pickle.loads(base64.b64decode(words[1]))
+            reply("ready", os.getpid())
+        elif command == "new":
+            seat, width, height, seed = (int(word) for word in words[1:5])
+            random.seed(seed)
+            players = (agent, opponent) if seat == 1 else (opponent, agent)
+            game = BitBoard(players[0], players[1], width, height)
+        elif command in ("open", "play"):
+            move = (int(words[1]), int(words[2]))
+            mover = game.active_player
+            game.apply_move(move)
+            on_opponent_move = getattr(agent, "on_opponent_move", None)
+            if command == "play" and mover is opponent and on_opponent_move is not None:
+                on_opponent_move(game.copy(), move)
+        elif command == "go":
+            time_limit = float(words[1])
+            cpu_start = time.process_time()
+            move_start = timer()
+            time_left = lambda: time_limit - 1000. * (timer() - move_start)
+            try:
+                move = agent.get_move(game.copy(), game.get_legal_moves(), time_left)
+            except Exception as error:
+                reply("error", repr(error).replace("\n", " "))
+                continue
+            left = time_left()
+            if move is None:
+                move = (-1, -1)
+            reply("move", move[0], move[1], "{:.3f}".format(left),
+                  "{:.3f}".format(1000. * (time.process_time() - cpu_start)))
+        elif command == "quit":
+            break
+    close = getattr(agent, "close", None)
+    if close is not None:
+        close()
+
+
+class AgentProcess(object):
+    """The server side of an agent process.
+
+    Parameters
+    ----------
+    payload : str
+        The agent, pickled and base64 encoded.
+
+    memory_limit : int (optional)
+        The maximum size of the address space of the process in megabytes.
+    """
+
+    def __init__(self, payload, memory_limit=None):
+        self.payload = payload
+        self.memory_limit = memory_limit
+        self.process = None
+        self.pid = None
+        self.killed = False
+
+    async def start(self):
+        """Start the process and send it the agent."""
+        args = [sys.executable, AGENT_SCRIPT, "--agent"]
+        if self.memory_limit is not None:
+            args += ["--memory-limit", str(self.memory_limit)]
+        self.process = await asyncio.create_subprocess_exec(
+            *args, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            cwd=os.path.dirname(AGENT_SCRIPT))
+        self.send("agent", self.payload)
+        words = await self.receive(STARTUP_TIMEOUT)
+        if words[0] != "ready":
+            raise AgentError("Unexpected answer: {}".format(" ".join(words)))
+        self.pid = int(words[1])
+
+    def is_alive(self):
+        return self.process is not None and not self.killed and self.process.returncode is None
+
+    def send(self, *words):
+        """Queue a command; it is sent with the next `get_move()`."""
+        self.process.stdin.write((" ".join(str(word) for word in words) + "\n").encode())
+
+    async def receive(self, timeout):
+        """Return the words of the next line written by the agent."""
+        try:
+            await self.process.stdin.drain()
+            line = await asyncio.wait_for(self.process.stdout.readline(), timeout)
+        except asyncio.TimeoutError:
+            self.kill()
+            raise
+        except ConnectionError:
+            self.kill()
+            raise AgentError("The agent process exited")
+        if not line:
+            self.kill()
+            raise AgentError("The agent process exited")
+        return line.decode().split()
+
+    async def get_move(self, time_limit):
+        """
+        Ask the agent for its move, waiting at most HARD_TIMEOUT_MARGIN ms
+        more than `time_limit`.
+
+        Returns
+        ----------
+        ((int, int), float, float)
+            The move, the time left in ms as measured by the agent, and the
+            CPU time used by the agent process in ms.
+        """
+        self.send("go", time_limit)
+        words = await self.receive((time_limit + HARD_TIMEOUT_MARGIN) / 1000.)
+        if words[0] == "error":
+            raise AgentError(" ".join(words[1:]))
+        if words[0] != "move" or len(words) != 5:
+            self.kill()
+            raise AgentError("Unexpected answer: {}".format(" ".join(words)))
+        return (int(words[1]), int(words[2])), float(words[3]), float(words[4])
+
+    def kill(self):
+        self.killed = True
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+
+    async def close(self):
+        """Ask the process to exit, and kill it if it does not."""
+        if self.process is None:
+            return
+        if self.is_alive():
+            try:
+                self.send("quit")
+                await self.process.stdin.drain()
+                await asyncio.wait_for(self.process.wait(), 5.)
+                return
+            except (asyncio.TimeoutError, ConnectionError):
+                pass
+        self.kill()
+        await self.process.wait()
+
+
+class MatchServer(object):
+    """
+    Play the matches of a tournament between agents in subprocesses.
+
+    Parameters
+    ----------
+    agents : list<Agent>
+        The agents of the tournament (see tournament.py); they must be
+        picklable.
+
+    concurrency : int (optional)
+        The maximum number of games played at once. Wall clock time limits
+        are only fair with at least one CPU core per game.
+
+    time_limit : float (optional)
+        The time limit per move in milliseconds.
+
+    width, height : int (optional)
+        The size of the board.
+
+    memory_limit : int (optional)
+        The maximum size of the address space of every agent process in
+        megabytes (only on systems with the `resource` module).
+    """
+
+    def __init__(self, agents, concurrency=1, time_limit=150, width=7, height=7,
+                 memory_limit=None):
+        self.payloads = [base64.b64encode(pickle.dumps(agent.player)).decode()
+                         for agent in agents]
+        self.concurrency = concurrency
+        self.time_limit = time_limit
+        self.width = width
+        self.height = height
+        self.memory_limit = memory_limit
+        self.loop = None
+        self.idle = {idx: [] for idx in range(len(agents))}
+        self.processes = set()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        """Start the event loop thread (done automatically by `submit()`)."""
+        self.loop = asyncio.new_event_loop()
+        if sys.version_info < (3, 8):
+            # Older child watchers only see processes started by a loop that
+            # was attached to them in the main thread
+            asyncio.get_child_watcher().attach_loop(self.loop)
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self._call(self._setup())
+
+    def close(self):
+        """Stop the agent processes and the event loop."""
+        if self.loop is None:
+            return
+        self._call(self._shutdown())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = None
+
+    def submit(self, task):
+        """
+        Start playing the match `task` = (index of player 1, index of player
+        2, seed) in the background, as `tournament.play_games()` would.
+
+        Returns
+        ----------
+        concurrent.futures.Future
+            The future `tournament.MatchResult` of the match; its `pid` is
+            the pid of the server, and its wall and CPU times are those of
+            the agents while they were on the clock.
+        """
+        if self.loop is None:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(self._play_match(*task), self.loop)
+
+    def play_matches(self, tasks):
+        """Play all the matches in `tasks` and return their results in order."""
+        futures = [self.submit(task) for task in tasks]
+        return [future.result() for future in futures]
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def _setup(self):
+        self.slots = asyncio.Semaphore(self.concurrency)
+
+    async def _shutdown(self):
+        processes = list(self.processes)
+        self.processes.clear()
+        for idle in self.idle.values():
+            del idle[:]
+        await asyncio.gather(*[process.close() for process in processes])
+
+    async def _acquire(self, idx):
+        """Return an idle process of agent `idx`, starting one if needed."""
+        while self.idle[idx]:
+            process = self.idle[idx].pop()
+            if process.is_alive():
+                return process
+        process = AgentProcess(self.payloads[idx], self.memory_limit)
+        self.processes.add(process)
+        await process.start()
+        return process
+
+    def _release(self, idx, process):
+        # Dead processes stay in `processes` until they are reaped by close()
+        if process.is_alive():
+            self.idle[idx].append(process)
+
+    async def _play_match(self, idx_1, idx_2, seed):
+        # Imported here so that tournament.py can import this module
+        from tournament import MatchResult
+        rng = random.Random(seed)
+        board = BitBoard("Player1", "Player2", self.width, self.height)
+        opening = []
+        for _ in range(2):
+            move = rng.choice(board.get_legal_moves())
+            board.apply_move(move)
+            opening.append(move)
+
+        games = await asyncio.gather(self._play_game((idx_1, idx_2), opening, seed),
+                                     self._play_game((idx_2, idx_1), opening, seed))
+        wins = [0, 0]
+        timeouts = [0, 0]
+        invalid_moves = [0, 0]
+        for game, first in zip(games, (0, 1)):
+            # Index of the winner in (idx_1, idx_2) order
+            winner = game.winner if first == 0 else 1 - game.winner
+            wins[winner] += 1
+            if game.termination == "timeout":
+                timeouts[1 - winner] += 1
+            else:
+                invalid_moves[1 - winner] += 1
+        return MatchResult(tuple(wins), tuple(timeouts), tuple(invalid_moves), os.getpid(),
+                           sum(game.wall_time for game in games),
+                           sum(game.cpu_time for game in games), (None, None))
+
+    async def _play_game(self, indices, opening, seed):
+        """Play one game between the agents `indices` (player 1 first) and
+        return its `GameResult`, where `winner` is 0 or 1.
+        """
+        async with self.slots:
+            processes = []
+            try:
+                for idx in indices:
+                    processes.append(await self._acquire(idx))
+                return await self._run_game(processes, opening, seed)
+            finally:
+                for idx, process in zip(indices, processes):
+                    self._release(idx, process)
+
+    async def _run_game(self, processes, opening, seed):
+        game = BitBoard("Player1", "Player2", self.width, self.height)
+        for seat, process in enumerate(processes):
+            process.send("new", seat + 1, self.width, self.height, seed)
+        for move in opening:
+            game.apply_move(move)
+            for process in processes:
+                process.send("open", *move)
+
+        wall_time = 0.
+        cpu_time = 0.
+        while True:
+            seat = 0 if game.active_player == "Player1" else 1
+            legal_moves = game.get_legal_moves()
+            if not legal_moves:
+                return GameResult(1 - seat, "illegal move", wall_time, cpu_time)
+            try:
+                move, time_left, cpu_ms = await processes[seat].get_move(self.time_limit)
+            except asyncio.TimeoutError:
+                return GameResult(1 - seat, "timeout", wall_time, cpu_time)
+            except AgentError:
+                return GameResult(1 - seat, "error", wall_time, cpu_time)
+            wall_time += (self.time_limit - time_left) / 1000.
+            cpu_time += cpu_ms / 1000.
+            if time_left < 0:
+                return GameResult(1 - seat, "timeout", wall_time, cpu_time)
+            if move not in legal_moves:
+                return GameResult(1 - seat, "illegal move", wall_time, cpu_time)
+            game.apply_move(move)
+            for process in processes:
+                process.send("play", *move)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agent", action="store_true",
+                        help="run as an agent process (used by the server)")
+    parser.add_argument("--memory-limit", type=int, default=None,
+                        help="address space limit of agent processes in MB")
+    parser.add_argument("-n", "--matches", type=int, default=20,
+                        help="number of matches (two games each) to play")
+    parser.add_argument("-c", "--concurrency", type=int, default=os.cpu_count(),
+                        help="number of games played at once")
+    parser.add_argument("-t", "--time-limit", type=float, default=150,
+                        help="time limit per move in milliseconds")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+                        help="seed for the random openings")
+    args = parser.parse_args()
+
+    if args.agent:
+        if args.memory_limit is not None:
+            import resource
+            limit = args.memory_limit * 2 ** 20
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        # Keep the protocol stream free of anything the agent prints
+        protocol = sys.stdout
+        sys.stdout = sys.stderr
+        serve_agent(sys.stdin, protocol)
+        return
+
+    from game_agent import CustomPlayer
+    from sample_players import improved_score
+    from tournament import Agent
+    from tournament import check_cpu_share
+    agents = [Agent(CustomPlayer(score_fn=improved_score, method="alphabeta",
+                                 in_place=True), "ID_Improved"),
+              Agent(CustomPlayer(search_depth=3, score_fn=improved_score, method="alphabeta",
+                                 iterative=False, in_place=True), "AB_Improved")]
+    rng = random.Random(args.seed)
+    tasks = [(0, 1, rng.getrandbits(32)) for _ in range(args.matches)]
+    start = timeit.default_timer()
+    with MatchServer(agents, args.concurrency, args.time_limit,
+                     memory_limit=args.memory_limit) as server:
+        results = server.play_matches(tasks)
+    elapsed = timeit.default_timer() - start
+    wins = [sum(result.wins[i] for result in results) for i in range(2)]
+    print("{} {} - {} {} in {:.1f} s ({:.2f} games/s)".format(
+        agents[0].name, wins[0], wins[1], agents[1].name, elapsed, 2 * len(tasks) / elapsed))
+    print("timeouts: {}  invalid moves: {}".format(
+        sum(sum(result.timeouts) for result in results),
+        sum(sum(result.invalid_moves) for result in results)))
+    check_cpu_share(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""This file contains `MCTSPlayer`, an agent that chooses its moves with Monte
+Carlo tree search (UCT), optionally with RAVE (rapid action value estimation).
+
+The search never copies the board: the tree and the random playouts work on
+the compact state of the game, i.e., the bitmask of open cells and the cell
+index of each player (see `isolation.bitboard.knight_tables()`). The tree is
+kept between moves, so the subtree below the move played and the opponent's
+reply is reused by the next search.
+
+A player can only visit a cell once, so the all-moves-as-first (AMAF)
+statistics used by RAVE are a bitmask test: a move onto cell c is credited
+with the result of every simulation from the node in which the player to move
+entered c later on.
+"""
+
+import math
+import random
+import timeit
+
+from isolation.bitboard import iter_cells
+from isolation.bitboard import knight_tables
+from isolation.bitboard import popcount
+from search_stats import SearchStats
+
+
+class MCTSNode(object):
+    """A node of the search tree.
+
+    Attributes
+    ----------
+    cell : int
+        The cell entered by the move that leads to this node (None for a root
+        that is the start of the game).
+
+    children : list<MCTSNode>
+        The nodes after each legal move, or None until the node is expanded.
+
+    visits, wins : int, float
+        The number of simulations through this node, and the number of them
+        won by the player who moved into this node.
+
+    amaf_visits, amaf_wins : int, float
+        The same counts over the simulations from the parent in which the
+        player moving into this node entered `cell` at any later point.
+    """
+
+    def __init__(self, cell):
+        self.cell = cell
+        self.children = None
+        self.visits = 0
+        self.wins = 0.
+        self.amaf_visits = 0
+        self.amaf_wins = 0.
+
+
+class MCTSPlayer(object):
+    """Game-playing agent that chooses a move with Monte Carlo tree search.
+
+    Parameters
+    ----------
+    exploration : float (optional)
+        The exploration constant of the UCT formula.
+
+    rave : boolean (optional)
+        Flag indicating whether to mix AMAF statistics into the value of the
+        moves (RAVE).
+
+    rave_equivalence : float (optional)
+        The number of simulations at which the AMAF value and the UCT value of
+        a move have the same weight.
+
+    timeout : float (optional)
+        Time remaining (in milliseconds) when search is aborted. Should be a
+        positive value large enough to allow the function to return before
+        the timer expires.
+
+    seed : int (optional)
+        Seed of the random number generator used by the playouts.
+
+    stats_callback : callable (optional)
+        A function called with the `search_stats.SearchStats` of every call
+        to get_move() before it returns, in which `nodes` is the number of
+        simulations and `depth` the depth of the most visited line.
+    """
+
+    def __init__(self, exploration=1.0, rave=False, rave_equivalence=300.,
+                 timeout=10., seed=None, stats_callback=None):
+        self.exploration = exploration
+        self.rave = rave
+        self.rave_equivalence = rave_equivalence
+        self.TIMER_THRESHOLD = timeout
+        self.rng = random.Random(seed)
+        self.root = None
+        self.root_state = None
+        self.stats = SearchStats()
+        self.stats_callback = stats_callback
+
+    def get_move(self, game, legal_moves, time_left):
+        """Run simulations from the current position until the timer is about
+        to expire and return the most visited move.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        legal_moves : list<(int, int)>
+            A list containing legal moves. Moves are encoded as tuples of pairs
+            of ints defining the next (row, col) for the agent to occupy.
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        ----------
+        (int, int)
+            Board coordinates corresponding to a legal move; may return
+            (-1, -1) if there are no available legal moves.
+        """
+        self.stats = SearchStats()
+        start = timeit.default_timer()
+        try:
+            if not legal_moves:
+                self.stats.source = "none"
+                return (-1, -1)
+            self.tables = knight_tables(game.width, game.height)
+            state = self.game_state(game)
+            root = self.reuse_tree(state)
+            if len(legal_moves) > 1:
+                while time_left() > self.TIMER_THRESHOLD:
+                    self.simulate(root, state)
+                    self.stats.nodes += 1
+            if not root.children:
+                self.expand(root, state)
+            best = max(root.children, key=lambda child: child.visits)
+            self.stats.depth = self.principal_depth(best)
+            self.root = best
+            self.root_state = self.play(state, best.cell)
+            return self.tables.coords[best.cell]
+        finally:
+            self.stats.time = timeit.default_timer() - start
+            if self.stats_callback is not None:
+                self.stats_callback(self.stats)
+
+    def game_state(self, game):
+        """Return the compact state (blank, active cell, inactive cell) of
+        `game`; a cell is None if the player has not moved yet.
+        """
+        cells = []
+        for player in (game.active_player, game.inactive_player):
+            loc = game.get_player_location(player)
+            cells.append(None if loc is None else self.tables.index[loc])
+        return game.get_blank_mask(), cells[0], cells[1]
+
+    def play(self, state, cell):
+        """Return the state after the active player of `state` moves to `cell`."""
+        blank, active, inactive = state
+        return blank & ~self.tables.bits[cell], inactive, cell
+
+    def reuse_tree(self, state):
+        """Return the node of the tree kept from the last move that matches
+        `state` (after the opponent's reply), or a new root.
+        """
+        root, self.root = self.root, None
+        if root is not None and root.children and self.root_state[2] == state[1]:
+            for child in root.children:
+                if self.play(self.root_state, child.cell) == state:
+                    return child
+        return MCTSNode(state[2])
+
+    def expand(self, node, state):
+        """Create the children of `node`, whose position is `state`."""
+        blank, active, _ = state
+        moves = blank if active is None else self.tables.masks[active] & blank
+        node.children = [MCTSNode(cell) for cell in iter_cells(moves)]
+
+    def select(self, node):
+        """Return the child of `node` with the highest UCT (or RAVE) value;
+        children that have not been visited are selected first.
+        """
+        log_visits = math.log(node.visits)
+        best_value, best_child = float("-inf"), None
+        for child in node.children:
+            if not child.visits:
+                return child
+            value = child.wins / child.visits
+            if self.rave and child.amaf_visits:
+                beta = math.sqrt(self.rave_equivalence /
+                                 (3 * child.visits + self.rave_equivalence))
+                value = (1 - beta) * value + beta * child.amaf_wins / child.amaf_visits
+            value += self.exploration * math.sqrt(log_visits / child.visits)
+            if value > best_value:
+                best_value, best_child = value, child
+        return best_child
+
+    def simulate(self, root, state):
+        """Run one simulation from `root`, whose position is `state`: select
+        a path down the tree, expand its last node, finish the game with a
+        random playout and update the statistics along the path.
+        """
+        bits = self.tables.bits
+        blank, active, inactive = state
+        node = root
+        path = [root]
+        while node.children:
+            node = self.select(node)
+            blank &= ~bits[node.cell]
+            active, inactive = inactive, node.cell
+            path.append(node)
+        if node.children is None and node.visits:
+            self.expand(node, (blank, active, inactive))
+            if node.children:
+                node = self.rng.choice(node.children)
+                blank &= ~bits[node.cell]
+                active, inactive = inactive, node.cell
+                path.append(node)
+
+        # `visited` holds the cells entered after the current node by the
+        # player to move at the node, and by the other player; `win` is 1 if
+        # the player to move at the node won
+        own, other, won = self.playout(blank, active, inactive)
+        visited = [own, other]
+        win = 1. if won else 0.
+        for node in reversed(path):
+            node.visits += 1
+            node.wins += 1. - win
+            if self.rave and node.children:
+                for child in node.children:
+                    if visited[0] & bits[child.cell]:
+                        child.amaf_visits += 1
+                        child.amaf_wins += win
+            visited = [visited[1] | bits[node.cell] if node.cell is not None else visited[1],
+                       visited[0]]
+            win = 1. - win
+
+    def playout(self, blank, active, inactive):
+        """
+        Finish the game from the given state with uniformly random moves.
+
+        Returns
+        ----------
+        (int, int, bool)
+            The bitmasks of the cells entered by the active player and by the
+            other player, and True if the active player won.
+        """
+        masks = self.tables.masks
+        randrange = self.rng.randrange
+        entered = [0, 0]
+        turn = 0
+        while True:
+            moves = blank if active is None else masks[active] & blank
+            if not moves:
+                return entered[0], entered[1], turn == 1
+            # Clear a random number of low bits to pick a random move
+            for _ in range(randrange(popcount(moves))):
+                moves &= moves - 1
+            bit = moves & -moves
+            blank ^= bit
+            entered[turn] |= bit
+            active, inactive = inactive, bit.bit_length() - 1
+            turn ^= 1
+
+    def principal_depth(self, node):
+        """Return the length of the most visited line from `node`."""
+        depth = 1
+        while node.children:
+            node = max(node.children, key=lambda child: child.visits)
+            if not node.visits:
+                break
+            depth += 1
+        return depth
@@ -0,0 +1,132 @@
+"""This file contains the move ordering heuristics used by `CustomPlayer`
+during alphabeta search. Searching the strongest moves first makes cutoffs
+happen earlier, so fewer nodes are needed to reach the same depth.
+
+Plies are identified by the absolute move count of the game (i.e.,
+`game.move_count`) rather than the distance from the search root, so the
+principal variation and killer moves do not depend on how the search was
+started.
+"""
+
+
+class MoveOrderer(object):
+    """Order the legal moves of a node for alphabeta search.
+
+    Moves are tried in the following order:
+
+    1. the move from the principal variation (PV) of the previous iterative
+       deepening pass
+    2. the best move from the transposition table, if any
+    3. killer moves, i.e., moves that recently caused a cutoff at this ply
+    4. all other moves, sorted by their history score (the total depth of
+       the subtrees they have cut off), with ties broken by the mobility of
+       the destination cell when `mobility=True`
+
+    Parameters
+    ----------
+    num_killers : int (optional)
+        The number of killer moves to remember per ply.
+
+    mobility : boolean (optional)
+        Flag indicating whether to pre-sort moves by the number of open cells
+        reachable from the destination cell.
+    """
+
+    def __init__(self, num_killers=2, mobility=False):
+        self.num_killers = num_killers
+        self.mobility = mobility
+        self.pv = {}
+        self.lines = {}
+        self.killers = {}
+        self.history = {}
+        self.reset_counters()
+
+    def reset_counters(self):
+        """Reset the node and cutoff counters."""
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    @property
+    def cutoff_rate(self):
+        """Fraction of the searched interior nodes that produced a cutoff."""
+        return self.cutoffs / self.nodes if self.nodes else 0.
+
+    @property
+    def first_move_cutoff_rate(self):
+        """Fraction of the cutoffs that were produced by the first move
+        searched; values close to 1 indicate near-perfect ordering.
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.
+
+    def new_search(self):
+        """Prepare for a new call to get_move(). Killer moves are forgotten
+        and history scores are halved so recent results dominate; the last
+        PV is kept, since it remains valid if the opponent played the
+        predicted reply.
+        """
+        self.killers = {}
+        self.lines = {}
+        for key in self.history:
+            self.history[key] //= 2
+
+    def end_iteration(self, game):
+        """Save the PV found by the iterative deepening pass that just
+        completed from the root position `game`.
+        """
+        ply = game.move_count
+        self.pv = {ply + i: move for i, move in enumerate(self.lines.get(ply, []))}
+
+    def start_node(self, game):
+        """Register the start of the search of the interior node `game`."""
+        self.lines[game.move_count] = []
+        self.nodes += 1
+
+    def order(self, game, moves, hash_move=None):
+        """Return the list `moves` sorted in the order they should be
+        searched from the position `game`.
+        """
+        ply = game.move_count
+        if self.mobility:
+            moves = sorted(moves, key=game.count_moves_from, reverse=True)
+
+        pv_move = self.pv.get(ply)
+        killers = self.killers.get(ply, ())
+        history = self.history
+        side = ply & 1
+
+        def priority(move):
+            if move == pv_move:
+                return 3, 0
+            if move == hash_move:
+                return 2, 0
+            if move in killers:
+                return 1, -killers.index(move)
+            return 0, history.get((side, move), 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def update_pv(self, game, move, depth):
+        """Record `move` as the new best move at the node `game`, extending
+        it with the PV of the child searched to `depth` - 1 plies.
+        """
+        ply = game.move_count
+        child_line = self.lines.get(ply + 1, []) if depth > 1 else []
+        self.lines[ply] = [move] + child_line
+
+    def record_cutoff(self, game, move, depth, index):
+        """Update the killer and history tables after `move` (the `index`-th
+        move searched at the node `game`) caused a cutoff.
+        """
+        ply = game.move_count
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[self.num_killers:]
+
+        key = (ply & 1, move)
+        self.history[key] = self.history.get(key, 0) + depth * depth
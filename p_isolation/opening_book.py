@@ -0,0 +1,98 @@
+"""
+Read and write opening books for `CustomPlayer`.
+
+An opening book stores the best move found by a deep offline search for
+every position in the first few plies of the game. Positions are reduced by
+symmetry (see `isolation.symmetry`), so each book entry covers every
+symmetric copy of a position, and the moves are stored for the canonical
+copy.
+
+Books are built with `build_opening_book.py`.
+
+The book file is a small header followed by fixed-size records (position
+hash, move, search depth and score) sorted by hash.
+"""
+
+import struct
+
+from isolation.bitboard import knight_tables
+from isolation.symmetry import canonical_hash
+from isolation.symmetry import inverse_symmetry
+from isolation.symmetry import transform_move
+
+HEADER = struct.Struct("<4sBBB")
+RECORD = struct.Struct("<QBBf")
+MAGIC = b"ISOB"
+
+
+class OpeningBook(object):
+    """
+    Lookup table from canonical position hashes to the best move found by an
+    offline search.
+
+    Parameters
+    ----------
+    width, height : int
+        The size of the board the book was built for.
+
+    plies : int
+        Positions with fewer than `plies` moves played are in the book.
+
+    entries : dict (optional)
+        Mapping from canonical position hash to a (cell, depth, score)
+        tuple, where `cell` is the index (col * height + row) of the best
+        move for the canonical copy of the position.
+    """
+
+    def __init__(self, width, height, plies, entries=None):
+        self.width = width
+        self.height = height
+        self.plies = plies
+        self.entries = entries if entries is not None else {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def load(cls, path):
+        """Read the book stored in the file `path`."""
+        with open(path, "rb") as book_file:
+            data = book_file.read()
+        magic, width, height, plies = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("{} is not an opening book file".format(path))
+        entries = {}
+        for offset in range(HEADER.size, len(data), RECORD.size):
+            key, cell, depth, score = RECORD.unpack_from(data, offset)
+            entries[key] = (cell, depth, score)
+        return cls(width, height, plies, entries)
+
+    def save(self, path):
+        """Write the book to the file `path`."""
+        with open(path, "wb") as book_file:
+            book_file.write(HEADER.pack(MAGIC, self.width, self.height, self.plies))
+            for key in sorted(self.entries):
+                book_file.write(RECORD.pack(key, *self.entries[key]))
+
+    def add(self, game, move, depth, score):
+        """Record `move` as the best move found by a search of the position
+        `game` to `depth` plies.
+        """
+        key, symmetry = canonical_hash(game)
+        row, col = transform_move(game, move, symmetry)
+        self.entries[key] = (col * self.height + row, depth, score)
+
+    def lookup(self, game):
+        """
+        Return the book move for the position `game`, or None if the
+        position is not in the book.
+        """
+        if game.move_count >= self.plies or \
+                (game.width, game.height) != (self.width, self.height):
+            return None
+        key, symmetry = canonical_hash(game)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        move = knight_tables(self.width, self.height).coords[entry[0]]
+        return transform_move(game, move, inverse_symmetry(game, symmetry))
@@ -0,0 +1,130 @@
+"""
+Measure the depth reached by the root-splitting parallel search of
+`CustomPlayer` (see `parallel_search.py`) for several numbers of workers.
+
+Two measurements are reported for every number of workers:
+
+- measured: the mean depth completed by `CustomPlayer(workers=k).get_move()`
+  within the time limit. This is only meaningful with at least k free CPU
+  cores; with fewer cores the workers share them.
+- estimated: the mean depth that every worker completes within the time limit
+  when each worker's share of the root moves is searched on its own, one
+  after the other, in this process. This is the depth k workers would reach
+  with one dedicated core each, and it can be measured on any machine.
+
+Both searches use principal variation search with a transposition table and
+move ordering, as the Student agent in tournament.py does, on positions from
+random games.
+"""
+
+import argparse
+import multiprocessing
+import random
+import timeit
+
+from isolation import BitBoard
+from game_agent import CustomPlayer
+from game_agent import Timeout
+from game_agent import custom_score
+from parallel_search import search_root_moves
+from parallel_search import split_moves
+
+TIME_LIMIT = 150  # milliseconds per move, as in tournament.py
+SEARCH_ARGS = dict(score_fn=custom_score, method="pvs", in_place=True,
+                   tt_size=2 ** 16, ordering=True)
+
+
+def random_positions(count, plies, seed):
+    """Return `count` positions after `plies` random moves that have at least
+    two legal moves.
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = BitBoard("Player1", "Player2")
+        for _ in range(rng.choice(plies)):
+            moves = game.get_legal_moves()
+            if not moves:
+                break
+            game.apply_move(rng.choice(moves))
+        if len(game.get_legal_moves()) > 1:
+            positions.append(game)
+    return positions
+
+
+def rebind(game, agent):
+    """Return a copy of `game` in which the active player is `agent`."""
+    players = (agent, "opponent") if game.active_player == "Player1" else ("opponent", agent)
+    board = BitBoard(players[0], players[1], game.width, game.height)
+    for move in game.get_move_history():
+        board.apply_move(move)
+    return board
+
+
+def measured_depth(agent, game, time_limit):
+    """Return the depth completed by a real parallel search of `game` by
+    `agent`, whose workers are already running.
+    """
+    board = rebind(game, agent)
+    # get_move() stops searching when TIMER_THRESHOLD ms are left
+    end = timeit.default_timer() + (time_limit + agent.TIMER_THRESHOLD) / 1000.
+    agent.get_move(board, board.get_legal_moves(),
+                   lambda: 1000. * (end - timeit.default_timer()))
+    return agent.stats.depth
+
+
+def estimated_depth(game, workers, time_limit):
+    """Return the deepest iteration completed within `time_limit` ms by every
+    worker's share of the root moves, each searched on its own.
+    """
+    depths = []
+    for moves in split_moves(game.get_legal_moves(), workers):
+        agent = CustomPlayer(timeout=0., **SEARCH_ARGS)
+        board = rebind(game, agent)
+        end = timeit.default_timer() + time_limit / 1000.
+        agent.time_left = lambda: 1000. * (end - timeit.default_timer())
+        completed = [0]
+        try:
+            search_root_moves(agent, board, moves,
+                              lambda depth, score, move, nodes: completed.append(depth))
+        except Timeout:
+            pass
+        depths.append(completed[-1])
+    return min(depths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="numbers of workers to compare")
+    parser.add_argument("-n", "--positions", type=int, default=20,
+                        help="number of test positions")
+    parser.add_argument("-t", "--time-limit", type=float, default=TIME_LIMIT - 10,
+                        help="search time per position in milliseconds")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+                        help="seed for the random test positions")
+    parser.add_argument("--estimate-only", action="store_true",
+                        help="skip the measurement with real worker processes")
+    args = parser.parse_args()
+
+    positions = random_positions(args.positions, (6, 12, 18), args.seed)
+    print("{} positions, {:.0f} ms per move, {} CPU cores".format(
+        len(positions), args.time_limit, multiprocessing.cpu_count()))
+    print("{:>8} {:>10} {:>10}".format("workers", "estimated", "measured"))
+    for workers in args.workers:
+        estimated = [estimated_depth(game, workers, args.time_limit) for game in positions]
+        line = "{:>8} {:>10.2f}".format(workers, sum(estimated) / float(len(estimated)))
+        if not args.estimate_only:
+            agent = CustomPlayer(workers=workers, **SEARCH_ARGS)
+            agent.parallel.start()
+            try:
+                measured = [measured_depth(agent, game, args.time_limit) for game in positions]
+            finally:
+                agent.close()
+            line += " {:>10.2f}".format(sum(measured) / float(len(measured)))
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
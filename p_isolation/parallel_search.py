@@ -0,0 +1,225 @@
+"""This file contains the root-splitting parallel search used by
+`CustomPlayer` when it is created with `workers` > 0.
+
+The legal moves at the root are split between worker processes. Every worker
+runs its own iterative deepening search (with its own transposition table) on
+its share of the moves and reports the best move and score of its share after
+each completed depth. The results are merged at the root: the chosen move is
+the best move of the deepest iteration completed by every worker.
+
+Workers are separate processes, so they are started once and reused for every
+move; positions are sent to them as the list of moves played so far, and all
+searches stop at a wall clock deadline derived from `time_left`.
+
+Every worker gets at least one root move, and a knight has at most 8 moves,
+so workers beyond the number of legal moves stay idle for that move.
+Splitting the root moves also loses the cutoffs that the best move found so
+far would produce in the other moves' subtrees; `parallel_benchmark.py`
+measures the resulting gain in depth.
+"""
+
+import multiprocessing
+import queue
+import time
+
+# Deadlines are compared between processes, so they use the system clock
+clock = time.time
+
+
+def split_moves(moves, num_parts):
+    """Deal `moves` round-robin into at most `num_parts` non-empty lists."""
+    parts = [moves[i::num_parts] for i in range(num_parts)]
+    return [part for part in parts if part]
+
+
+def search_root_moves(agent, game, moves, report, max_depth=None):
+    """
+    Run an iterative deepening search by `agent` (which must be the active
+    player of `game`) restricted to the root moves `moves`, calling
+    `report(depth, score, move, nodes)` after every completed depth. The
+    search uses the agent's method: 'pvs' searches the moves after the first
+    with null windows and each depth with an aspiration window around the
+    score of the previous depth (see `CustomPlayer.pvs()`), and any other
+    method uses plain alphabeta. The search stops when the agent's timer
+    expires, the result is a proven win, or the depth reaches `max_depth`
+    (by default the number of open cells).
+    """
+    if max_depth is None:
+        max_depth = len(game.get_blank_spaces())
+    inf = float("inf")
+    score = None
+    for depth in range(1, max_depth + 1):
+        if agent.method == "pvs" and score not in (None, inf, -inf):
+            alpha, beta = score - agent.aspiration, score + agent.aspiration
+            score, move = _search_moves(agent, game, moves, depth, alpha, beta)
+            if score <= alpha:
+                agent.stats.researches += 1
+                score, move = _search_moves(agent, game, moves, depth, -inf, beta)
+            elif score >= beta:
+                agent.stats.researches += 1
+                score, move = _search_moves(agent, game, moves, depth, alpha, inf)
+        else:
+            score, move = _search_moves(agent, game, moves, depth, -inf, inf)
+        report(depth, score, move, agent.stats.nodes)
+        if score == inf:
+            return
+
+
+def _search_moves(agent, game, moves, depth, alpha, beta):
+    """Search the root moves `moves` of `game` to `depth` plies with the
+    window (alpha, beta) and return the best (score, move) pair.
+    """
+    # Imported here since game_agent imports this module
+    from game_agent import null_window
+    use_pvs = agent.method == "pvs"
+    best_score, best_move = float("-inf"), moves[0]
+    for index, move in enumerate(moves):
+        window = null_window(alpha, beta, True) if use_pvs and index > 0 else None
+        if window is not None:
+            v, _ = agent._search_child(agent.alphabeta, game, move, depth - 1,
+                                       window[0], window[1], False)
+            if alpha < v < beta:
+                agent.stats.researches += 1
+                v, _ = agent._search_child(agent.alphabeta, game, move, depth - 1,
+                                           alpha, beta, False)
+        else:
+            v, _ = agent._search_child(agent.alphabeta, game, move, depth - 1,
+                                       alpha, beta, False)
+        if v > best_score:
+            best_score, best_move = v, move
+        if best_score >= beta:
+            break
+        alpha = max(alpha, best_score)
+    return best_score, best_move
+
+
+def _worker_main(agent_args, tasks, results):
+    """Main loop of a worker process: search the tasks sent by the root."""
+    # Imported here so that the module can be imported by game_agent
+    from game_agent import CustomPlayer
+    from game_agent import Timeout
+    agent = CustomPlayer(**agent_args)
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        task_id, index, board_cls, width, height, seat, history, moves, deadline = task
+        players = (agent, "opponent") if seat == 0 else ("opponent", agent)
+        game = board_cls(players[0], players[1], width, height)
+        for move in history:
+            game.apply_move(move)
+        agent.time_left = lambda: 1000. * (deadline - clock())
+        agent.stats.nodes = 0
+        if agent.tt is not None:
+            if game.move_count <= agent.last_move_count or seat != agent.last_seat:
+                agent.tt.clear()
+            agent.last_move_count = game.move_count
+            agent.last_seat = seat
+            agent.tt.new_search()
+        if agent.orderer is not None:
+            agent.orderer.new_search()
+
+        def report(depth, score, move, nodes):
+            results.put((task_id, index, depth, (score, move), nodes))
+
+        # The final message tells whether the search ended before the
+        # deadline, i.e., whether the last result is final
+        finished = True
+        try:
+            search_root_moves(agent, game, moves, report)
+        except Timeout:
+            finished = False
+        results.put((task_id, index, None, finished, agent.stats.nodes))
+
+
+class RootSplitSearch(object):
+    """Pool of worker processes that search disjoint sets of root moves.
+
+    Parameters
+    ----------
+    num_workers : int
+        The number of worker processes.
+
+    agent_args : dict
+        Keyword arguments of the `CustomPlayer` created in every worker.
+    """
+
+    def __init__(self, num_workers, agent_args):
+        self.num_workers = num_workers
+        self.agent_args = dict(agent_args, timeout=0.)
+        self.processes = []
+        self.task_id = 0
+
+    def start(self):
+        """Start the worker processes (done automatically by `search()`)."""
+        self.tasks = [multiprocessing.Queue() for _ in range(self.num_workers)]
+        self.results = multiprocessing.Queue()
+        for tasks in self.tasks:
+            process = multiprocessing.Process(target=_worker_main,
+                                              args=(self.agent_args, tasks, self.results))
+            process.daemon = True
+            process.start()
+            self.processes.append(process)
+
+    def close(self):
+        """Stop the worker processes."""
+        for tasks in self.tasks if self.processes else []:
+            tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.processes = []
+
+    def search(self, game, player, legal_moves, deadline):
+        """
+        Search the position `game` for `player` (the active player) until
+        the system clock reaches `deadline`, or until every worker has
+        finished.
+
+        Returns
+        ----------
+        ((int, int), int, int)
+            The best move of the deepest iteration completed by every
+            worker (the first legal move if there is none), that depth, and
+            the total number of nodes searched by the workers.
+        """
+        if not self.processes:
+            self.start()
+        self.task_id += 1
+        history = game.get_move_history()
+        seat = 0 if game.__player_1__ is player else 1
+        parts = split_moves(legal_moves, self.num_workers)
+        for index, (tasks, moves) in enumerate(zip(self.tasks, parts)):
+            tasks.put((self.task_id, index, type(game), game.width, game.height, seat,
+                       history, moves, deadline))
+
+        completed = [{} for _ in parts]
+        finished = [False] * len(parts)
+        nodes = [0] * len(parts)
+        running = len(parts)
+        while running:
+            timeout = deadline - clock()
+            if timeout <= 0:
+                break
+            try:
+                task_id, index, depth, result, count = self.results.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if task_id != self.task_id:
+                continue
+            nodes[index] = count
+            if depth is None:
+                running -= 1
+                finished[index] = result
+            else:
+                completed[index][depth] = result
+
+        # Workers that searched their whole subtree before the deadline
+        # count as complete at every depth
+        depths = [max(results) if results else 0 for results in completed]
+        unfinished = [d for d, done in zip(depths, finished) if not done]
+        depth = min(unfinished) if unfinished else max(depths)
+        if depth == 0:
+            return legal_moves[0], 0, sum(nodes)
+        score, move = max(results[min(depth, max(results))]
+                          for results in completed if results)
+        return move, depth, sum(nodes)
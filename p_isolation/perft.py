@@ -0,0 +1,183 @@
+"""
+Measure the raw speed of the board implementations, apart from any agent
+logic, in the way chess engines use perft: count the leaf nodes of the full
+game tree to a fixed depth from a set of fixed openings.
+
+Every board class searches the same trees, once with forecast_move() (a copy
+per node, like the default CustomPlayer) and once with apply_move() and
+undo_move() (like CustomPlayer(in_place=True)), and the leaf counts must
+agree between all of them. The script also times copy() and
+get_legal_moves() on the positions of the openings, and writes the results
+as JSON so that they can be compared between versions:
+
+    python perft.py -o perft.json
+    python perft.py --baseline perft.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+from isolation import Board
+from isolation import BitBoard
+
+BOARD_CLASSES = [("Board", Board), ("BitBoard", BitBoard)]
+
+# Moves played before counting; the empty board is the first opening
+OPENINGS = [
+    [],
+    [(3, 3)],
+    [(3, 3), (2, 1)],
+    [(0, 0), (6, 6)],
+    [(2, 3), (4, 4), (4, 2)],
+    [(3, 3), (1, 2), (5, 4), (0, 0)],
+]
+
+
+def perft(game, depth):
+    """Return the number of positions `depth` plies after `game`, counting
+    the positions where the game ends earlier once, with forecast_move().
+    As in chess perft, the positions of the last ply are counted from the
+    legal moves without creating them, and nodes per second means counted
+    positions per second.
+    """
+    if depth == 0:
+        return 1
+    moves = game.get_legal_moves()
+    if not moves:
+        return 1
+    if depth == 1:
+        return len(moves)
+    return sum(perft(game.forecast_move(move), depth - 1) for move in moves)
+
+
+def perft_in_place(game, depth):
+    """Same as `perft()`, but applies and undoes the moves on `game`."""
+    if depth == 0:
+        return 1
+    moves = game.get_legal_moves()
+    if not moves:
+        return 1
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        game.apply_move(move)
+        nodes += perft_in_place(game, depth - 1)
+        game.undo_move()
+    return nodes
+
+
+def opening_board(board_cls, opening):
+    """Return a new board of type `board_cls` after the moves `opening`."""
+    game = board_cls("Player1", "Player2")
+    for move in opening:
+        game.apply_move(tuple(move))
+    return game
+
+
+def time_per_call(fn, min_time=0.2):
+    """Return the time in microseconds of one call to `fn`, repeating the
+    calls for at least `min_time` seconds.
+    """
+    calls = 0
+    start = timeit.default_timer()
+    while True:
+        for _ in range(100):
+            fn()
+        calls += 100
+        elapsed = timeit.default_timer() - start
+        if elapsed >= min_time:
+            return 1e6 * elapsed / calls
+
+
+def run(depth, openings=OPENINGS, board_classes=BOARD_CLASSES, min_time=0.2):
+    """
+    Run the benchmark for every board class, timing copy() and
+    get_legal_moves() for at least `min_time` seconds per opening.
+
+    Returns
+    ----------
+    dict
+        The results, ready to be written as JSON: the depth, the openings,
+        the leaf count of every opening, and for each board class the
+        nodes per second of both perft variants and the time of copy() and
+        get_legal_moves() in microseconds. A "mismatches" entry lists the
+        board classes and variants whose counts differ from the first ones.
+    """
+    # Lists of lists, as they are read back from JSON
+    openings = [[list(move) for move in opening] for opening in openings]
+    results = {"depth": depth, "openings": openings, "counts": None,
+               "mismatches": [], "boards": {},
+               "python": platform.python_version()}
+    for name, board_cls in board_classes:
+        boards = [opening_board(board_cls, opening) for opening in openings]
+        board_results = {}
+        for variant, search in (("forecast", perft), ("in_place", perft_in_place)):
+            start = timeit.default_timer()
+            counts = [search(board, depth) for board in boards]
+            elapsed = timeit.default_timer() - start
+            if results["counts"] is None:
+                results["counts"] = counts
+            elif counts != results["counts"]:
+                results["mismatches"].append("{} {}".format(name, variant))
+            board_results[variant + "_nodes_per_sec"] = sum(counts) / elapsed
+        board_results["copy_us"] = sum(time_per_call(board.copy, min_time)
+                                       for board in boards) / len(boards)
+        board_results["get_legal_moves_us"] = sum(time_per_call(board.get_legal_moves, min_time)
+                                                  for board in boards) / len(boards)
+        results["boards"][name] = board_results
+    return results
+
+
+def report(results, baseline=None):
+    """Return a human readable table of `results`, with the ratio to the
+    results in `baseline` (the output of an earlier run) when given.
+    """
+    columns = ["forecast_nodes_per_sec", "in_place_nodes_per_sec",
+               "copy_us", "get_legal_moves_us"]
+    lines = ["perft depth {}, {} openings, {} leaves".format(
+        results["depth"], len(results["openings"]), sum(results["counts"]))]
+    lines.append("{:<10}".format("") + "".join("{:>24}".format(c) for c in columns))
+    for name, board_results in sorted(results["boards"].items()):
+        line = "{:<10}".format(name)
+        for column in columns:
+            cell = "{:.1f}".format(board_results[column])
+            if baseline is not None and name in baseline["boards"]:
+                cell += " ({:.2f}x)".format(board_results[column] / baseline["boards"][name][column])
+            line += "{:>24}".format(cell)
+        lines.append(line)
+    if baseline is not None and baseline["depth"] == results["depth"] and \
+            baseline["openings"] == results["openings"] and baseline["counts"] != results["counts"]:
+        lines.append("leaf counts differ from the baseline")
+    for mismatch in results["mismatches"]:
+        lines.append("leaf counts differ: {}".format(mismatch))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-d", "--depth", type=int, default=4,
+                        help="number of plies to count from every opening")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    results = run(args.depth)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    print(report(results, baseline))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+    if results["mismatches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
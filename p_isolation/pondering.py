@@ -0,0 +1,159 @@
+"""This file contains the background search used by `CustomPlayer` when it is
+created with `ponder=True`.
+
+After the agent chooses a move, it predicts the opponent's reply and a worker
+process starts searching the position after that reply while the opponent
+thinks. The search has no deadline until the agent's next call to get_move():
+
+- if the opponent played the predicted reply (a ponder hit), the worker is
+  given the agent's deadline and continues the search it already started, so
+  the agent returns a deeper result (or returns at once if the search already
+  ended)
+- otherwise (a ponder miss), the worker is stopped and the agent searches the
+  actual position as usual
+
+The worker is a separate process, so it does not take time away from an
+opponent that runs in the same process (as in `Board.play`) as long as a free
+CPU core is available. It keeps its transposition table between searches, and
+the deadline is shared memory that the agent can move while the search runs.
+"""
+
+import multiprocessing
+import queue
+
+from parallel_search import clock
+from parallel_search import search_root_moves
+
+
+def _worker_main(agent_args, deadline, tasks, results):
+    """Main loop of the ponder worker: search the positions sent by the agent
+    until the shared `deadline` (on the system clock) passes.
+    """
+    # Imported here so that the module can be imported by game_agent
+    from game_agent import CustomPlayer
+    from game_agent import Timeout
+    agent = CustomPlayer(**agent_args)
+    agent.time_left = lambda: 1000. * (deadline.value - clock())
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        task_id, board_cls, width, height, seat, history = task
+        players = (agent, "opponent") if seat == 0 else ("opponent", agent)
+        game = board_cls(players[0], players[1], width, height)
+        for move in history:
+            game.apply_move(move)
+        agent.stats.nodes = 0
+        if agent.tt is not None:
+            if game.move_count <= agent.last_move_count or seat != agent.last_seat:
+                agent.tt.clear()
+            agent.last_move_count = game.move_count
+            agent.last_seat = seat
+            agent.tt.new_search()
+        if agent.orderer is not None:
+            agent.orderer.new_search()
+
+        def report(depth, score, move, nodes):
+            results.put((task_id, depth, move, nodes))
+
+        try:
+            search_root_moves(agent, game, game.get_legal_moves(), report)
+        except Timeout:
+            pass
+        results.put((task_id, None, None, agent.stats.nodes))
+
+
+class Ponderer(object):
+    """A worker process that searches a position on the opponent's time.
+
+    Parameters
+    ----------
+    agent_args : dict
+        Keyword arguments of the `CustomPlayer` created in the worker.
+    """
+
+    def __init__(self, agent_args):
+        self.agent_args = dict(agent_args, timeout=0.)
+        self.process = None
+        self.task_id = 0
+        self.key = None
+
+    def start(self):
+        """Start the worker process (done automatically by `ponder()`)."""
+        self.deadline = multiprocessing.RawValue("d", 0.)
+        self.tasks = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=_worker_main, args=(self.agent_args, self.deadline, self.tasks, self.results))
+        self.process.daemon = True
+        self.process.start()
+
+    def close(self):
+        """Stop the search and the worker process."""
+        if self.process is None:
+            return
+        self.stop()
+        self.tasks.put(None)
+        self.process.join()
+        self.process = None
+
+    def ponder(self, game, player):
+        """Start searching the position `game`, in which `player` is the
+        active player, without a deadline.
+        """
+        if self.process is None:
+            self.start()
+        self.stop()
+        self.task_id += 1
+        self.key = (game.get_hash(), game.move_count)
+        self.best = (None, 0, 0)
+        self.deadline.value = float("inf")
+        seat = 0 if game.__player_1__ is player else 1
+        self.tasks.put((self.task_id, type(game), game.width, game.height, seat,
+                        game.get_move_history()))
+
+    def is_hit(self, game):
+        """Return True if the position being searched is `game`."""
+        return self.key is not None and self.key == (game.get_hash(), game.move_count)
+
+    def stop(self):
+        """Abort the search, if any, and wait for the worker to stop."""
+        if self.key is None:
+            return
+        self.deadline.value = 0.
+        self._collect()
+        self.key = None
+
+    def finish(self, deadline):
+        """
+        Let the search continue until the system clock reaches `deadline`.
+
+        Returns
+        ----------
+        ((int, int), int, int)
+            The best move of the deepest completed iteration (None if no
+            iteration completed), that depth, and the number of nodes
+            searched since the call to `ponder()`.
+        """
+        self.deadline.value = deadline
+        self._collect()
+        self.key = None
+        return self.best
+
+    def _collect(self):
+        """Record the results of the current search until it ends."""
+        while True:
+            # After the deadline the worker stops within a node, so its last
+            # message is only waited for
+            timeout = self.deadline.value - clock()
+            try:
+                task_id, depth, move, nodes = self.results.get(
+                    timeout=timeout if timeout > 0 else None)
+            except queue.Empty:
+                continue
+            if task_id != self.task_id:
+                continue
+            if depth is None:
+                self.best = self.best[:2] + (nodes,)
+                return
+            self.best = (move, depth, nodes)
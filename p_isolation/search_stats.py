@@ -0,0 +1,132 @@
+"""This file contains the statistics recorded by `CustomPlayer` for every call
+to get_move(), and a summary that aggregates them over many moves (e.g., all
+the moves of an agent in a tournament).
+
+Recording only costs a few counter increments per node; the time spent in
+the evaluation function is estimated by timing one evaluation out of every
+`SCORE_SAMPLE_INTERVAL`, so the timer is not called at every leaf.
+"""
+
+SCORE_SAMPLE_INTERVAL = 16
+
+
+class SearchStats(object):
+    """Statistics for a single call to get_move().
+
+    Attributes
+    ----------
+    source : str
+        How the move was chosen: "search", "book", "endgame", "ponder" (a
+        search started on the opponent's time), "center" (the student
+        agent's center rule) or "none" (no legal moves).
+
+    nodes : int
+        The number of nodes visited by the search, including leaves.
+
+    leaves : int
+        The number of leaves scored, including scores found in the
+        evaluation cache.
+
+    cache_hits : int
+        The number of leaf scores found in the evaluation cache.
+
+    cutoffs : int
+        The number of alpha-beta cutoffs.
+
+    researches : int
+        The number of moves searched again by principal variation search
+        after a failed null or aspiration window search.
+
+    depth : int
+        The depth of the deepest completed search iteration.
+
+    iteration_times : list<float>
+        The time in seconds taken by each completed iteration.
+
+    score_time : float
+        The estimated time in seconds spent in the evaluation function.
+
+    time : float
+        The total time in seconds spent in get_move().
+    """
+
+    def __init__(self):
+        self.source = "search"
+        self.nodes = 0
+        self.leaves = 0
+        self.cache_hits = 0
+        self.cutoffs = 0
+        self.researches = 0
+        self.depth = 0
+        self.iteration_times = []
+        self.score_time = 0.
+        self.time = 0.
+
+    def as_dict(self):
+        """Return the statistics as a dictionary."""
+        return dict(self.__dict__, iteration_times=list(self.iteration_times))
+
+
+class StatsSummary(object):
+    """Totals of `SearchStats` over many moves. Summaries of different
+    processes can be combined with `merge()`.
+    """
+
+    def __init__(self):
+        self.moves = 0
+        self.sources = {}
+        self.searches = 0
+        self.nodes = 0
+        self.leaves = 0
+        self.cache_hits = 0
+        self.cutoffs = 0
+        self.depth = 0
+        self.search_time = 0.
+        self.score_time = 0.
+
+    def add(self, stats):
+        """Add the statistics of one move."""
+        self.moves += 1
+        self.sources[stats.source] = self.sources.get(stats.source, 0) + 1
+        if stats.source != "search":
+            return
+        self.searches += 1
+        self.nodes += stats.nodes
+        self.leaves += stats.leaves
+        self.cache_hits += stats.cache_hits
+        self.cutoffs += stats.cutoffs
+        self.depth += stats.depth
+        self.search_time += stats.time
+        self.score_time += stats.score_time
+
+    def merge(self, other):
+        """Add the totals of the summary `other`."""
+        self.moves += other.moves
+        for source, count in other.sources.items():
+            self.sources[source] = self.sources.get(source, 0) + count
+        self.searches += other.searches
+        self.nodes += other.nodes
+        self.leaves += other.leaves
+        self.cache_hits += other.cache_hits
+        self.cutoffs += other.cutoffs
+        self.depth += other.depth
+        self.search_time += other.search_time
+        self.score_time += other.score_time
+
+    def report(self):
+        """Return a short human readable report of the totals."""
+        if not self.searches:
+            return "{} moves, no searches".format(self.moves)
+        searches = float(self.searches)
+        lines = ["{} moves ({})".format(self.moves, ", ".join(
+                     "{} {}".format(count, source) for source, count in sorted(self.sources.items()))),
+                 "depth {:.1f}  nodes {:.0f}  leaves {:.0f}  cutoffs {:.0f}  (per search)".format(
+                     self.depth / searches, self.nodes / searches,
+                     self.leaves / searches, self.cutoffs / searches)]
+        if self.cache_hits:
+            lines.append("{:.0f}% of leaf scores from the evaluation cache".format(
+                100. * self.cache_hits / self.leaves))
+        if self.search_time > 0:
+            lines.append("{:.1f} knodes/s  {:.0f}% of search time in score".format(
+                self.nodes / self.search_time / 1000., 100. * self.score_time / self.search_time))
+        return "\n".join(lines)
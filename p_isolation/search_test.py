@@ -0,0 +1,836 @@
+"""
+This file contains test cases for the optional search enhancements in
+`game_agent.CustomPlayer`. Each enhancement must leave the minimax value of
+the searched position unchanged.
+"""
+import os
+import random
+import tempfile
+import time
+import timeit
+import unittest
+
+import isolation
+import build_opening_book
+import endgame
+import eval_cache
+import game_agent
+import match_server
+import mcts
+import parallel_search
+import sample_players
+import search_stats
+import selfplay
+import solved_positions
+import sprt
+import time_manager
+import tournament
+import tune_heuristic
+
+from isolation import symmetry
+
+from sample_players import improved_score
+
+
+def random_position(seed, num_moves, w=7, h=7, board_cls=isolation.BitBoard):
+    """Return a board after `num_moves` random plies (or fewer, if the game
+    ends) with "Player1" and "Player2" registered as the players.
+    """
+    rng = random.Random(seed)
+    board = board_cls("Player1", "Player2", w, h)
+    for _ in range(num_moves):
+        moves = board.get_legal_moves()
+        if not moves:
+            break
+        board.apply_move(rng.choice(moves))
+    return board
+
+
+def search_value(game, depth, **kwargs):
+    """Run a fixed-depth alphabeta search for the active player of `game` and
+    return the (score, move) pair.
+    """
+    agent = game_agent.CustomPlayer(depth, improved_score, False, "alphabeta", **kwargs)
+    agent.time_left = lambda: 1e6
+    return agent.alphabeta(rebind(game, agent), depth)
+
+
+def rebind(game, agent):
+    """Return a copy of `game` in which the active player is `agent`."""
+    players = (agent, "opponent") if game.active_player == "Player1" else ("opponent", agent)
+    board = isolation.BitBoard(players[0], players[1], game.width, game.height)
+    for move in game.get_move_history():
+        board.apply_move(move)
+    return board
+
+
+class TranspositionTableTest(unittest.TestCase):
+
+    def test_tt_preserves_search_value(self):
+        """ Iterative deepening with a shared table matches plain alphabeta """
+        for seed in range(6):
+            game = random_position(seed, 6)
+            agent = game_agent.CustomPlayer(1, improved_score, False, "alphabeta",
+                                            in_place=True, tt_size=2 ** 12)
+            agent.time_left = lambda: 1e6
+            board = rebind(game, agent)
+            for depth in range(1, 6):
+                expected, _ = search_value(game, depth)
+                actual, _ = agent.alphabeta(board, depth)
+                self.assertEqual(expected, actual)
+
+    def test_tt_cleared_when_seat_changes(self):
+        """ Entries from a game as the other player are not reused """
+        for seed in range(4):
+            game = random_position(seed, 6)
+            agent = game_agent.CustomPlayer(5, improved_score, False, "alphabeta",
+                                            in_place=True, tt_size=2 ** 12)
+            board = rebind(game, agent)
+            agent.get_move(board, board.get_legal_moves(), lambda: 1e6)
+            game.apply_move(game.get_legal_moves()[0])
+            board = rebind(game, agent)
+            agent.search_depth = 1
+            agent.get_move(board, board.get_legal_moves(), lambda: 1e6)
+            expected, _ = search_value(game, 3)
+            actual, _ = agent.alphabeta(board, 3)
+            self.assertEqual(expected, actual)
+
+    def test_hash_matches_between_boards(self):
+        """ Equal positions hash equally on Board and BitBoard """
+        for seed in range(4):
+            expected = random_position(seed, 10, board_cls=isolation.Board)
+            actual = random_position(seed, 10)
+            self.assertEqual(expected.get_hash(), actual.get_hash())
+            while actual.move_count:
+                actual.undo_move()
+            self.assertEqual(0, actual.get_hash())
+
+
+class MoveOrderingTest(unittest.TestCase):
+
+    def test_ordering_preserves_search_value(self):
+        """ Ordered iterative deepening matches plain alphabeta """
+        for seed in range(6):
+            game = random_position(seed, 6)
+            agent = game_agent.CustomPlayer(1, improved_score, False, "alphabeta",
+                                            in_place=True, tt_size=2 ** 12,
+                                            ordering=True, mobility_ordering=True)
+            agent.time_left = lambda: 1e6
+            board = rebind(game, agent)
+            for depth in range(1, 6):
+                expected, _ = search_value(game, depth)
+                actual, move = agent.alphabeta(board, depth)
+                agent.orderer.end_iteration(board)
+                self.assertEqual(expected, actual)
+                self.assertEqual(agent.orderer.pv[board.move_count], move)
+            self.assertGreater(agent.orderer.cutoffs, 0)
+
+
+def count_paths(blank_spaces, moves, depth):
+    """List-based reference implementation of `game_agent.count_reachable()`
+    summed over `moves`.
+    """
+    count = 0
+    if depth > 0:
+        for r, c in moves:
+            if (r, c) in blank_spaces:
+                remaining = [loc for loc in blank_spaces if loc != (r, c)]
+                next_moves = [(r + dr, c + dc) for dr, dc in isolation.bitboard.DIRECTIONS]
+                count += 1 + count_paths(remaining, next_moves, depth - 1)
+    return count
+
+
+class ReachableCountTest(unittest.TestCase):
+
+    def test_reachable_count_matches_reference(self):
+        """ Bitmask path counts match the list-based recursion """
+        for seed in range(40):
+            game = random_position(seed, seed % 20)
+            blank_spaces = game.get_blank_spaces()
+            for player in ("Player1", "Player2"):
+                moves = game.get_legal_moves(player)
+                for depth in (1, 2, 3):
+                    self.assertEqual(count_paths(blank_spaces, moves, depth),
+                                     game_agent.reachable_count(game, player, depth))
+
+    def test_score_heuristic_3_is_mobility_difference(self):
+        """ score_heuristic_3 keeps the scores of the list-based version """
+        for seed in range(40):
+            game = random_position(seed, 2 + seed % 20, board_cls=isolation.Board)
+            expected = len(game.get_legal_moves("Player1")) - len(game.get_legal_moves("Player2"))
+            self.assertEqual(float(expected), game_agent.score_heuristic_3(game, "Player1"))
+
+
+class SymmetryTest(unittest.TestCase):
+
+    def test_symmetric_positions_share_canonical_hash(self):
+        """ Every symmetric copy of a position has the same canonical hash """
+        for seed, (w, h) in enumerate([(7, 7), (7, 7), (5, 8), (9, 9)]):
+            game = random_position(seed, 12, w, h)
+            moves = game.get_move_history()
+            hashes = symmetry.symmetric_hashes(game)
+            self.assertEqual(game.get_hash(), hashes[0])
+            self.assertEqual(len(hashes), 8 if w == h else 4)
+            for t in range(len(hashes)):
+                copy = isolation.BitBoard("Player1", "Player2", w, h)
+                for move in moves:
+                    copy.apply_move(symmetry.transform_move(game, move, t))
+                self.assertEqual(hashes[t], copy.get_hash())
+                self.assertEqual(symmetry.canonical_hash(game)[0],
+                                 symmetry.canonical_hash(copy)[0])
+
+    def test_unique_moves(self):
+        """ Symmetric moves are removed from positions with symmetries """
+        game = isolation.BitBoard("Player1", "Player2")
+        self.assertEqual(len(symmetry.unique_moves(game, game.get_legal_moves())), 10)
+        game.apply_move((3, 3))
+        self.assertEqual(len(symmetry.unique_moves(game, game.get_legal_moves())), 9)
+        game.apply_move((0, 0))
+        self.assertEqual(len(symmetry.unique_moves(game, game.get_legal_moves())), 4)
+
+    def test_symmetry_preserves_search_value(self):
+        """ Search with symmetry pruning matches plain alphabeta """
+        for seed in range(4):
+            game = random_position(seed, 2 + seed % 2)
+            agent = game_agent.CustomPlayer(1, improved_score, False, "alphabeta",
+                                            in_place=True, tt_size=2 ** 12,
+                                            symmetry_plies=8)
+            agent.time_left = lambda: 1e6
+            board = rebind(game, agent)
+            for depth in range(1, 5):
+                expected, _ = search_value(game, depth)
+                actual, move = agent.alphabeta(board, depth)
+                self.assertEqual(expected, actual)
+                self.assertIn(move, board.get_legal_moves())
+
+
+class PrincipalVariationSearchTest(unittest.TestCase):
+
+    def test_pvs_preserves_search_value(self):
+        """ PVS with any aspiration window matches plain alphabeta """
+        for seed in range(6):
+            game = random_position(seed, 6 + seed)
+            for kwargs in [{}, dict(in_place=True, tt_size=2 ** 12, ordering=True)]:
+                agent = game_agent.CustomPlayer(1, improved_score, False, "pvs",
+                                                aspiration=1., **kwargs)
+                agent.time_left = lambda: 1e6
+                board = rebind(game, agent)
+                for depth in range(1, 6):
+                    expected, _ = search_value(game, depth)
+                    for guess in (None, expected, expected - 3, expected + 3):
+                        actual, move = agent.pvs(board, depth, guess)
+                        self.assertEqual(expected, actual)
+                        if move != (-1, -1):
+                            self.assertIn(move, board.get_legal_moves())
+
+
+class EvalCacheTest(unittest.TestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """ The cache keeps the most recently used scores """
+        cache = eval_cache.EvalCache(2)
+        cache.store(1, 1.)
+        cache.store(2, 2.)
+        self.assertEqual(1., cache.lookup(1))
+        cache.store(3, 3.)
+        self.assertIsNone(cache.lookup(2))
+        self.assertEqual((1., 3.), (cache.lookup(1), cache.lookup(3)))
+        self.assertEqual(0.75, cache.hit_rate())
+        game = random_position(2, 5)
+        self.assertNotEqual(cache.key(game, game.active_player),
+                            cache.key(game, game.inactive_player))
+
+    def test_cache_preserves_search_value(self):
+        """ PVS with an evaluation cache matches plain alphabeta and scores
+        fewer positions """
+        calls = []
+
+        def counting_score(game, player):
+            calls.append(player)
+            return improved_score(game, player)
+
+        for seed in range(4):
+            game = random_position(seed, 8)
+            agent = game_agent.CustomPlayer(1, counting_score, False, "pvs", in_place=True,
+                                            eval_cache_size=2 ** 12)
+            agent.time_left = lambda: 1e6
+            board = rebind(game, agent)
+            for depth in range(1, 5):
+                expected, _ = search_value(game, depth)
+                actual, _ = agent.pvs(board, depth, expected + 3)
+                self.assertEqual(expected, actual)
+            self.assertEqual(agent.stats.leaves - agent.stats.cache_hits, len(calls))
+            self.assertEqual(agent.eval_cache.hits, agent.stats.cache_hits)
+            del calls[:]
+        self.assertGreater(agent.stats.cache_hits, 0)
+
+
+class ParallelSearchTest(unittest.TestCase):
+
+    def test_root_split_preserves_search_value(self):
+        """ Merging the best moves of split root moves matches alphabeta """
+        for seed in range(4):
+            game = random_position(seed, 6)
+            for method in ("alphabeta", "pvs"):
+                results = {}
+                for moves in parallel_search.split_moves(game.get_legal_moves(), 3):
+                    agent = game_agent.CustomPlayer(score_fn=improved_score, method=method,
+                                                    in_place=True, tt_size=2 ** 12,
+                                                    aspiration=1.)
+                    agent.time_left = lambda: 1e6
+                    parallel_search.search_root_moves(
+                        agent, rebind(game, agent), moves,
+                        lambda depth, score, move, nodes: results.setdefault(depth, []).append(score),
+                        max_depth=4)
+                for depth in range(1, 5):
+                    expected, _ = search_value(game, depth)
+                    self.assertEqual(expected, max(results[depth]))
+
+    def test_workers_return_legal_move(self):
+        """ Parallel search returns a legal move within the time limit """
+        agent = game_agent.CustomPlayer(score_fn=improved_score, method="alphabeta",
+                                        tt_size=2 ** 12, workers=2)
+        try:
+            for seed in range(2):
+                game = rebind(random_position(seed, 4), agent)
+                legal_moves = game.get_legal_moves()
+                end = timeit.default_timer() + 0.5
+                time_left = lambda: 1000 * (end - timeit.default_timer())
+                self.assertIn(agent.get_move(game, legal_moves, time_left), legal_moves)
+                self.assertGreater(time_left(), 0)
+                self.assertGreater(agent.stats.depth, 0)
+        finally:
+            agent.close()
+
+
+class PonderingTest(unittest.TestCase):
+
+    def test_ponder_hit_and_miss(self):
+        """ A predicted reply continues the ponder search; others search """
+        agent = game_agent.CustomPlayer(score_fn=improved_score, method="alphabeta",
+                                        tt_size=2 ** 12, ponder=True)
+        try:
+            for hit in (True, False):
+                game = rebind(random_position(3, 4), agent)
+                end = timeit.default_timer() + 0.2
+                time_left = lambda: 1000 * (end - timeit.default_timer())
+                game.apply_move(agent.get_move(game, game.get_legal_moves(), time_left))
+                replies = [move for move in game.get_legal_moves()
+                           if agent.ponderer.is_hit(game.forecast_move(move)) == hit]
+                game.apply_move(replies[0])
+                agent.on_opponent_move(game.copy(), replies[0])
+                legal_moves = game.get_legal_moves()
+                end = timeit.default_timer() + 0.2
+                self.assertIn(agent.get_move(game, legal_moves, time_left), legal_moves)
+                self.assertGreater(time_left(), 0)
+                self.assertEqual("ponder" if hit else "search", agent.stats.source)
+                self.assertGreater(agent.stats.depth, 0)
+        finally:
+            agent.close()
+
+    def test_play_notifies_players(self):
+        """ Board.play reports every move to the other player """
+        class Observer(sample_players.RandomPlayer):
+            def on_opponent_move(self, game, move):
+                self.observed.append((game.get_player_location(game.inactive_player), move))
+
+        players = [Observer(), Observer()]
+        for player in players:
+            player.observed = []
+        game = isolation.BitBoard(players[0], players[1])
+        winner, history, _ = game.play()
+        moves = [move for turn in history for move in turn]
+        self.assertEqual(moves[0::2][:len(players[1].observed)],
+                         [move for _, move in players[1].observed])
+        self.assertEqual(moves[1::2][:len(players[0].observed)],
+                         [move for _, move in players[0].observed])
+        for player in players:
+            for location, move in player.observed:
+                self.assertEqual(location, move)
+
+
+class SelfPlayTest(unittest.TestCase):
+
+    def test_records_match_board_play(self):
+        """ The fast loop plays and records the games of Board.play """
+        players = selfplay.search_players(2)
+        records = selfplay.play_batch(players, 6, 0, opening_plies=2)
+        self.assertEqual(6, records.count)
+        for index in range(records.count):
+            moves = records.game_moves(index)
+            seats = players if index % 2 == 0 else players[::-1]
+            game = isolation.BitBoard(seats[0], seats[1])
+            for move in moves[:2]:
+                game.apply_move(move)
+            winner, history, _ = game.play(time_limit=float("inf"))
+            played = [move for turn in history for move in turn if move != (-1, -1)]
+            self.assertEqual(moves[2:], played)
+            self.assertEqual(seats[records.winners[index]], winner)
+
+        merged = selfplay.GameRecords(12)
+        merged.extend(records)
+        merged.extend(records)
+        self.assertEqual(12, merged.count)
+        self.assertEqual(records.game_moves(5), merged.game_moves(11))
+        self.assertEqual(len(records.moves) * 2, len(merged.moves))
+
+
+@unittest.skipIf(tune_heuristic.np is None, "NumPy is not installed")
+class TuneHeuristicTest(unittest.TestCase):
+
+    def test_batch_features_match_position_features(self):
+        """ The vectorized features equal the features of each position """
+        records = selfplay.play_batch(selfplay.search_players(1), 4, 0)
+        positions = tune_heuristic.PositionBatch.from_records(records)
+        features = tune_heuristic.batch_features(positions)
+        row = 0
+        for index in range(records.count):
+            moves = records.game_moves(index)
+            game = isolation.BitBoard("Player1", "Player2")
+            for ply, move in enumerate(moves[:-1]):
+                game.apply_move(move)
+                if ply == 0:
+                    continue
+                expected = game_agent.position_features(game, game.active_player)
+                self.assertEqual(expected, features[row].tolist())
+                row += 1
+        self.assertEqual(len(positions), row)
+
+    def test_fit_and_score(self):
+        """ Fitted weights separate the outcomes and drive WeightedScore """
+        np = tune_heuristic.np
+        rng = np.random.RandomState(0)
+        features = rng.normal(size=(2000, 2))
+        wins = (features.dot([2., -1.]) + rng.logistic(size=2000) > 0).astype(float)
+        weights = tune_heuristic.fit_logistic(features, wins)
+        self.assertAlmostEqual(2., weights[0], delta=0.3)
+        self.assertAlmostEqual(-1., weights[1], delta=0.3)
+
+        score = game_agent.WeightedScore({"mobility": 1., "center_distance": 0.})
+        self.assertEqual(("mobility",), score.features)
+        game = random_position(3, 6)
+        self.assertEqual(improved_score(game, game.active_player),
+                         score(game, game.active_player))
+        with self.assertRaises(ValueError):
+            game_agent.WeightedScore({"corners": 1.})
+
+
+
+class TerritoryTest(unittest.TestCase):
+
+    def reference_territory(self, game, player):
+        """Compute the territory of each player with a separate search over
+        the board coordinates for each of them.
+        """
+        blank = set(game.get_blank_spaces())
+
+        def distances(location):
+            frontier = blank if location is None else [location]
+            found = {}
+            depth = 0
+            while frontier:
+                depth += 1
+                frontier = set((r + dr, c + dc) for r, c in frontier
+                               for dr, dc in isolation.bitboard.DIRECTIONS
+                               if (r + dr, c + dc) in blank and (r + dr, c + dc) not in found)
+                found.update((cell, depth) for cell in frontier)
+            return found
+
+        own = distances(game.get_player_location(player))
+        opp = distances(game.get_player_location(game.get_opponent(player)))
+        inf = float("inf")
+        return (sum(1. / d for cell, d in own.items() if d < opp.get(cell, inf)),
+                sum(1. / d for cell, d in opp.items() if d < own.get(cell, inf)))
+
+    def test_territory_matches_separate_searches(self):
+        """ The packed search finds the territory of both players """
+        for seed, (plies, w, h) in enumerate([(0, 7, 7), (1, 7, 7), (6, 7, 7), (20, 7, 7),
+                                              (9, 5, 8), (30, 9, 9), (40, 11, 11)]):
+            game = random_position(seed, plies, w, h)
+            tables = isolation.bitboard.knight_tables(w, h)
+            for player in (game.active_player, game.inactive_player):
+                own, opp = game_agent.player_cells(game, player)
+                actual = game_agent.territory(game.get_blank_mask(), own, opp, tables)
+                expected = self.reference_territory(game, player)
+                self.assertAlmostEqual(expected[0], actual[0])
+                self.assertAlmostEqual(expected[1], actual[1])
+
+    def test_territory_score(self):
+        """ territory_score is antisymmetric and decided at the end of the game """
+        game = random_position(4, 10)
+        score = game_agent.territory_score(game, game.active_player)
+        self.assertAlmostEqual(-score, game_agent.territory_score(game, game.inactive_player))
+        own, opp = game_agent.player_cells(game, game.active_player)
+        blank = game.get_blank_mask()
+        tables = isolation.bitboard.knight_tables(7, 7)
+        own_moves = set(game.get_legal_moves(game.active_player))
+        opp_moves = set(game.get_legal_moves(game.inactive_player))
+        self.assertEqual((len(own_moves - opp_moves), len(opp_moves - own_moves)),
+                         game_agent.territory(blank, own, opp, tables, max_depth=1))
+        while game.get_legal_moves():
+            game.apply_move(game.get_legal_moves()[0])
+        self.assertEqual(float("-inf"), game_agent.territory_score(game, game.active_player))
+        self.assertEqual(float("inf"), game_agent.territory_score(game, game.inactive_player))
+
+
+class SolvedPositionsTest(unittest.TestCase):
+
+    def test_exact_solver_matches_full_search(self):
+        """ The exact solver agrees with alphabeta searched to the end of the game """
+        for seed, plies in [(0, 22), (0, 23), (2, 23), (4, 21), (7, 19), (7, 20)]:
+            game = random_position(seed, plies)
+            depth = len(game.get_blank_spaces())
+            best = solved_positions.ExactSolver().winning_moves(game)
+            for move in game.get_legal_moves():
+                value, _ = search_value(game.forecast_move(move), depth)
+                self.assertEqual(move in best, value == float("-inf"))
+
+    def test_shipped_positions(self):
+        """ The positions in the suite have some but not all moves winning """
+        positions = solved_positions.load_positions()
+        self.assertGreater(len(positions), 0)
+        for position in positions:
+            game = solved_positions.position_board(position, "agent")
+            self.assertEqual("agent", game.active_player)
+            legal_moves = game.get_legal_moves()
+            self.assertEqual(position["legal"], len(legal_moves))
+            self.assertLess(0, len(position["best"]))
+            self.assertLess(len(position["best"]), len(legal_moves))
+            for move in position["best"]:
+                self.assertIn(tuple(move), legal_moves)
+
+    def test_runner_solves_position(self):
+        """ A search that settles on a best move reports its solution """
+        game = random_position(3, 23)
+        position = {"moves": [list(move) for move in game.get_move_history()],
+                    "best": [list(move) for move in solved_positions.ExactSolver().winning_moves(game)],
+                    "legal": len(game.get_legal_moves())}
+        self.assertTrue(position["best"])
+        config = solved_positions.Configuration("pvs", "improved", True)
+        solution = solved_positions.solve_position(config, position, 5000)
+        self.assertTrue(solution.solved)
+        self.assertIn(list(solution.move), position["best"])
+        self.assertGreater(solution.nodes, 0)
+        results = solved_positions.run([config], [position], 5000)
+        self.assertEqual(1, results["configurations"]["pvs/improved/ordered"]["solved"])
+        self.assertIn("1/1", solved_positions.report(results))
+
+
+class SPRTTest(unittest.TestCase):
+
+    def test_elo_interval(self):
+        """ Elo estimates are antisymmetric and inside their intervals """
+        elo, low, high = sprt.elo_interval(75, 25)
+        self.assertAlmostEqual(190.85, elo, places=2)
+        self.assertLess(low, elo)
+        self.assertLess(elo, high)
+        for expected, actual in zip((-elo, -high, -low), sprt.elo_interval(25, 75)):
+            self.assertAlmostEqual(expected, actual)
+        elo, low, high = sprt.elo_interval(10, 0)
+        self.assertEqual(float("inf"), elo)
+        self.assertLess(0., low)
+        self.assertLess(low, float("inf"))
+
+    def test_sprt_decisions(self):
+        """ Consistent wins accept H1 and consistent losses accept H0 """
+        test = sprt.SPRT(elo0=0., elo1=100.)
+        for games in range(1, 20):
+            test.add(1, 0)
+            if test.status() is not None:
+                break
+        self.assertEqual("H1", test.status())
+        self.assertEqual(12, games)
+        test = sprt.SPRT(elo0=0., elo1=100.)
+        test.add(0, 13)
+        self.assertEqual("H0", test.status())
+        test.add(13, 0)
+        self.assertIsNone(test.status())
+
+    def test_tournament_stops_decided_matches(self):
+        """ The SPRT mode of the tournament stops once a match is decided """
+        agents = [tournament.Agent(sample_players.RandomPlayer(), "Random"),
+                  tournament.Agent(game_agent.CustomPlayer(2, improved_score, False,
+                                                           "alphabeta"), "AB_2")]
+        tasks = [(1, 0, seed) for seed in range(20)]
+        played, results, tests = tournament.play_until_decided(
+            agents, tasks, sprt_args=dict(elo0=0., elo1=400.))
+        self.assertEqual("H1", tests[0].status())
+        self.assertLess(len(played), len(tasks))
+        self.assertEqual(2 * len(played), tests[0].wins + tests[0].losses)
+        self.assertEqual(tests[0].wins, sum(result.wins[0] for result in results))
+
+
+class HangingPlayer(object):
+    """Agent that never returns in time."""
+
+    def get_move(self, game, legal_moves, time_left):
+        time.sleep(60)
+        return legal_moves[0]
+
+
+class CrashingPlayer(object):
+    """Agent that raises an exception."""
+
+    def get_move(self, game, legal_moves, time_left):
+        raise ValueError("broken agent")
+
+
+class MatchServerTest(unittest.TestCase):
+
+    def test_results_match_play_games(self):
+        """ Agents in subprocesses play the same matches as play_games """
+        agents = [tournament.Agent(game_agent.CustomPlayer(depth, improved_score, False,
+                                                           "alphabeta"), name)
+                  for depth, name in ((1, "AB_1"), (2, "AB_2"))]
+        tasks = [(0, 1, 7), (1, 0, 8)]
+        with match_server.MatchServer(agents, concurrency=2, time_limit=1000) as server:
+            results = server.play_matches(tasks)
+        for (idx_1, idx_2, seed), result in zip(tasks, results):
+            expected = tournament.play_games(agents[idx_1].player, agents[idx_2].player, seed)
+            self.assertEqual(expected.wins, result.wins)
+            self.assertEqual((0, 0), result.timeouts)
+
+    def test_broken_agents_lose_their_games(self):
+        """ Hanging agents are killed and restarted, crashing agents forfeit """
+        agents = [tournament.Agent(HangingPlayer(), "Hanging"),
+                  tournament.Agent(CrashingPlayer(), "Crashing"),
+                  tournament.Agent(game_agent.CustomPlayer(1, improved_score, False,
+                                                           "alphabeta"), "AB_1")]
+        margin = match_server.HARD_TIMEOUT_MARGIN
+        match_server.HARD_TIMEOUT_MARGIN = 200
+        try:
+            with match_server.MatchServer(agents, concurrency=2, time_limit=50) as server:
+                hanging, crashing, restarted = server.play_matches([(2, 0, 1), (2, 1, 2),
+                                                                    (0, 2, 3)])
+        finally:
+            match_server.HARD_TIMEOUT_MARGIN = margin
+        self.assertEqual((2, 0), hanging.wins)
+        self.assertEqual((0, 2), hanging.timeouts)
+        self.assertEqual((2, 0), crashing.wins)
+        self.assertEqual((0, 2), crashing.invalid_moves)
+        self.assertEqual((0, 2), restarted.wins)
+        self.assertEqual((2, 0), restarted.timeouts)
+
+def winning_position(seed):
+    """Return a random position in which the active player has a move that
+    leaves the opponent without legal moves, and a move that does not.
+    """
+    rng = random.Random(seed)
+    while True:
+        board = isolation.BitBoard("Player1", "Player2")
+        while board.get_legal_moves():
+            moves = board.get_legal_moves()
+            stuck = [m for m in moves if not board.forecast_move(m).get_legal_moves()]
+            if stuck and len(stuck) < len(moves):
+                return board
+            board.apply_move(rng.choice(moves))
+
+
+class MCTSTest(unittest.TestCase):
+
+    def test_finds_winning_move(self):
+        """ MCTS plays a move that wins at once, with and without RAVE """
+        for rave in (False, True):
+            agent = mcts.MCTSPlayer(rave=rave, seed=0)
+            for seed in range(3):
+                game = rebind(winning_position(seed), agent)
+                end = timeit.default_timer() + 0.1
+                time_left = lambda: 1000 * (end - timeit.default_timer())
+                move = agent.get_move(game, game.get_legal_moves(), time_left)
+                self.assertGreater(time_left(), 0)
+                self.assertFalse(game.forecast_move(move).get_legal_moves())
+
+    def test_playout_result(self):
+        """ The winner of a playout is the player who moved last """
+        agent = mcts.MCTSPlayer(seed=1)
+        game = rebind(random_position(2, 6), agent)
+        agent.tables = isolation.bitboard.knight_tables(7, 7)
+        blank, active, inactive = agent.game_state(game)
+        for _ in range(50):
+            own, other, won = agent.playout(blank, active, inactive)
+            self.assertEqual(0, own & other)
+            self.assertEqual(own | other, (own | other) & blank)
+            popcount = isolation.bitboard.popcount
+            self.assertEqual(popcount(own) - popcount(other), 1 if won else 0)
+
+    def test_tree_is_reused(self):
+        """ The subtree after the opponent's reply becomes the next root """
+        agent = mcts.MCTSPlayer(seed=2)
+        game = rebind(random_position(0, 4), agent)
+        end = timeit.default_timer() + 0.1
+        game.apply_move(agent.get_move(game, game.get_legal_moves(),
+                                       lambda: 1000 * (end - timeit.default_timer())))
+        reply = max(agent.root.children, key=lambda child: child.visits)
+        game.apply_move(agent.tables.coords[reply.cell])
+        root = agent.reuse_tree(agent.game_state(game))
+        self.assertIs(reply, root)
+        self.assertGreater(root.visits, 0)
+        self.assertEqual(sorted(game.get_legal_moves()),
+                         sorted(agent.tables.coords[child.cell] for child in root.children))
+
+
+class OpeningBookTest(unittest.TestCase):
+
+    def test_book_round_trip(self):
+        """ Book moves survive saving and apply to symmetric positions """
+        book = build_opening_book.build_book(7, 7, 2, 3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book.bin")
+            book.save(path)
+            agent = game_agent.CustomPlayer(3, improved_score, True, "alphabeta", book=path)
+            for first_move in [(0, 0), (2, 3)]:
+                game = isolation.BitBoard("Player1", agent)
+                game.apply_move(first_move)
+                move = agent.lookup_book(game)
+                self.assertIn(move, game.get_legal_moves())
+                # Every symmetric copy of the position gets a mirrored move
+                expected = symmetry.canonical_hash(game.forecast_move(move))
+                for t in range(8):
+                    mirrored = isolation.BitBoard("Player1", agent)
+                    mirrored.apply_move(symmetry.transform_move(game, first_move, t))
+                    actual = mirrored.forecast_move(agent.lookup_book(mirrored))
+                    self.assertEqual(expected[0], symmetry.canonical_hash(actual)[0])
+            loaded = agent.book
+        self.assertEqual(book.entries, loaded.entries)
+        empty = isolation.BitBoard("Player1", "Player2")
+        self.assertIn(loaded.lookup(empty), empty.get_legal_moves())
+        self.assertIsNone(loaded.lookup(random_position(0, 4)))
+
+    def test_unreadable_book_falls_back_to_search(self):
+        """ A missing or corrupt book file is dropped instead of raising """
+        with tempfile.TemporaryDirectory() as directory:
+            corrupt = os.path.join(directory, "corrupt.bin")
+            with open(corrupt, "wb") as book_file:
+                book_file.write(b"not a book")
+            for path in [os.path.join(directory, "missing.bin"), corrupt]:
+                agent = game_agent.CustomPlayer(2, improved_score, False, "alphabeta", book=path)
+                game = isolation.BitBoard(agent, "Player2")
+                move = agent.get_move(game, game.get_legal_moves(), lambda: 1e6)
+                self.assertIn(move, game.get_legal_moves())
+                self.assertIsNone(agent.book)
+                self.assertEqual("search", agent.stats.source)
+
+
+def partitioned_position(seed, max_cells=16):
+    """Return a random position with partitioned players in which the active
+    player's region has at most `max_cells` cells, or None.
+    """
+    rng = random.Random(seed)
+    board = isolation.BitBoard("Player1", "Player2")
+    while board.get_legal_moves():
+        regions = endgame.partition(board)
+        if regions is not None:
+            return board if isolation.bitboard.popcount(regions[0]) <= max_cells else None
+        board.apply_move(rng.choice(board.get_legal_moves()))
+    return None
+
+
+def longest_path(game, loc, blank_spaces):
+    """List-based reference for the longest knight path from `loc`."""
+    best = 0
+    for dr, dc in isolation.bitboard.DIRECTIONS:
+        move = (loc[0] + dr, loc[1] + dc)
+        if move in blank_spaces:
+            remaining = [cell for cell in blank_spaces if cell != move]
+            best = max(best, 1 + longest_path(game, move, remaining))
+    return best
+
+
+class EndgameTest(unittest.TestCase):
+
+    def test_partition(self):
+        """ Players are partitioned only when their regions are disjoint """
+        game = isolation.BitBoard("Player1", "Player2")
+        self.assertIsNone(endgame.partition(game))
+        game.apply_move((0, 0))
+        game.apply_move((3, 3))
+        self.assertIsNone(endgame.partition(game))
+        self.assertIsNotNone(partitioned_position(2))
+
+    def test_longest_path_matches_reference(self):
+        """ Memoized longest paths match an exhaustive search """
+        solver = endgame.EndgameSolver()
+        solved = 0
+        for seed in range(40):
+            game = partitioned_position(seed)
+            if game is None:
+                continue
+            solved += 1
+            own, other = solver.outcome(game)
+            blank_spaces = game.get_blank_spaces()
+            self.assertEqual(longest_path(game, game.get_player_location(game.active_player),
+                                          blank_spaces), own)
+            self.assertEqual(longest_path(game, game.get_player_location(game.inactive_player),
+                                          blank_spaces), other)
+            move, length = solver.best_move(game)
+            self.assertEqual(own, length)
+            if own:
+                remaining = [cell for cell in blank_spaces if cell != move]
+                self.assertEqual(own - 1, longest_path(game, move, remaining))
+        self.assertGreater(solved, 5)
+
+    def test_agent_plays_solver_move(self):
+        """ CustomPlayer switches to the solver in partitioned positions """
+        game = next(board for board in map(partitioned_position, range(40))
+                    if board is not None and board.get_legal_moves())
+        agent = game_agent.CustomPlayer(score_fn=improved_score, method="alphabeta",
+                                        endgame=True)
+        board = rebind(game, agent)
+        move = agent.get_move(board, board.get_legal_moves(), lambda: 1e6)
+        self.assertGreater(len(agent.endgame.memo), 0)
+        _, length = endgame.EndgameSolver().best_move(board)
+        remaining = [cell for cell in board.get_blank_spaces() if cell != move]
+        self.assertEqual(length - 1, longest_path(board, move, remaining))
+
+
+class SearchStatsTest(unittest.TestCase):
+
+    def test_stats_are_reported(self):
+        """ get_move() reports its statistics through the callback """
+        reported = []
+        agent = game_agent.CustomPlayer(3, improved_score, False, "alphabeta",
+                                        stats_callback=reported.append)
+        game = rebind(random_position(0, 4), agent)
+        agent.get_move(game, game.get_legal_moves(), lambda: 1e6)
+        self.assertEqual([agent.stats], reported)
+        stats = agent.stats
+        self.assertEqual(("search", 3), (stats.source, stats.depth))
+        self.assertGreater(stats.nodes, stats.leaves)
+        self.assertGreater(stats.leaves, 0)
+        self.assertGreater(stats.cutoffs, 0)
+        summary = search_stats.StatsSummary()
+        summary.add(stats)
+        summary.merge(summary)
+        self.assertEqual((2, 2 * stats.nodes), (summary.searches, summary.nodes))
+
+
+class TimeManagerTest(unittest.TestCase):
+
+    def test_skips_iteration_that_cannot_finish(self):
+        """ Deepening stops when the next pass is predicted to overrun """
+        now = [100.]
+        clock = time_manager.TimeManager(check_ms=1.)
+        clock.start(lambda: now[0], 10.)
+        for nodes, elapsed in [(10, 1.), (60, 5.), (310, 25.)]:
+            now[0] -= elapsed
+            self.assertFalse(clock.expired(nodes))
+            clock.end_iteration(nodes)
+        # 5 times as many nodes per pass: the next pass needs ~125ms
+        self.assertFalse(clock.can_deepen())
+        now[0] = 1000.
+        self.assertTrue(clock.can_deepen())
+        now[0] = 10.5
+        self.assertTrue(clock.expired(400))
+
+    def test_search_stops_at_end_of_game(self):
+        """ A managed search without time pressure stops once the tree ends """
+        agent = game_agent.CustomPlayer(score_fn=improved_score, method="alphabeta",
+                                        time_manager=time_manager.TimeManager())
+        game = rebind(random_position(0, 30), agent)
+        legal_moves = game.get_legal_moves()
+        move = agent.get_move(game, legal_moves, lambda: 1e6)
+        self.assertIn(move, legal_moves)
+        self.assertLessEqual(agent.stats.depth, len(game.get_blank_spaces()))
+
+if __name__ == '__main__':
+    unittest.main()
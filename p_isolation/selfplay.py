@@ -0,0 +1,250 @@
+"""
+Play many games between trusted agents as fast as possible, e.g., to
+generate training positions for heuristic tuning.
+
+`Board.play()` protects the game from the agents: it hands every agent a copy
+of the board, builds a new timer function for every move and keeps the move
+history in nested lists. The loop in this module trusts the agents instead:
+
+- agents get the board itself, so they must leave it unchanged (as
+  `CustomPlayer(in_place=True)` does, or any agent that uses forecast_move())
+- the timer function is created once per game
+- moves are written as cell indices into arrays preallocated for the whole
+  batch (see `GameRecords`)
+
+Batches of games can be spread over several processes:
+
+    python selfplay.py -n 2000 -p 4 -d 3 -o games.bin
+"""
+
+import argparse
+import multiprocessing
+import random
+import timeit
+
+from array import array
+
+from isolation import BitBoard
+from game_agent import CustomPlayer
+from sample_players import improved_score
+
+
+class GameRecords(object):
+    """The moves and winners of a batch of games, in preallocated arrays.
+
+    Parameters
+    ----------
+    num_games : int
+        The number of games that the arrays can hold.
+
+    width, height : int (optional)
+        The size of the board.
+
+    Attributes
+    ----------
+    moves : array<int>
+        `width * height` cells per game holding the index (col * height +
+        row) of the cell entered at every ply, including the opening moves.
+
+    lengths : array<int>
+        The number of plies of every game.
+
+    winners : array<int>
+        0 if the first player won the game, 1 if the second player won.
+
+    count : int
+        The number of games recorded so far.
+    """
+
+    def __init__(self, num_games, width=7, height=7):
+        self.width = width
+        self.height = height
+        self.max_plies = width * height
+        self.moves = array("B", bytes(num_games * self.max_plies))
+        self.lengths = array("H", bytes(2 * num_games))
+        self.winners = array("B", bytes(num_games))
+        self.count = 0
+
+    def game_moves(self, index):
+        """Return the moves of the game `index` as (row, col) pairs."""
+        offset = index * self.max_plies
+        return [(cell % self.height, cell // self.height)
+                for cell in self.moves[offset:offset + self.lengths[index]]]
+
+    def extend(self, other):
+        """Append the games recorded in `other`, which must hold games on a
+        board of the same size.
+        """
+        start, end = self.count, self.count + other.count
+        self.moves[start * self.max_plies:end * self.max_plies] = \
+            other.moves[:other.count * other.max_plies]
+        self.lengths[start:end] = other.lengths[:other.count]
+        self.winners[start:end] = other.winners[:other.count]
+        self.count = end
+
+    def save(self, path):
+        """Write the recorded games to `path`: the number of games (as 4
+        bytes), the lengths (2 bytes each), the winners (1 byte each), and
+        `width * height` bytes of moves per game, all in machine byte order.
+        """
+        with open(path, "wb") as records_file:
+            array("I", [self.count]).tofile(records_file)
+            self.lengths[:self.count].tofile(records_file)
+            self.winners[:self.count].tofile(records_file)
+            self.moves[:self.count * self.max_plies].tofile(records_file)
+
+
+def play_game(game, records, time_limit=None):
+    """
+    Play `game` to the end and append it to `records`. A player loses if it
+    returns an illegal move, or runs out of time when `time_limit` (in
+    milliseconds per move) is given.
+
+    Returns
+    ----------
+    object
+        The winner of the game.
+    """
+    offset = records.count * records.max_plies
+    moves = records.moves
+    height = game.height
+    plies = 0
+    for row, col in game.get_move_history():
+        moves[offset + plies] = col * height + row
+        plies += 1
+
+    timer = timeit.default_timer
+    move_start = [0.]
+    if time_limit is None:
+        time_left = lambda: float("inf")
+    else:
+        time_left = lambda: time_limit - 1000. * (timer() - move_start[0])
+
+    while True:
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            break
+        if time_limit is None:
+            move = game.active_player.get_move(game, legal_moves, time_left)
+        else:
+            move_start[0] = timer()
+            move = game.active_player.get_move(game, legal_moves, time_left)
+            if time_left() < 0:
+                break
+        if move not in legal_moves:
+            break
+        moves[offset + plies] = move[1] * height + move[0]
+        plies += 1
+        game.apply_move(move)
+
+    winner = game.inactive_player
+    records.lengths[records.count] = plies
+    records.winners[records.count] = 0 if winner is game.__player_1__ else 1
+    records.count += 1
+    return winner
+
+
+def play_batch(players, num_games, seed, opening_plies=2, time_limit=None,
+               board_cls=BitBoard, width=7, height=7):
+    """
+    Play `num_games` games between the two `players`, who swap seats after
+    every game. Every game starts with `opening_plies` random moves drawn
+    from a generator seeded with `seed`.
+
+    Returns
+    ----------
+    GameRecords
+        The records of the games.
+    """
+    rng = random.Random(seed)
+    records = GameRecords(num_games, width, height)
+    for index in range(num_games):
+        seats = players if index % 2 == 0 else players[::-1]
+        game = board_cls(seats[0], seats[1], width, height)
+        for _ in range(opening_plies):
+            moves = game.get_legal_moves()
+            if not moves:
+                break
+            game.apply_move(rng.choice(moves))
+        play_game(game, records, time_limit)
+    return records
+
+
+def search_players(depth):
+    """Return two fixed-depth alphabeta players with the improved heuristic
+    that search in place, as used by the command line.
+    """
+    return tuple(CustomPlayer(depth, improved_score, iterative=False, method="alphabeta",
+                              in_place=True) for _ in range(2))
+
+
+def _play_batch(args):
+    """Play one batch of games in a worker process."""
+    depth, num_games, seed, opening_plies = args
+    return play_batch(search_players(depth), num_games, seed, opening_plies)
+
+
+def play_batches(depth, num_games, seed, opening_plies=2, processes=1, batch_size=100):
+    """Play `num_games` games between `search_players(depth)` in batches of
+    `batch_size` games spread over `processes` processes, and return all
+    the records.
+    """
+    sizes = [min(batch_size, num_games - start) for start in range(0, num_games, batch_size)]
+    tasks = [(depth, size, seed + index, opening_plies) for index, size in enumerate(sizes)]
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            batches = pool.map(_play_batch, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        batches = [_play_batch(task) for task in tasks]
+    records = GameRecords(num_games)
+    for batch in batches:
+        records.extend(batch)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--games", type=int, default=1000,
+                        help="number of games to play")
+    parser.add_argument("-d", "--depth", type=int, default=3,
+                        help="search depth of the players")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="number of worker processes")
+    parser.add_argument("--plies", type=int, default=2,
+                        help="number of random opening moves")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+                        help="seed for the random openings")
+    parser.add_argument("-o", "--output", help="write the game records to this file")
+    parser.add_argument("--compare", action="store_true",
+                        help="also time the same games with Board.play()")
+    args = parser.parse_args()
+
+    start = timeit.default_timer()
+    records = play_batches(args.depth, args.games, args.seed, args.plies, args.processes)
+    elapsed = timeit.default_timer() - start
+    plies = sum(records.lengths[:records.count])
+    print("{} games, {:.1f} plies per game: {:.1f} games/s".format(
+        records.count, plies / float(records.count), records.count / elapsed))
+    if args.output:
+        records.save(args.output)
+
+    if args.compare:
+        # The same games, one process, with the defensive copies of Board.play()
+        players = search_players(args.depth)
+        start = timeit.default_timer()
+        for index in range(records.count):
+            seats = players if index % 2 == 0 else players[::-1]
+            game = BitBoard(seats[0], seats[1])
+            for move in records.game_moves(index)[:args.plies]:
+                game.apply_move(move)
+            game.play(time_limit=float("inf"))
+        print("Board.play(): {:.1f} games/s".format(records.count / (timeit.default_timer() - start)))
+
+
+if __name__ == "__main__":
+    main()
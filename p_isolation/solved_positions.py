@@ -0,0 +1,343 @@
+"""
+Measure the strength per unit of time of `CustomPlayer` configurations on a
+fixed suite of solved positions, in the way chess engines are tested on
+positions with known best moves, without playing full tournaments.
+
+Every position in `solved_positions.json` was taken from a game between
+alpha-beta agents and solved exactly to the end of the game (see
+`ExactSolver`). The side to move wins, but only with some of its legal
+moves; the winning moves are the best moves of the position. Each
+configuration (search method, heuristic and move ordering) searches every
+position by iterative deepening for up to `--time-limit` ms, and a position
+counts as solved at the first completed iteration from which on the search
+only returns best moves. The time and the nodes searched up to that
+iteration are the time-to-solution and the nodes-to-solution.
+
+    python solved_positions.py
+    python solved_positions.py --methods pvs --scores custom territory -o results.json
+    python solved_positions.py --mine -n 30 -o solved_positions.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import timeit
+from collections import namedtuple
+
+from isolation import BitBoard
+from isolation.bitboard import flood_fill
+from isolation.bitboard import iter_cells
+from isolation.bitboard import knight_tables
+from isolation.bitboard import popcount
+from endgame import EndgameSolver
+from endgame import player_cell
+from game_agent import CustomPlayer
+from game_agent import Timeout
+from sample_players import improved_score
+from search_stats import SearchStats
+from tournament import SCORE_FUNCTIONS
+
+POSITIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solved_positions.json")
+
+TIME_LIMIT = 1000  # milliseconds of search per position
+
+# Options shared by every configuration, as used by the Student agent
+SEARCH_ARGS = dict(in_place=True, tt_size=2 ** 16)
+
+METHODS = ["minimax", "alphabeta", "pvs"]
+
+Configuration = namedtuple("Configuration", ["method", "score", "ordering"])
+Solution = namedtuple("Solution", ["solved", "time", "nodes", "depth", "move"])
+
+
+def configuration_name(config):
+    """Return a short name of `config`, e.g. "pvs/territory/ordered"."""
+    return "{}/{}/{}".format(config.method, config.score,
+                             "ordered" if config.ordering else "unordered")
+
+
+class SolverLimit(Exception):
+    """Raised by `ExactSolver` when it exceeds its node limit."""
+    pass
+
+
+class ExactSolver(object):
+    """Win/loss solver for isolation positions in which both players have
+    moved, searching every line to the end of the game.
+
+    Positions are stored as (open cells, cell of the player to move, cell of
+    the other player) and memoized. Once the players are partitioned, the
+    result follows from their longest paths (see `endgame.EndgameSolver`).
+
+    Parameters
+    ----------
+    max_nodes : int (optional)
+        Raise `SolverLimit` after searching this many positions; None
+        searches without limit.
+    """
+
+    def __init__(self, max_nodes=None):
+        self.max_nodes = max_nodes
+        self.memo = {}
+        self.endgame = EndgameSolver()
+        self.nodes = 0
+
+    def wins(self, tables, blank, own, opp):
+        """Return True if the player to move from the cell `own` wins when
+        the open cells are `blank` and the opponent is on the cell `opp`.
+        """
+        key = (blank, own, opp)
+        result = self.memo.get(key)
+        if result is not None:
+            return result
+
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SolverLimit()
+
+        # The regions are disjoint unless a cell next to the opponent lies
+        # in the region of the player to move
+        own_region = flood_fill(blank, own, tables)
+        if not own_region & tables.masks[opp]:
+            opp_region = flood_fill(blank, opp, tables)
+            result = (self.endgame.longest_path(tables, own, own_region) >
+                      self.endgame.longest_path(tables, opp, opp_region))
+        else:
+            # Moves that leave the opponent few replies first
+            targets = sorted(iter_cells(tables.masks[own] & blank),
+                             key=lambda cell: popcount(tables.masks[opp] & blank & ~tables.bits[cell]))
+            result = any(not self.wins(tables, blank & ~tables.bits[cell], opp, cell)
+                         for cell in targets)
+        self.memo[key] = result
+        return result
+
+    def winning_moves(self, game):
+        """Return the legal moves of the active player of `game` that win
+        against any defence, in the order of `game.get_legal_moves()`.
+        """
+        tables = knight_tables(game.width, game.height)
+        blank = game.get_blank_mask()
+        opp = player_cell(game, game.inactive_player)
+        return [move for move in game.get_legal_moves()
+                if not self.wins(tables, blank & ~tables.bits[tables.index[move]],
+                                 opp, tables.index[move])]
+
+
+def mine_positions(count, seed=0, plies=(10, 16), max_nodes=400000, search_depth=3):
+    """
+    Collect solved positions from games between fixed-depth alpha-beta agents
+    using improved_score, which start with four random plies.
+
+    Parameters
+    ----------
+    count : int
+        The number of positions to collect.
+
+    seed : int (optional)
+        The seed of the random openings.
+
+    plies : (int, int) (optional)
+        The range of plies (inclusive) from which positions are taken.
+
+    max_nodes : int (optional)
+        Positions the solver cannot solve within this many nodes are skipped.
+
+    search_depth : int (optional)
+        The search depth of the agents playing the games.
+
+    Returns
+    ----------
+    list<dict>
+        The positions, with the moves played to reach them, their winning
+        moves and the number of legal moves.
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        agents = [CustomPlayer(search_depth, improved_score, False, "alphabeta") for _ in range(2)]
+        for agent in agents:
+            agent.time_left = lambda: 1e9
+        game = BitBoard(agents[0], agents[1])
+        ply = rng.randint(plies[0], plies[1])
+        for i in range(ply):
+            moves = game.get_legal_moves()
+            if not moves:
+                break
+            move = rng.choice(moves) if i < 4 else game.active_player.alphabeta(game, search_depth)[1]
+            game.apply_move(move)
+        legal_moves = game.get_legal_moves()
+        if len(legal_moves) < 3:
+            continue
+        try:
+            best = ExactSolver(max_nodes).winning_moves(game)
+        except SolverLimit:
+            continue
+        # Keep positions where a wrong move loses and most moves are wrong
+        if best and 2 * len(best) <= len(legal_moves):
+            positions.append({"moves": [list(move) for move in game.get_move_history()],
+                              "best": [list(move) for move in best],
+                              "legal": len(legal_moves)})
+    return positions
+
+
+def load_positions(path=POSITIONS_PATH):
+    """Return the positions stored in the JSON file `path`."""
+    with open(path) as positions_file:
+        return json.load(positions_file)["positions"]
+
+
+def save_positions(positions, path=POSITIONS_PATH):
+    """Write `positions` to the JSON file `path`, one position per line."""
+    with open(path, "w") as positions_file:
+        positions_file.write('{"positions": [\n')
+        positions_file.write(",\n".join(json.dumps(position, sort_keys=True)
+                                         for position in positions))
+        positions_file.write("\n]}\n")
+
+
+def position_board(position, agent):
+    """Return a board with the moves of `position` applied, in which the
+    active player is `agent`.
+    """
+    players = (agent, "opponent") if len(position["moves"]) % 2 == 0 else ("opponent", agent)
+    board = BitBoard(players[0], players[1])
+    for move in position["moves"]:
+        board.apply_move(tuple(move))
+    return board
+
+
+def solve_position(config, position, time_limit=TIME_LIMIT):
+    """
+    Search `position` by iterative deepening with a new agent of
+    configuration `config` for up to `time_limit` ms.
+
+    Returns
+    ----------
+    Solution
+        Whether the position was solved, the time in seconds and the nodes
+        searched until the first iteration from which on every completed
+        iteration returned a best move, the depth of that iteration, and
+        the move of the last completed iteration.
+    """
+    agent = CustomPlayer(score_fn=SCORE_FUNCTIONS[config.score], method=config.method,
+                         ordering=config.ordering, timeout=0., **SEARCH_ARGS)
+    game = position_board(position, agent)
+    best = set(tuple(move) for move in position["best"])
+    agent.stats = SearchStats()
+    if agent.tt is not None:
+        agent.tt.new_search()
+    if agent.orderer is not None:
+        agent.orderer.new_search()
+    start = timeit.default_timer()
+    end = start + time_limit / 1000.
+    agent.time_left = lambda: 1000. * (end - timeit.default_timer())
+
+    solution = None
+    move = None
+    v = None
+    try:
+        for depth in range(1, len(game.get_blank_spaces()) + 1):
+            if config.method == "minimax":
+                v, move = agent.minimax(game, depth)
+            else:
+                if config.method == "pvs":
+                    v, move = agent.pvs(game, depth, v)
+                else:
+                    v, move = agent.alphabeta(game, depth)
+                if agent.orderer is not None:
+                    agent.orderer.end_iteration(game)
+            if move not in best:
+                solution = None
+            elif solution is None:
+                solution = (timeit.default_timer() - start, agent.stats.nodes, depth)
+            # A proven result does not change in deeper iterations
+            if v in (float("inf"), float("-inf")):
+                break
+    except Timeout:
+        pass
+    if solution is None:
+        return Solution(False, None, None, None, move)
+    return Solution(True, solution[0], solution[1], solution[2], move)
+
+
+def run(configs, positions, time_limit=TIME_LIMIT):
+    """
+    Search every position with every configuration.
+
+    Returns
+    ----------
+    dict
+        The results, ready to be written as JSON: the time limit, the number
+        of positions, and for each configuration the number of solved
+        positions, their mean time-to-solution (ms), nodes-to-solution and
+        depth, and the index of every unsolved position.
+    """
+    results = {"time_limit": time_limit, "positions": len(positions),
+               "python": platform.python_version(), "configurations": {}}
+    for config in configs:
+        solutions = [solve_position(config, position, time_limit) for position in positions]
+        solved = [s for s in solutions if s.solved]
+        count = float(max(len(solved), 1))
+        results["configurations"][configuration_name(config)] = {
+            "solved": len(solved),
+            "time_ms": 1000. * sum(s.time for s in solved) / count,
+            "nodes": sum(s.nodes for s in solved) / count,
+            "depth": sum(s.depth for s in solved) / count,
+            "unsolved": [i for i, s in enumerate(solutions) if not s.solved]}
+    return results
+
+
+def report(results):
+    """Return a human readable table of `results`."""
+    lines = ["{} positions, {} ms per position".format(results["positions"], results["time_limit"]),
+             "{:<32}{:>8}{:>12}{:>12}{:>8}".format("configuration", "solved", "time (ms)", "nodes", "depth")]
+    for name, result in sorted(results["configurations"].items()):
+        lines.append("{:<32}{:>8}{:>12.1f}{:>12.0f}{:>8.1f}".format(
+            name, "{}/{}".format(result["solved"], results["positions"]),
+            result["time_ms"], result["nodes"], result["depth"]))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=["alphabeta", "pvs"],
+                        help="search methods to compare")
+    parser.add_argument("--scores", nargs="+", choices=sorted(SCORE_FUNCTIONS),
+                        default=["improved", "custom", "territory"],
+                        help="heuristics to compare")
+    parser.add_argument("--ordering", choices=["on", "off", "both"], default="both",
+                        help="search with move ordering, without, or both")
+    parser.add_argument("-t", "--time-limit", type=float, default=TIME_LIMIT,
+                        help="search time per position in milliseconds")
+    parser.add_argument("-f", "--positions", default=POSITIONS_PATH,
+                        help="JSON file of solved positions")
+    parser.add_argument("-o", "--output", help="write the results (or mined positions) as JSON to this file")
+    parser.add_argument("--mine", action="store_true",
+                        help="collect new solved positions instead of running the benchmark")
+    parser.add_argument("-n", "--count", type=int, default=30,
+                        help="number of positions to mine")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+                        help="seed of the games positions are mined from")
+    args = parser.parse_args()
+
+    if args.mine:
+        positions = mine_positions(args.count, args.seed)
+        save_positions(positions, args.output or POSITIONS_PATH)
+        print("{} positions written".format(len(positions)))
+        return
+
+    orderings = {"on": [True], "off": [False], "both": [False, True]}[args.ordering]
+    configs = [Configuration(method, score, ordering) for method in args.methods
+               for score in args.scores for ordering in orderings]
+    results = run(configs, load_positions(args.positions), args.time_limit)
+    print(report(results))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
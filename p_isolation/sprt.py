@@ -0,0 +1,131 @@
+"""This file contains the statistics used by tournament.py to stop a match
+between two agents as soon as its outcome is decided: Elo differences with
+confidence intervals, and the sequential probability ratio test (SPRT).
+
+The SPRT compares two hypotheses about the Elo difference between the agents,
+H0: elo = elo0 and H1: elo = elo1, after every game, and stops when the log
+likelihood ratio of the results leaves the interval set by the error rates
+`alpha` (accepting H1 when H0 is true) and `beta` (accepting H0 when H1 is
+true). Games of isolation cannot be drawn, so every game is a Bernoulli trial
+with the expected score of the Elo difference.
+"""
+
+import math
+
+Z_95 = 1.959964  # standard normal quantile of a two-sided 95% interval
+
+
+def expected_score(elo):
+    """Return the expected score of a player `elo` points stronger than its
+    opponent.
+    """
+    return 1. / (1. + 10. ** (-elo / 400.))
+
+
+def score_to_elo(score):
+    """Return the Elo difference with the expected score `score` (infinite
+    for a score of 0 or 1).
+    """
+    if score <= 0.:
+        return float("-inf")
+    if score >= 1.:
+        return float("inf")
+    return -400. * math.log10(1. / score - 1.)
+
+
+def elo_interval(wins, losses, z=Z_95):
+    """
+    Estimate the Elo difference from a number of wins and losses.
+
+    Parameters
+    ----------
+    wins, losses : int
+        The number of games won and lost.
+
+    z : float (optional)
+        The standard normal quantile of the confidence level; the default
+        gives a 95% interval.
+
+    Returns
+    ----------
+    (float, float, float)
+        The estimated Elo difference and the lower and upper bounds of its
+        confidence interval, from the Wilson score interval of the win rate
+        (so that the bounds stay finite when every game is won or lost). All
+        three are NaN if no games were played.
+    """
+    games = wins + losses
+    if not games:
+        return float("nan"), float("nan"), float("nan")
+    score = wins / float(games)
+    center = (score + z * z / (2. * games)) / (1. + z * z / games)
+    margin = z / (1. + z * z / games) * math.sqrt(
+        score * (1. - score) / games + z * z / (4. * games * games))
+    return score_to_elo(score), score_to_elo(center - margin), score_to_elo(center + margin)
+
+
+def format_elo(wins, losses):
+    """Return the Elo difference and its 95% interval as text."""
+    elo, low, high = elo_interval(wins, losses)
+    if math.isnan(elo):
+        return "Elo n/a"
+    return "Elo {:+.0f} [{:+.0f}, {:+.0f}]".format(elo, low, high)
+
+
+class SPRT(object):
+    """A sequential probability ratio test of H0: elo = elo0 against H1: elo
+    = elo1.
+
+    Parameters
+    ----------
+    elo0, elo1 : float (optional)
+        The Elo differences of the two hypotheses; elo1 must be larger.
+
+    alpha, beta : float (optional)
+        The maximum probabilities of accepting H1 when H0 is true, and of
+        accepting H0 when H1 is true.
+    """
+
+    def __init__(self, elo0=0., elo1=100., alpha=0.05, beta=0.05):
+        if elo1 <= elo0:
+            raise ValueError("elo1 must be larger than elo0")
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = math.log(beta / (1. - alpha))
+        self.upper = math.log((1. - beta) / alpha)
+        p0 = expected_score(elo0)
+        p1 = expected_score(elo1)
+        self.win_llr = math.log(p1 / p0)
+        self.loss_llr = math.log((1. - p1) / (1. - p0))
+        self.wins = 0
+        self.losses = 0
+
+    def add(self, wins, losses):
+        """Record the results of more games."""
+        self.wins += wins
+        self.losses += losses
+
+    def llr(self):
+        """Return the log likelihood ratio of H1 to H0 for the games so far."""
+        return self.wins * self.win_llr + self.losses * self.loss_llr
+
+    def status(self):
+        """Return "H1" or "H0" once that hypothesis is accepted, else None."""
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def report(self):
+        """Return the state of the test as text."""
+        status = self.status()
+        if status is None:
+            verdict = "undecided"
+        elif status == "H1":
+            verdict = "H1 (elo {:+.0f}) accepted".format(self.elo1)
+        else:
+            verdict = "H0 (elo {:+.0f}) accepted".format(self.elo0)
+        return "SPRT: {} after {} games (LLR {:.2f} in [{:.2f}, {:.2f}])".format(
+            verdict, self.wins + self.losses, self.llr(), self.lower, self.upper)
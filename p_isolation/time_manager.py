@@ -0,0 +1,91 @@
+"""This file contains the time manager used by `CustomPlayer` to decide when
+to stop searching.
+
+Without a time manager the player reads the clock at every node and starts
+iterative deepening passes until one is aborted by the timer, which wastes the
+time spent in the aborted pass. The time manager instead
+
+- reads the clock every `check_interval` nodes, where the interval adapts to
+  the observed search speed so that checks are about `check_ms` apart
+- predicts the duration of the next iteration from the duration of the last
+  one and the effective branching factor (the ratio of the node counts of the
+  last two iterations), and stops deepening if it would not finish
+- stops as soon as less than `threshold + check_ms` milliseconds are left,
+  since the next check may come up to `check_ms` later
+"""
+
+
+class TimeManager(object):
+    """Decide when an iterative deepening search should stop.
+
+    Parameters
+    ----------
+    check_ms : float (optional)
+        The target time in milliseconds between two clock checks. This time
+        is also kept as a safety margin on top of the player's timeout.
+
+    max_interval : int (optional)
+        The largest number of nodes searched between two clock checks.
+    """
+
+    def __init__(self, check_ms=1., max_interval=1024):
+        self.check_ms = check_ms
+        self.max_interval = max_interval
+        self.start(lambda: float("inf"), 0.)
+
+    def start(self, time_left, threshold):
+        """
+        Prepare for a new call to get_move().
+
+        Parameters
+        ----------
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn.
+
+        threshold : float
+            The time in milliseconds that must be left when the search
+            returns.
+        """
+        self.time_left = time_left
+        self.stop_at = threshold + self.check_ms
+        self.next_check = 0
+        self.last_nodes = 0
+        self.last_time = time_left()
+        self.interval = 1
+        self.iterations = [(0, self.last_time)]
+
+    def expired(self, nodes):
+        """Return True if the search must stop now, after searching `nodes`
+        nodes since the call to `start()`, and schedule the next check.
+        """
+        now = self.time_left()
+        elapsed = self.last_time - now
+        if elapsed > 0:
+            rate = (nodes - self.last_nodes) / elapsed
+            self.interval = max(1, min(self.max_interval, int(rate * self.check_ms)))
+        else:
+            self.interval = min(self.max_interval, 2 * self.interval)
+        self.next_check = nodes + self.interval
+        self.last_nodes = nodes
+        self.last_time = now
+        return now < self.stop_at
+
+    def end_iteration(self, nodes):
+        """Record the completion of an iterative deepening pass after `nodes`
+        nodes have been searched since the call to `start()`.
+        """
+        self.iterations.append((nodes, self.time_left()))
+
+    def can_deepen(self):
+        """Return True if the next iterative deepening pass is expected to
+        finish before the search must stop.
+        """
+        now = self.time_left()
+        if now < self.stop_at:
+            return False
+        if len(self.iterations) < 3:
+            return True
+        (n_0, _), (n_1, t_1), (n_2, t_2) = self.iterations[-3:]
+        branching = (n_2 - n_1) / float(max(1, n_1 - n_0))
+        return now - max(1., branching) * (t_1 - t_2) >= self.stop_at
@@ -17,23 +17,57 @@ For example, if the random moves chosen for initialization are (5, 2) and
 agentB at (1, 3) as player 2 then play to conclusion; the agents swap
 initiative in the second match with agentB at (5, 2) as player 1 and agentA at
 (1, 3) as player 2.
+
+Matches can be spread across several worker processes with the --processes
+option. Every match draws its opening from its own seed, derived from the
+--seed option, so a tournament can be replayed with the same openings
+regardless of the number of processes. Use at most one process per CPU core;
+the time limit is measured in wall clock time, and the script warns if any
+process received less than a full core while its agents were searching.
+
+With the --sprt option, the matches against each opponent are played one
+after the other until a sequential probability ratio test (see sprt.py)
+decides whether the agent is --elo1 or only --elo0 Elo points stronger than
+the opponent, up to --matches matches per player order (default
+SPRT_MAX_MATCHES). Every result is reported with the Elo difference and its
+95% confidence interval.
+
+With the --server option, every agent runs in its own subprocess (see
+match_server.py), so an agent that crashes, hangs or uses too much memory
+only loses its own games, and --processes sets the number of games played at
+once instead of the number of worker processes.
 """
 
+import argparse
 import itertools
+import multiprocessing
+import os
+import queue
 import random
+import time
+import timeit
 import warnings
 
+from collections import deque
 from collections import namedtuple
 
-from isolation import Board
+from isolation import BitBoard
 from sample_players import RandomPlayer
 from sample_players import null_score
 from sample_players import open_move_score
 from sample_players import improved_score
 from game_agent import CustomPlayer
 from game_agent import custom_score
+from game_agent import territory_score
+from match_server import MatchServer
+from mcts import MCTSPlayer
+from search_stats import StatsSummary
+from sprt import SPRT
+from sprt import format_elo
+from time_manager import TimeManager
 
 NUM_MATCHES = 5  # number of matches against each opponent
+SPRT_MAX_MATCHES = 50  # maximum number of matches against each opponent with --sprt
 TIME_LIMIT = 150  # number of milliseconds before timeout
 
 TIMEOUT_WARNING = "One or more agents lost a match this round due to " + \
@@ -43,6 +77,13 @@ TIMEOUT_WARNING = "One or more agents lost a match this round due to " + \
                   "increase this margin to avoid timeouts during  " + \
                   "tournament play."
 
+MIN_CPU_SHARE = 0.9  # minimum fraction of a core each match process should get
+
+CPU_SHARE_WARNING = "Process {} only received {:.0f}% of a CPU core " + \
+                    "while playing matches. Agents may have lost games " + \
+                    "to timeouts caused by other processes; use fewer " + \
+                    "worker processes."
+
 DESCRIPTION = """
 This script evaluates the performance of the custom heuristic function by
 comparing the strength of an agent using iterative deepening (ID) search with
@@ -51,27 +92,64 @@ functions.  The `ID_Improved` agent provides a baseline by measuring the
 performance of a basic agent using Iterative Deepening and the "improved"
 heuristic (from lecture) on your hardware.  The `Student` agent then measures
 the performance of Iterative Deepening and the custom heuristic against the
-same opponents.
+same opponents, and the `MCTS` agent the performance of Monte Carlo tree
+search with random playouts (see mcts.py), which uses no heuristic.
 """
 
 Agent = namedtuple("Agent", ["player", "name"])
+MatchResult = namedtuple("MatchResult", ["wins", "timeouts", "invalid_moves",
+                                         "pid", "wall_time", "cpu_time", "stats"])
+
+# The bitboard implementation exposes the same interface as isolation.Board,
+# but copies and generates moves much faster during search
+BOARD_CLASS = BitBoard
+
+# Opening book for the Student agent (see build_opening_book.py)
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+# Heuristics the Student agent can use (see the --score option)
+SCORE_FUNCTIONS = {"custom": custom_score,
+                   "improved": improved_score,
+                   "territory": territory_score}
 
 
-def play_match(player1, player2):
+def play_games(player1, player2, seed=None):
     """
-    Play a "fair" set of matches between two agents by playing two games
-    between the players, forcing each agent to play from randomly selected
-    positions. This should control for differences in outcome resulting from
-    advantage due to starting position on the board.
+    Play the two games of a "fair" match between two agents (see
+    `play_match()`) and return a `MatchResult` with the number of wins,
+    timeouts and invalid moves of each player, in (player1, player2) order.
+    For players that record search statistics (see `CustomPlayer`), the
+    result also holds a `StatsSummary` of their moves in the match, or None.
+
+    The opening moves are drawn from a generator seeded with `seed`, so
+    matches with the same seed start from the same positions. The match
+    also records the wall clock and CPU time used by the current process,
+    which shows whether the process was competing for a CPU core while the
+    agents were on the clock.
     """
+    rng = random.Random(seed)
     num_wins = {player1: 0, player2: 0}
     num_timeouts = {player1: 0, player2: 0}
     num_invalid_moves = {player1: 0, player2: 0}
-    games = [Board(player1, player2), Board(player2, player1)]
+    games = [BOARD_CLASS(player1, player2), BOARD_CLASS(player2, player1)]
+
+    summaries = []
+    callbacks = []
+    for player in (player1, player2):
+        if hasattr(player, "stats_callback"):
+            summaries.append(StatsSummary())
+            callbacks.append(player.stats_callback)
+            player.stats_callback = summaries[-1].add
+        else:
+            summaries.append(None)
+            callbacks.append(None)
+
+    wall_start = timeit.default_timer()
+    cpu_start = time.process_time()
 
     # initialize both games with a random move and response
     for _ in range(2):
-        move = random.choice(games[0].get_legal_moves())
+        move = rng.choice(games[0].get_legal_moves())
         games[0].apply_move(move)
         games[1].apply_move(move)
 
@@ -96,53 +174,312 @@ def play_match(player1, player2):
             else:
                 num_invalid_moves[player1] += 1
 
-    if sum(num_timeouts.values()) != 0:
+    for player, summary, callback in zip((player1, player2), summaries, callbacks):
+        if summary is not None:
+            player.stats_callback = callback
+
+    return MatchResult((num_wins[player1], num_wins[player2]),
+                       (num_timeouts[player1], num_timeouts[player2]),
+                       (num_invalid_moves[player1], num_invalid_moves[player2]),
+                       os.getpid(),
+                       timeit.default_timer() - wall_start,
+                       time.process_time() - cpu_start,
+                       tuple(summaries))
+
+
+def play_match(player1, player2, seed=None):
+    """
+    Play a "fair" set of matches between two agents by playing two games
+    between the players, forcing each agent to play from randomly selected
+    positions. This should control for differences in outcome resulting from
+    advantage due to starting position on the board.
+    """
+    result = play_games(player1, player2, seed)
+
+    if sum(result.timeouts) != 0:
         warnings.warn(TIMEOUT_WARNING)
 
-    return num_wins[player1], num_wins[player2]
+    return result.wins
+
+
+# Agents used by the current worker process; set by `_init_worker()` so that
+# the agents are sent to each worker once rather than with every match
+_WORKER_AGENTS = None
+
+
+def _init_worker(agents):
+    global _WORKER_AGENTS
+    _WORKER_AGENTS = agents
 
 
-def play_round(agents, num_matches):
+def _play_task(task):
+    """Play the match described by `task` in a worker process."""
+    idx_1, idx_2, seed = task
+    return play_seeded_games(_WORKER_AGENTS[idx_1].player, _WORKER_AGENTS[idx_2].player, seed)
+
+
+def play_seeded_games(player1, player2, seed):
+    """Call `play_games()` after seeding the global random number generator
+    with `seed`, so that agents making random choices are reproducible too.
+    """
+    random.seed(seed)
+    return play_games(player1, player2, seed)
+
+
+def play_until_decided(agents, tasks, processes=1, sprt_args=None, server=None):
+    """
+    Play the matches in `tasks` against every opponent of the last agent in
+    order, until the SPRT between the last agent and that opponent accepts a
+    hypothesis or the opponent's matches run out. Opponents take turns, and
+    with several processes (or a `match_server.MatchServer`, which plays
+    its `concurrency` games at once) one match per process is in progress
+    at a time.
+
+    Returns
+    ----------
+    (list<tuple>, list<MatchResult>, dict)
+        The tasks played (in the order they finished), their results, and
+        the `SPRT` of every opponent (by index in `agents`), which holds the
+        games played until the test was decided.
+    """
+    last = len(agents) - 1
+    pending = {}
+    for task in tasks:
+        opponent = task[1] if task[0] == last else task[0]
+        pending.setdefault(opponent, deque()).append(task)
+    tests = {opponent: SPRT(**(sprt_args or {})) for opponent in pending}
+    turns = itertools.cycle(sorted(pending))
+    played = []
+    results = []
+
+    def next_task():
+        for _ in range(len(pending)):
+            opponent = next(turns)
+            if pending[opponent] and tests[opponent].status() is None:
+                return pending[opponent].popleft()
+        return None
+
+    def record(task, result):
+        played.append(task)
+        results.append(result)
+        opponent, own = (task[1], 0) if task[0] == last else (task[0], 1)
+        # Matches that finish after the decision still count in the totals
+        if tests[opponent].status() is None:
+            tests[opponent].add(result.wins[own], result.wins[1 - own])
+
+    if server is None and processes <= 1:
+        task = next_task()
+        while task is not None:
+            idx_1, idx_2, task_seed = task
+            record(task, play_seeded_games(agents[idx_1].player, agents[idx_2].player, task_seed))
+            task = next_task()
+        return played, results, tests
+
+    finished = queue.Queue()
+
+    def run(submit, slots):
+        running = 0
+        while True:
+            while running < slots:
+                task = next_task()
+                if task is None:
+                    break
+                submit(task)
+                running += 1
+            if not running:
+                break
+            task, result = finished.get()
+            running -= 1
+            if isinstance(result, BaseException):
+                raise result
+            record(task, result)
+
+    if server is not None:
+        def submit(task):
+            future = server.submit(task)
+            future.add_done_callback(
+                lambda future: finished.put((task, future.exception() or future.result())))
+        run(submit, server.concurrency)
+        return played, results, tests
+
+    with multiprocessing.Pool(processes, _init_worker, (agents,)) as pool:
+        def submit(task):
+            pool.apply_async(_play_task, (task,),
+                             callback=lambda result: finished.put((task, result)),
+                             error_callback=lambda error: finished.put((task, error)))
+        run(submit, processes)
+    return played, results, tests
+
+
+def play_round(agents, num_matches, processes=1, seed=None, sprt_args=None, server=False):
     """
     Play one round (i.e., a single match between each pair of opponents)
+
+    Parameters
+    ----------
+    agents : list<Agent>
+        The agents in the round; the last agent plays every other agent.
+
+    num_matches : int
+        The number of matches played against each opponent with each player
+        taking the first move.
+
+    processes : int (optional)
+        The number of worker processes used to play the matches. With a
+        single process the matches are played in order in this process.
+
+    seed : int (optional)
+        Seed for the random openings. Every match is given its own seed drawn
+        from this value, so results are reproducible for any number of
+        processes. If None, the openings are not reproducible.
+
+    sprt_args : dict (optional)
+        Keyword arguments of `sprt.SPRT`. If given, `num_matches` is the
+        maximum number of matches, and the matches against an opponent stop
+        as soon as the test is decided (see `play_until_decided()`).
+
+    server : boolean (optional)
+        Flag indicating whether to run every agent in its own subprocess
+        with `match_server.MatchServer`, playing `processes` games at once.
     """
     agent_1 = agents[-1]
     wins = 0.
     total = 0.
 
+    # Each player takes a turn going first
+    rng = random.Random(seed)
+    tasks = []
+    for idx in range(len(agents) - 1):
+        for idx_1, idx_2 in itertools.permutations((len(agents) - 1, idx)):
+            for _ in range(num_matches):
+                tasks.append((idx_1, idx_2, rng.getrandbits(32)))
+
     print("\nPlaying Matches:")
     print("----------")
 
+    tests = None
+    if server:
+        with MatchServer(agents, processes, TIME_LIMIT) as match_server:
+            if sprt_args is not None:
+                tasks, results, tests = play_until_decided(agents, tasks, sprt_args=sprt_args,
+                                                           server=match_server)
+            else:
+                results = match_server.play_matches(tasks)
+    elif sprt_args is not None:
+        tasks, results, tests = play_until_decided(agents, tasks, processes, sprt_args)
+    elif processes > 1:
+        with multiprocessing.Pool(processes, _init_worker, (agents,)) as pool:
+            results = pool.map(_play_task, tasks, chunksize=1)
+    else:
+        results = [play_seeded_games(agents[idx_1].player, agents[idx_2].player, task_seed)
+                   for idx_1, idx_2, task_seed in tasks]
+
+    timeouts = 0
+    invalid_moves = 0
+    summary = StatsSummary()
     for idx, agent_2 in enumerate(agents[:-1]):
 
         counts = {agent_1.player: 0., agent_2.player: 0.}
         names = [agent_1.name, agent_2.name]
         print("  Match {}: {!s:^11} vs {!s:^11}".format(idx + 1, *names), end=' ')
 
-        # Each player takes a turn going first
-        for p1, p2 in itertools.permutations((agent_1.player, agent_2.player)):
-            for _ in range(num_matches):
-                score_1, score_2 = play_match(p1, p2)
-                counts[p1] += score_1
-                counts[p2] += score_2
-                total += score_1 + score_2
+        for (idx_1, idx_2, _), result in zip(tasks, results):
+            if idx not in (idx_1, idx_2):
+                continue
+            score_1, score_2 = result.wins
+            counts[agents[idx_1].player] += score_1
+            counts[agents[idx_2].player] += score_2
+            total += score_1 + score_2
+            timeouts += sum(result.timeouts)
+            invalid_moves += sum(result.invalid_moves)
+            stats = result.stats[0 if idx_1 == len(agents) - 1 else 1]
+            if stats is not None:
+                summary.merge(stats)
 
         wins += counts[agent_1.player]
 
-        print("\tResult: {} to {}".format(int(counts[agent_1.player]),
-                                          int(counts[agent_2.player])))
+        print("\tResult: {} to {}\t{}".format(int(counts[agent_1.player]),
+                                              int(counts[agent_2.player]),
+                                              format_elo(counts[agent_1.player],
+                                                         counts[agent_2.player])))
+        if tests is not None:
+            print("    " + tests[idx].report())
+
+    print("  Timeouts: {}  Invalid moves: {}".format(timeouts, invalid_moves))
+    if summary.moves:
+        print("\n{} search statistics:".format(agent_1.name))
+        for line in summary.report().splitlines():
+            print("  " + line)
+    if timeouts != 0:
+        warnings.warn(TIMEOUT_WARNING)
+    check_cpu_share(results)
 
     return 100. * wins / total
 
 
+def check_cpu_share(results):
+    """
+    Warn if any process that played matches received noticeably less than a
+    full CPU core while the games were running. Time limits are measured in
+    wall clock time, so agents in a starved process have less time to search
+    than their opponents in other rounds.
+    """
+    wall = {}
+    cpu = {}
+    for result in results:
+        wall[result.pid] = wall.get(result.pid, 0.) + result.wall_time
+        cpu[result.pid] = cpu.get(result.pid, 0.) + result.cpu_time
+
+    for pid in wall:
+        if wall[pid] > 0 and cpu[pid] / wall[pid] < MIN_CPU_SHARE:
+            warnings.warn(CPU_SHARE_WARNING.format(pid, 100. * cpu[pid] / wall[pid]))
+
+
 def main():
 
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="number of worker processes used to play matches")
+    parser.add_argument("-s", "--seed", type=int, default=None,
+                        help="seed for the random openings of every match")
+    parser.add_argument("--sprt", action="store_true",
+                        help="stop the matches against an opponent once an SPRT is decided")
+    parser.add_argument("--elo0", type=float, default=0.,
+                        help="Elo difference of the SPRT null hypothesis")
+    parser.add_argument("--elo1", type=float, default=100.,
+                        help="Elo difference of the SPRT alternative hypothesis")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                        help="SPRT probability of accepting elo1 if elo0 is true")
+    parser.add_argument("--beta", type=float, default=0.05,
+                        help="SPRT probability of accepting elo0 if elo1 is true")
+    parser.add_argument("--server", action="store_true",
+                        help="run every agent in its own subprocess; --processes is then "
+                             "the number of games played at once")
+    parser.add_argument("-m", "--matches", type=int, default=None,
+                        help="number of matches against each opponent with each player "
+                             "moving first (the maximum with --sprt)")
+    parser.add_argument("--score", choices=sorted(SCORE_FUNCTIONS), default="custom",
+                        help="heuristic used by the Student agent")
+    args = parser.parse_args()
+    seed = args.seed if args.seed is not None else random.getrandbits(32)
+    sprt_args = None
+    num_matches = NUM_MATCHES
+    if args.sprt:
+        sprt_args = dict(elo0=args.elo0, elo1=args.elo1, alpha=args.alpha, beta=args.beta)
+        num_matches = SPRT_MAX_MATCHES
+    if args.matches is not None:
+        num_matches = args.matches
+
     HEURISTICS = [("Null", null_score),
                   ("Open", open_move_score),
                   ("Improved", improved_score)]
     AB_ARGS = {"search_depth": 5, "method": 'alphabeta', "iterative": False}
     MM_ARGS = {"search_depth": 3, "method": 'minimax', "iterative": False}
     CUSTOM_ARGS = {"method": 'alphabeta', 'iterative': True}
+    STUDENT_ARGS = dict(CUSTOM_ARGS, method="pvs", in_place=True, tt_size=2 ** 16, ordering=True,
+                        symmetry_plies=6, endgame=True, time_manager=TimeManager())
+    if os.path.exists(BOOK_PATH):
+        STUDENT_ARGS["book"] = BOOK_PATH
 
     # Create a collection of CPU agents using fixed-depth minimax or alpha beta
     # search, or random selection.  The agent names encode the search method
@@ -161,9 +498,11 @@ def main():
     # relative to the performance of the ID_Improved agent to account for
     # faster or slower computers.
     test_agents = [Agent(CustomPlayer(score_fn=improved_score, **CUSTOM_ARGS), "ID_Improved"),
-                   Agent(CustomPlayer(score_fn=custom_score, **CUSTOM_ARGS), "Student")]
+                   Agent(CustomPlayer(score_fn=SCORE_FUNCTIONS[args.score], **STUDENT_ARGS), "Student"),
+                   Agent(MCTSPlayer(), "MCTS")]
 
     print(DESCRIPTION)
+    print("Opening seed: {}".format(seed))
     for agentUT in test_agents:
         print("")
         print("*************************")
@@ -171,7 +510,8 @@ def main():
         print("*************************")
 
         agents = random_agents + mm_agents + ab_agents + [agentUT]
-        win_ratio = play_round(agents, NUM_MATCHES)
+        win_ratio = play_round(agents, num_matches, args.processes, seed, sprt_args,
+                               args.server)
 
         print("\n\nResults:")
         print("----------")
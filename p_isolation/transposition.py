@@ -0,0 +1,65 @@
+"""This file contains a bounded transposition table used by `CustomPlayer` to
+reuse search results between iterative deepening passes and between moves of
+the same game.
+"""
+
+from collections import namedtuple
+
+# Bound types recorded for each entry
+EXACT = 0   # the stored value is the exact minimax value of the position
+LOWER = 1   # the search failed high; the true value is >= the stored value
+UPPER = 2   # the search failed low; the true value is <= the stored value
+
+Entry = namedtuple("Entry", ["key", "depth", "value", "bound", "move", "generation"])
+
+
+class TranspositionTable(object):
+    """Fixed-size hash table mapping position hashes to search results.
+
+    Each position hash maps to a single slot (`key % size`). When two
+    positions collide, the new result replaces the stored one if the stored
+    entry belongs to an earlier search (see `new_search()`) or was searched
+    to the same or a lower depth; otherwise the deeper, current entry is
+    kept.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The number of slots in the table.
+    """
+
+    def __init__(self, size=2 ** 18):
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        """Remove every entry from the table and reset the counters."""
+        self.slots = [None] * self.size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        """Mark the start of a new search (i.e., a new call to get_move).
+        Entries stored by earlier searches remain available for lookups, but
+        they are the first to be replaced.
+        """
+        self.generation += 1
+
+    def lookup(self, key):
+        """Return the `Entry` stored for the position hash `key`, or None."""
+        self.probes += 1
+        entry = self.slots[key % self.size]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, value, bound, move):
+        """Record the result of searching the position `key` to `depth`
+        plies, subject to the replacement policy.
+        """
+        index = key % self.size
+        old = self.slots[index]
+        if old is None or old.generation != self.generation or depth >= old.depth:
+            self.slots[index] = Entry(key, depth, value, bound, move, self.generation)
@@ -0,0 +1,285 @@
+"""
+Fit the weights of `game_agent.WeightedScore` on the outcomes of self-play
+games, so that a heuristic can be tried without a full tournament.
+
+The positions of the games (see selfplay.py) are stored as NumPy arrays
+(the bitmask of open cells and the cell of each player) and the features of
+`game_agent.FEATURES` are computed for all of them at once: bitmasks are
+uint64 arrays, knight moves are masked shifts of the whole array (as in
+`isolation.bitboard.knight_spread()`), bits are counted with a SWAR popcount
+and the reachable area is a flood fill that runs until the region of every
+position stops growing.
+
+The weights are fitted by logistic regression (Texel tuning): the sigmoid of
+the weighted sum of the feature differences between the player to move and
+the opponent predicts whether the player to move wins the game.
+
+    python tune_heuristic.py -n 4000 -d 2 -o weights.json
+
+The weights file can then be loaded with `WeightedScore.load("weights.json")`.
+
+NumPy is only needed by this script, not by the agents.
+"""
+
+import argparse
+import json
+import sys
+import timeit
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from game_agent import FEATURES
+from isolation.bitboard import knight_tables
+from selfplay import play_batches
+
+
+def require_numpy():
+    """Raise ImportError with a clear message if NumPy is not installed."""
+    if np is None:
+        raise ImportError("tune_heuristic.py requires NumPy (pip install numpy)")
+
+
+def popcount64(masks):
+    """Return the number of set bits of every element of the uint64 array
+    `masks`, as an int64 array.
+    """
+    m1 = np.uint64(0x5555555555555555)
+    m2 = np.uint64(0x3333333333333333)
+    m4 = np.uint64(0x0f0f0f0f0f0f0f0f)
+    h01 = np.uint64(0x0101010101010101)
+    x = masks - ((masks >> np.uint64(1)) & m1)
+    x = (x & m2) + ((x >> np.uint64(2)) & m2)
+    x = (x + (x >> np.uint64(4))) & m4
+    return ((x * h01) >> np.uint64(56)).astype(np.int64)
+
+
+def batch_spread(masks, tables):
+    """Vectorized `isolation.bitboard.knight_spread()` of a uint64 array."""
+    spread = np.zeros_like(masks)
+    for source, offset in tables.shifts:
+        part = masks & np.uint64(source)
+        if offset > 0:
+            spread |= part << np.uint64(offset)
+        else:
+            spread |= part >> np.uint64(-offset)
+    return spread
+
+
+def batch_flood_fill(blank, start, tables):
+    """Vectorized `isolation.bitboard.flood_fill()`, where `start` holds the
+    knight neighbors of the starting cells.
+    """
+    region = np.zeros_like(blank)
+    frontier = start & blank
+    while frontier.any():
+        region |= frontier
+        frontier = batch_spread(frontier, tables) & blank & ~region
+    return region
+
+
+class PositionBatch(object):
+    """Positions on a board of one size, in arrays of equal length.
+
+    Parameters
+    ----------
+    blank : numpy.ndarray<uint64>
+        The bitmask of open cells of every position.
+
+    active, inactive : numpy.ndarray<int>
+        The cell index of the player to move and of the opponent; both
+        players must have moved.
+
+    wins : numpy.ndarray<float>
+        1 if the player to move won the game, else 0.
+
+    games : numpy.ndarray<int>
+        The index of the game of every position.
+    """
+
+    def __init__(self, blank, active, inactive, wins, games, width=7, height=7):
+        self.blank = blank
+        self.active = active
+        self.inactive = inactive
+        self.wins = wins
+        self.games = games
+        self.width = width
+        self.height = height
+
+    def __len__(self):
+        return len(self.blank)
+
+    def subset(self, selection):
+        """Return the positions selected by the boolean array `selection`."""
+        return PositionBatch(self.blank[selection], self.active[selection],
+                             self.inactive[selection], self.wins[selection],
+                             self.games[selection], self.width, self.height)
+
+    @classmethod
+    def from_records(cls, records):
+        """Return every position of the `selfplay.GameRecords` in which both
+        players have moved and the player to move has a legal move.
+        """
+        tables = knight_tables(records.width, records.height)
+        if records.width * records.height > 64:
+            raise ValueError("Boards with more than 64 cells are not supported")
+        blank, active, inactive, wins, games = [], [], [], [], []
+        for game in range(records.count):
+            offset = game * records.max_plies
+            length = records.lengths[game]
+            mask = tables.full
+            cells = [None, None]
+            for ply in range(length):
+                cell = records.moves[offset + ply]
+                mask &= ~tables.bits[cell]
+                cells[ply % 2] = cell
+                # The last position of a game is lost by the player to move
+                if ply == 0 or ply == length - 1:
+                    continue
+                mover = (ply + 1) % 2
+                blank.append(mask)
+                active.append(cells[mover])
+                inactive.append(cells[1 - mover])
+                wins.append(1. if records.winners[game] == mover else 0.)
+                games.append(game)
+        return cls(np.array(blank, dtype=np.uint64), np.array(active, dtype=np.int64),
+                   np.array(inactive, dtype=np.int64), np.array(wins),
+                   np.array(games, dtype=np.int64), records.width, records.height)
+
+
+def batch_features(positions, features=FEATURES):
+    """
+    Compute `game_agent.position_features()` for a batch of positions, from
+    the point of view of the player to move.
+
+    Returns
+    ----------
+    numpy.ndarray<float>
+        One row per position and one column per feature.
+    """
+    require_numpy()
+    tables = knight_tables(positions.width, positions.height)
+    masks = np.array(tables.masks, dtype=np.uint64)
+    rows = np.array([r for r, _ in tables.coords], dtype=np.float64)
+    cols = np.array([c for _, c in tables.coords], dtype=np.float64)
+    center = np.sqrt((rows - (tables.height - 1) / 2.) ** 2 +
+                     (cols - (tables.width - 1) / 2.) ** 2)
+
+    blank = positions.blank
+    columns = []
+    per_player = {}
+    for player, cells in (("own", positions.active), ("opp", positions.inactive)):
+        moves = masks[cells] & blank
+        values = {}
+        if "mobility" in features:
+            values["mobility"] = popcount64(moves)
+        if "second_mobility" in features:
+            values["second_mobility"] = popcount64(batch_spread(moves, tables) & blank)
+        if "center_distance" in features:
+            values["center_distance"] = center[cells]
+        if "reachable_area" in features:
+            values["reachable_area"] = popcount64(batch_flood_fill(blank, moves, tables))
+        per_player[player] = values
+    for name in features:
+        if name not in FEATURES:
+            raise ValueError("Unknown feature: {}".format(name))
+        columns.append(per_player["own"][name] - per_player["opp"][name])
+    return np.column_stack(columns).astype(np.float64)
+
+
+def sigmoid(x):
+    """Return the logistic function of the array `x`."""
+    return 1. / (1. + np.exp(-np.clip(x, -50., 50.)))
+
+
+def fit_logistic(features, wins, l2=1e-3, iterations=50, tolerance=1e-9):
+    """
+    Fit the weights of a logistic regression of `wins` on `features` with
+    Newton's method and an L2 penalty of `l2` per position. There is no
+    intercept, so the score of a position is the negative of the score for
+    the opponent.
+
+    Returns
+    ----------
+    numpy.ndarray<float>
+        One weight per column of `features`.
+    """
+    count, columns = features.shape
+    weights = np.zeros(columns)
+    penalty = l2 * count * np.eye(columns)
+    for _ in range(iterations):
+        p = sigmoid(features.dot(weights))
+        gradient = features.T.dot(wins - p) - penalty.dot(weights)
+        hessian = (features * (p * (1. - p))[:, None]).T.dot(features) + penalty
+        step = np.linalg.solve(hessian, gradient)
+        weights += step
+        if np.abs(step).max() < tolerance:
+            break
+    return weights
+
+
+def evaluate(features, wins, weights):
+    """Return the log loss and the accuracy of the win predictions of
+    `weights`; ties (a score of zero) count as half right.
+    """
+    scores = features.dot(weights)
+    p = np.clip(sigmoid(scores), 1e-12, 1. - 1e-12)
+    log_loss = -np.mean(wins * np.log(p) + (1. - wins) * np.log(1. - p))
+    correct = np.where(scores == 0., 0.5, (scores > 0.) == (wins > 0.5))
+    return float(log_loss), float(np.mean(correct))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--games", type=int, default=2000,
+                        help="number of self-play games")
+    parser.add_argument("-d", "--depth", type=int, default=2,
+                        help="search depth of the self-play players")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="number of self-play processes")
+    parser.add_argument("--plies", type=int, default=4,
+                        help="number of random opening moves per game")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+                        help="seed for the random openings")
+    parser.add_argument("-f", "--features", nargs="+", default=list(FEATURES),
+                        choices=FEATURES, help="features to fit")
+    parser.add_argument("--l2", type=float, default=1e-3,
+                        help="L2 penalty per position")
+    parser.add_argument("-o", "--output", help="write the weights as JSON to this file")
+    args = parser.parse_args()
+    if np is None:
+        sys.exit("tune_heuristic.py requires NumPy (pip install numpy)")
+
+    start = timeit.default_timer()
+    records = play_batches(args.depth, args.games, args.seed, args.plies, args.processes)
+    positions = PositionBatch.from_records(records)
+    print("{} games, {} positions in {:.1f} s".format(
+        records.count, len(positions), timeit.default_timer() - start))
+
+    start = timeit.default_timer()
+    features = batch_features(positions, args.features)
+    print("features: {:.0f} positions/s".format(
+        len(positions) / (timeit.default_timer() - start)))
+
+    # Hold out the last fifth of the games to check the fit
+    test = positions.games >= records.count * 4 // 5
+    weights = fit_logistic(features[~test], positions.wins[~test], args.l2)
+    log_loss, accuracy = evaluate(features[test], positions.wins[test], weights)
+    for name, weight in zip(args.features, weights):
+        print("{:>16} {:>10.4f}".format(name, weight))
+    print("held-out log loss {:.4f}, accuracy {:.3f}".format(log_loss, accuracy))
+
+    if args.output:
+        weights = fit_logistic(features, positions.wins, args.l2)
+        with open(args.output, "w") as output_file:
+            json.dump({"weights": dict(zip(args.features, weights.tolist())),
+                       "games": records.count, "positions": len(positions),
+                       "depth": args.depth, "log_loss": log_loss, "accuracy": accuracy},
+                      output_file, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()